@@ -302,8 +302,10 @@ def config_source(source):
 
 def config_freq(freq):
     if freq.isdigit() and int(freq) in [250, 500, 1000]:
-        reader.set_sample_rate(int(freq))
-        reader.restart()
+        # buffers are re-configured online, no need to restart reader
+        if not reader.set_sample_rate(int(freq)):
+            reader.restart()
+        signalinfo.sample_rate = reader.sample_rate
     else:
         return ('Invalid sample rate `{}`! '.format(freq) +
                 'Choose one from `250` | `500` | `1000`')
@@ -349,17 +351,34 @@ class WebSocketMulticaster(LoopTaskInThread):
     def __init__(self, paramtree):
         self.ws_list = []
         self.pt = paramtree
+        self.cursor = None
         LoopTaskInThread.__init__(self, self._data_multicast)
 
-    def _data_fetch(self):
-        data = process_realtime(reader.data_channel, self.pt)
-        server.multicast(data)
-        return data
+    def _data_fetch(self, n):
+        '''
+        Read `n` new samples through a cursor on reader's buffer, so every
+        sample is delivered once no matter how many samples the reader
+        ingests at a time. Return n x n_channel list or None if timeout.
+        '''
+        if self.cursor is None:
+            self.cursor = reader.subscribe()
+        data, lost = self.cursor.read(
+            n, timeout=n * reader.sample_time + 1, timestamp=False)
+        if data is None:
+            return None
+        if lost:
+            logger.debug('%d samples skipped by multicaster' % lost)
+        cached_data = []
+        for column in data.T:  # realtime filters work sample by sample
+            column = process_realtime(column, self.pt)
+            server.multicast(column)
+            cached_data.append(column)
+        return cached_data
 
     def _data_cache(self):
-        cached_data = []
-        while len(cached_data) < self.pt.batch_size:
-            cached_data.append(self._data_fetch())
+        cached_data = self._data_fetch(self.pt.batch_size)
+        if cached_data is None:
+            return None
         data = np.float32(cached_data).T  # n_channel x n_batch_size
         if self.pt.detrend and reader.input_source != 'test':
             data = signalinfo.detrend(data)
@@ -373,6 +392,8 @@ class WebSocketMulticaster(LoopTaskInThread):
         if not self.ws_list:
             return time.sleep(1)
         data = self._data_cache()
+        if data is None:
+            return
         for ws in self.ws_list[:]:
             if not self.data_send(ws, data):
                 self.remove(ws)
@@ -66,6 +66,7 @@ class Recorder(LoopTaskInThread):
         self._data_lock    = threading.Lock()
         self._time_correct = reader.start_time
         self._reader       = reader
+        self._cursor       = None
 
         super(Recorder, self).__init__(self._recording, daemon=True)
 
@@ -130,6 +131,7 @@ class Recorder(LoopTaskInThread):
         if not super(Recorder, self).resume():
             return False
         logger.debug('Recorder %s waiting for time correction' % self.name)
+        self._cursor = None  # skip samples streamed while paused
         time.sleep(10 / self._reader.sample_rate)
         logger.debug('Recorder %s resumed' % self.name)
         return True
@@ -342,22 +344,31 @@ class Recorder(LoopTaskInThread):
     def _recording(self):
         if not self.is_recording():
             return time.sleep(0.5)
-        raw = self._reader.data_channel_t.reshape(-1, 1)
-        t1 = raw[-1, 0]
-        self._time_correct = time.time() - t1
         if self.chunk:
             for i in range(self.chunk):
                 raw = self._reader.data_all
+                if not i:
+                    t1 = raw[-1, 0]
+                    self._time_correct = time.time() - raw[-1, -1]
                 self._buffer_data.append(raw)
                 if not self.is_recording():
                     break
             if self.buffer_nbytes > self.buffer_max:
                 self.save()
         else:
+            # every sample exactly once, even if reader ingests blocks
+            if self._cursor is None:
+                self._cursor = self._reader.subscribe()
+            n = self._reader.window_size // 10 + 1
+            raw, lost = self._cursor.read(
+                n, timeout=n * self._reader.sample_time + 1)
+            if raw is None:
+                return logger.warning(self.name + ' read data timeout')
+            if lost:
+                logger.warning('%s lost %d samples' % (self.name, lost))
+            t1 = raw[-1, 0]
+            self._time_correct = time.time() - raw[-1, -1]
             self._buffer_data.append(raw)
-            for i in range(self._reader.window_size // 10):
-                raw = self._reader.data_channel_t.reshape(-1, 1)
-                self._buffer_data.append(raw)
         t2 = raw[-1, -1]
         #  self._time_correct = time.time() - t2
         logger.debug('Recording data from %.3f - %.3f' % (t1, t2))
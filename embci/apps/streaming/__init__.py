@@ -84,6 +84,12 @@ bias_output:    enabled
 input_source:   normal
 stream_control: paused
 impedance:      disabled
+samples:        52000 in 1625 blocks
+latency:        p50 0.10ms, p99 0.32ms, max 1.20ms
+jitter:         p50 0.01ms, p99 0.06ms, max 0.40ms
+overruns:       0
+dropped:        0
+consumer lag:   0, 32
 $ stream_control resume
 '''.format(addr=CMD_ADDR)
 
@@ -119,6 +125,14 @@ bias_output:    enabled
 input_source:   normal
 stream_control: closed
 impedance:      enabled
+samples:        52000 in 1625 blocks
+latency:        p50 0.10ms, p99 0.32ms, max 1.20ms
+jitter:         p50 0.01ms, p99 0.06ms, max 0.40ms
+overruns:       0
+dropped:        0
+consumer lag:   0, 32
+>>> client.metrics()['latency']  # counters & histograms as a dict
+{{'count': 1625, 'p50': 0.0001, 'p99': 0.00032, 'max': 0.0012, ...}}
 >>> print(jsonrpc.__doc__)  # for more help message on JSON-RPC
 '''.format(addr=RPC_ADDR)
 
@@ -61,9 +61,28 @@ def summary(*args):
     ret += 'stream_control:\t{}\n'.format(reader.status)
     ret += 'impedance:\t{}\n'.format(
         'enabled' if measure_impedance else 'disabled')
+    stats = reader.metrics
+    ret += 'samples:\t{samples} in {blocks} blocks\n'.format(**stats)
+    ret += 'latency:\t{}\n'.format(_format_hist(stats['latency']))
+    ret += 'jitter:\t\t{}\n'.format(_format_hist(stats['jitter']))
+    ret += 'overruns:\t{overruns}\ndropped:\t{dropped}\n'.format(**stats)
+    ret += 'consumer lag:\t{}\n'.format(
+        ', '.join(map(str, stats['lag'])) or 'no cursor')
     return ret
 
 
+def _format_hist(h):
+    if not h['count']:
+        return 'N/A'
+    return 'p50 {:.2f}ms, p99 {:.2f}ms, max {:.2f}ms'.format(
+        h['p50'] * 1e3, h['p99'] * 1e3, h['max'] * 1e3)
+
+
+def metrics(histogram=False):
+    '''Health metrics of data stream reader, see `Reader.metrics`'''
+    return reader.get_metrics(get_boolean(histogram))
+
+
 def exit(*args):
     '''Terminate this task (BE CAREFUL!)'''
     try:
@@ -231,6 +250,7 @@ def make_server():
         channel = channel, action = args and args[0] or None
     )), 'set_channel')
     server.register_function(summary, 'summary')
+    server.register_function(metrics, 'metrics')
     server.register_function(exit, 'exit')
     return server
 
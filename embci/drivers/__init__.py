@@ -28,6 +28,10 @@ Use them as an individual API module!
     - Connection:
     - Data:
     - Methods:
+
+Module `emulator` provides software ADS1299 and ESP32 devices behind
+`EmulatedADS1299_API` and `EmulatedESP32_API`, to test and benchmark the
+drivers and SPI readers without the hardware.
 '''
 
 #  from ..utils import config_logger
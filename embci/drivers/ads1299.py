@@ -20,7 +20,6 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 import time
-import struct
 import select
 try:
     from multiprocessing import Lock
@@ -95,6 +94,71 @@ SUGGESTED_MSH = np.int32([
 ])
 
 
+# =============================================================================
+# Decode raw bytes read from ADS1299
+
+def decode_int24(raw):
+    '''
+    Decode 24-bit big-endian two's complement integers (as output by
+    ADS1299) into int32.
+
+    Parameters
+    ----------
+    raw : array of uint8
+        Last axis holds bytes of samples, its length must be multiple of 3.
+
+    Returns
+    -------
+    array of int32 with the last axis shrinked to one third.
+    '''
+    raw = np.asarray(raw, np.uint8)
+    raw = raw.reshape(raw.shape[:-1] + (raw.shape[-1] // 3, 3))
+    # put bytes at the top of a big-endian int32, then shift it right
+    # arithmetically so that the sign bit is extended
+    buf = np.zeros(raw.shape[:-1] + (4, ), np.uint8)
+    buf[..., :3] = raw
+    return (buf.view('>i4')[..., 0] >> 8).astype(np.int32)
+
+
+def decode_frames(raw, n_channel=8, width=3, status=3):
+    '''
+    Decode raw bytes of any number of frames into counts at once.
+
+    Parameters
+    ----------
+    raw : bytes | bytearray | list of int | array of uint8
+        Bytes read from SPI, e.g. returned by `spidev.SpiDev.xfer2`.
+        Trailing bytes of an incomplete frame are ignored.
+    n_channel : int
+        Number of samples in each frame.
+    width : int
+        Bytes per sample: 3 for 24-bit big-endian (ADS1299) or 4 for
+        little-endian int32 (ESP32 firmware).
+    status : int
+        Number of bytes before samples in each frame, e.g. 24 status bits
+        of ADS1299 in RDATAC mode.
+
+    Returns
+    -------
+    counts : ndarray of int32
+        In shape of n_frame x n_channel.
+
+    Examples
+    --------
+    >>> decode_frames([0xC0, 0, 0] + [0x7F, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF], 2)
+    array([[8388607,      -1]], dtype=int32)
+    '''
+    if isinstance(raw, list):
+        raw = bytearray(raw)  # much faster than np.array(list)
+    if not isinstance(raw, np.ndarray):
+        raw = np.frombuffer(raw, np.uint8)
+    size = status + n_channel * width
+    frames = raw[:len(raw) // size * size].reshape(-1, size)[:, status:]
+    if width == 3:
+        return decode_int24(frames)
+    return np.ascontiguousarray(frames).view('<i4').astype(np.int32)
+
+
 # =============================================================================
 # ADS1299 API is a sub-class of spidev.SpiDev
 
@@ -112,6 +176,7 @@ class ADS1299_API(spidev.SpiDev):
     start             -- Start Read DATA Continuously, must `open` first
     close             -- Close device
     read              -- Return parsed np.ndarray data with shape of (8,)
+    read_burst        -- Return n frames read on successive DRDY as (8, n)
     read_raw          -- Return raw 8-channel * 3 = 24 bytes data
     write             -- Send bytes array to ADS1299
     write_register    -- Write one register with index and value
@@ -171,16 +236,23 @@ class ADS1299_API(spidev.SpiDev):
     +----------------------------------+-----------------------------------+
     '''
 
+    POWER_UP_DELAY = 1  # seconds to wait for power up and settling
+
     def __init__(self, scale=4.5/24/2**24, *a, **k):
         self.scale = float(scale)
-        self._DRDY = SysfsGPIO(PIN_DRDY)
+        self._DRDY = None
         # self._PWRDN = SysfsGPIO(PIN_PWRDN)
         # self._RESET = SysfsGPIO(PIN_RESET)
         # self._START = SysfsGPIO(PIN_START)
 
         self._lock = Lock()
         self._opened = False
+        self._rdatac = True  # chip wakes up in Read DATA Continuous mode
         self._start_time = 0
+        self._sample_rate = 0
+        self._burst = bytearray()
+        self._restart_counter()
+        self._input_source = INPUT_SOURCES['normal']
         self._enable_bias = False
         self._measure_impedance = False
 
@@ -209,6 +281,12 @@ class ADS1299_API(spidev.SpiDev):
         # self._START.export = True
         # self._START.direction = 'out'
         # self._START.value = 0
+        self._open_drdy()
+        self._opened = True
+
+    def _open_drdy(self):
+        '''Export DRDY pin and poll its falling edges by `self._epoll`.'''
+        self._DRDY = SysfsGPIO(PIN_DRDY)
         self._DRDY.export = True
         self._DRDY.direction = 'in'
 
@@ -219,7 +297,10 @@ class ADS1299_API(spidev.SpiDev):
         self._DRDY.edge = 'falling'
         self._epoll = select.epoll()
         self._epoll.register(self._DRDY, select.EPOLLET)
-        self._opened = True
+
+    def _close_drdy(self):
+        self._epoll.unregister(self._DRDY)
+        self._DRDY.export = False
 
     def start(self, sample_rate):
         '''
@@ -235,7 +316,7 @@ class ADS1299_API(spidev.SpiDev):
         # self._PWRDN.value=1  # we pull it up to high on PCB
         self.write(CMD_RESET)  # same as self._RESET.value=1
         #  wait for tPOR(2**18 * 666.0 / 1e9 = 0.1746) and tBG(assume 0.8254)
-        time.sleep(1)
+        time.sleep(self.POWER_UP_DELAY)
         #  Chip wakes up at RDATAC mode. Send SDATAC then config registers.
         self.write(CMD_SDATAC)
 
@@ -244,13 +325,22 @@ class ADS1299_API(spidev.SpiDev):
         self.write_register(REG_CONFIG2, 0b11010000)
         self.write_register(REG_CONFIG3, 0b11100000)
         self.write_register(REG_MISC, 0b00100000)
-        self.write_registers(REG_CHnSET_BASE, [0b01100000] * 8)
+        self.write_registers(
+            REG_CHnSET_BASE, [0b01100000 | self._input_source] * 8)
         self.write(CMD_START)  # same as self._START.value = 1
-        time.sleep(1)
+        time.sleep(self.POWER_UP_DELAY)
 
         # Start streaming data
         self.write(CMD_RDATAC)
         self._start_time = time.time()
+        self._sample_rate = sample_rate
+        self._restart_counter()
+
+        # Apply settings made before start
+        if self._enable_bias:
+            self.enable_bias = True
+        if self._measure_impedance:
+            self.measure_impedance = True
 
     def close(self):
         if not self._opened:
@@ -259,33 +349,35 @@ class ADS1299_API(spidev.SpiDev):
         self.write(CMD_STOP)
         super(ADS1299_API, self).close()
         self._start_time = 0
-        self._epoll.unregister(self._DRDY)
-        self._DRDY.export = False
+        self._close_drdy()
         # self._START.export = False
         # self._PWRDN.export = False
         # self._RESET.export = False
         self._opened = False
 
-    @ensure_start
     def set_sample_rate(self, rate):
         if rate not in SAMPLE_RATE:
             print('[ADS1299 API] choose one from supported rate!')
             print(' | '.join(list(SAMPLE_RATE.keys())))
             return
-        rate = SAMPLE_RATE[rate]
+        self._sample_rate, rate = rate, SAMPLE_RATE[rate]
+        if not self._start_time:  # rate will be set by `start`
+            return rate
         self.write(CMD_SDATAC)
         v = self.read_register(REG_CONFIG1)
         self.write_register(REG_CONFIG1, v & ~0b111 | rate)
         self.write(CMD_RDATAC)
+        self._restart_counter()
         return rate
 
-    @ensure_start
     def set_input_source(self, src):
         if src not in INPUT_SOURCES:
             print('[ADS1299 API] choose one from supported source!')
             print(' | '.join(list(INPUT_SOURCES.keys())))
             return
-        src = INPUT_SOURCES[src]
+        src = self._input_source = INPUT_SOURCES[src]
+        if not self._start_time:  # source will be set by `start`
+            return src
         self.write(CMD_SDATAC)
         vs = self.read_registers(REG_CHnSET_BASE, 8)
         vs = [(v & ~0b111 | src) for v in vs]
@@ -305,8 +397,10 @@ class ADS1299_API(spidev.SpiDev):
         return self._enable_bias
 
     @enable_bias.setter
-    @ensure_start
     def enable_bias(self, boolean):
+        if not self._start_time:  # bias will be enabled by `start`
+            self._enable_bias = boolean
+            return
         self.write(CMD_SDATAC)
         if boolean is True:
             self.write_register(REG_BIAS_SENSP, 0b11111111)
@@ -324,8 +418,10 @@ class ADS1299_API(spidev.SpiDev):
         return self._measure_impedance
 
     @measure_impedance.setter
-    @ensure_start
     def measure_impedance(self, boolean):
+        if not self._start_time:  # applied by `start`
+            self._measure_impedance = boolean
+            return
         self.write(CMD_SDATAC)
         vs = self.read_registers(REG_CHnSET_BASE, 8)
         vs = [v & ~(0b111 << 4) for v in vs]
@@ -353,20 +449,76 @@ class ADS1299_API(spidev.SpiDev):
         #  Rev.3
         self._epoll.poll()  # this will block until interrupt on DRDY detected
 
-        num = self.write([0x00] * 27)[3:]
-        byte = ''
-        for i in range(8):
-            # tmp = chr(num[3 * i + 2]) + chr(num[3 * i + 1]) + chr(num[3 * i])
-            # use time: 4.3us
-            tmp = struct.pack('3B', num[3 * i + 2], num[3 * i + 1], num[3 * i])
-            # use time: 1.3us
-            byte += tmp + ('\xff' if num[3 * i] > 127 else '\x00')
-        data = np.frombuffer(byte, np.int32)
+        #  Rev.4: 3 status bytes + 8 channels * 3 bytes, see `decode_frames`
+        data = decode_frames(self.write([0x00] * 27))[0]
         return data * self.scale, time.time() - self._start_time
 
+    def _restart_counter(self):
+        self._count = 0        # frames since the first DRDY, see read_burst
+        self._first_drdy = None
+        self._next_drdy = 0    # predicted time of next DRDY edge
+        self.missed = 0        # DRDY edges missed by read_burst
+
+    @ensure_start
+    def read_burst(self, n=32, timeout=1):
+        '''
+        Read `n` frames on successive DRDY edges and decode them at once.
+        This saves decoding and reader loop overhead per sample at high
+        sample rates (1kHz and above).
+
+        Parameters
+        ----------
+        n : int
+            Number of frames to read, i.e. wake-ups by DRDY.
+        timeout : float
+            Seconds to wait for each DRDY. Frames read before timeout are
+            returned.
+
+        Returns
+        -------
+        data : ndarray
+            In shape of 8 x m (m <= n), scaled counts.
+        ts : ndarray
+            Timestamps of the m samples derived from sample counter,
+            i.e. `t0 + k / sample_rate`, where `t0` is the time of the
+            first DRDY since `start` and `k` counts frames, including DRDY
+            edges missed because reading was too late (see `missed`).
+        '''
+        size = 27  # 3 status bytes + 8 channels * 3 bytes
+        if len(self._burst) < n * size:
+            self._burst = bytearray(n * size)
+        period = 1.0 / self._sample_rate
+        ks, m = [], 0
+        while m < n and self._epoll.poll(timeout):
+            now = time.time()
+            if self._first_drdy is None:
+                self._first_drdy, edge = now - self._start_time, now
+            else:
+                # wake-up is always after DRDY edge, a whole period or more
+                # later than predicted means edges were missed
+                lag = now - self._next_drdy
+                skipped = int(lag // period) if lag > 0 else 0
+                self._count += skipped
+                self.missed += skipped
+                err = lag - skipped * period
+                # follow drift of the clock slowly, ignore wake-up latency
+                edge = now if err < 0 else now - err * 0.9
+            self._next_drdy = edge + period
+            self._burst[m * size:(m + 1) * size] = self.write([0x00] * size)
+            ks.append(self._count)
+            self._count += 1
+            m += 1
+        data = decode_frames(memoryview(self._burst)[:m * size])
+        ts = (self._first_drdy or 0) + np.array(ks, np.float64) * period
+        return data.T * self.scale, ts
+
     def write(self, byte_array):
         '''Write bytes array to ADS1299 through SPI and return value list.'''
-        if not isinstance(byte_array, list):
+        if isinstance(byte_array, int):  # single command
+            if byte_array in (CMD_RESET, CMD_SDATAC, CMD_RDATAC):
+                self._rdatac = byte_array != CMD_SDATAC
+            byte_array = [byte_array]
+        elif not isinstance(byte_array, list):
             byte_array = list(byte_array)
         with self._lock:
             value = self.xfer2(byte_array)
@@ -383,17 +535,19 @@ class ADS1299_API(spidev.SpiDev):
     @ensure_start
     def read_register(self, reg):
         '''Read single register at `reg`'''
-        self.write(CMD_SDATAC)
-        value = self.write([CMD_RREG | reg, 0x00, 0x00])[2]
-        self.write(CMD_RDATAC)
-        return value
+        return self.read_registers(reg, 1)[0]
 
     @ensure_start
     def read_registers(self, reg, num):
         '''Read `num` registers start from `reg`'''
-        self.write(CMD_SDATAC)
+        # RREG is ignored in RDATAC mode. Callers that are writing registers
+        # have sent SDATAC already, and expect it to be kept.
+        rdatac = self._rdatac
+        if rdatac:
+            self.write(CMD_SDATAC)
         value = self.write([CMD_RREG | reg, num - 1] + [0] * num)[2:]
-        self.write(CMD_RDATAC)
+        if rdatac:
+            self.write(CMD_RDATAC)
         return value
 
 
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/embci/drivers/emulator.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-18 00:12:45
+
+'''
+Software emulators of SPI devices, for testing and benchmarking drivers
+and readers on any Linux box (no `/dev/spidev*` or GPIO needed).
+
+- `ADS1299Device` models the ADS1299 chip: register set, SPI commands,
+  RDATAC / SDATAC modes, and one DRDY falling edge per conversion.
+- `ESP32Device` models the EmBCI ESP32 firmware: virtual registers written
+  by commands in the first bytes of a transfer (see `embci.drivers.esp32`),
+  and a FIFO of samples returned in batches as little-endian int32.
+
+Devices generate samples at the programmed sample rate in real time, or as
+fast as they are polled with `realtime=False` (for throughput benchmarks).
+`EmulatedADS1299_API` and `EmulatedESP32_API` are drop-in replacements of
+`ADS1299_API` and `ESP32_API` talking to these devices::
+
+    >>> from embci.io import ESP32SPIReader
+    >>> reader = ESP32SPIReader(500, 2, 8, API=EmulatedESP32_API)
+    >>> reader.start(device=(0, 0))
+
+Samples are in volts, from `embci.io.SignalGenerator` by default.
+'''
+
+# built-in
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import time
+import select
+import threading
+import collections
+
+# requirements.txt: data: numpy
+# requirements.txt: drivers: spidev
+import spidev
+import numpy as np
+
+from .ads1299 import (
+    ADS1299_API, SAMPLE_RATE, INPUT_SOURCES, REG_CONFIG1, REG_CONFIG2,
+    REG_CHnSET_BASE, CMD_WAKEUP, CMD_STANDBY, CMD_RESET, CMD_START, CMD_STOP,
+    CMD_RDATAC, CMD_SDATAC, CMD_RDATA, CMD_RREG, CMD_WREG
+)
+from .esp32 import (
+    ESP32_API, RESET, START, STOP, WREG,
+    REG_SR, REG_IS, REG_BIAS, REG_IMP, REG_CH
+)
+
+__all__ = [
+    'ADS1299Device', 'ESP32Device', 'EmulatedSpiDev',
+    'EmulatedADS1299_API', 'EmulatedESP32_API',
+]
+
+VREF = 4.5
+GAINS = (1, 2, 4, 6, 8, 12, 24)  # PGA gain of bits 6:4 in CHnSET
+RATES = {code: rate for rate, code in SAMPLE_RATE.items()}
+SOURCES = {code: src for src, code in INPUT_SOURCES.items()}
+
+
+def default_source(sample_rate, seed=None):
+    '''8-channel EEG-like signals of SSVEP, alpha and mains noise.'''
+    from ..io.synthetic import SignalGenerator  # embci.io imports drivers
+    return SignalGenerator(
+        sample_rate, 8, seed=seed, ssvep=[8, 10, 12, 15],
+        alpha=20, mains=5, noise=10).generate
+
+
+class ADS1299Device(object):
+    '''
+    Register-level emulator of ADS1299 behind SPI and DRDY.
+
+    Parameters
+    ----------
+    source : callable, optional
+        Called as `source(sample_rate)` to get a function `generate(n)`
+        returning next n samples of 8 channels in volts, i.e. in shape of
+        8 x n. Called again when sample rate is changed. Default
+        `default_source`.
+    seed : int, optional
+        Seed of the default source.
+    realtime : bool
+        Convert samples at the sample rate of wall clock (default). If
+        False, the device runs on a virtual clock that jumps to the next
+        DRDY whenever it is polled, i.e. as fast as the host reads. Then
+        the timestamps and `missed` counts of drivers are meaningless.
+    ppm : float
+        Error of the sample clock in parts per million, e.g. 50 makes the
+        actual sample rate 0.005% higher than programmed.
+
+    Attributes
+    ----------
+    registers : bytearray
+        Values of the 24 registers.
+    overruns : int
+        Number of samples converted but never read out.
+    '''
+    N_REGISTER = 0x18
+    STATUS = [0xC0, 0x00, 0x00]  # 1100 + LOFF_STATP + LOFF_STATN + GPIO
+
+    def __init__(self, source=None, seed=None, realtime=True, ppm=0.0):
+        self.source = source or (lambda fs: default_source(fs, seed))
+        self.realtime = realtime
+        self.ppm = ppm
+        self._vtime = 0.0
+        self._cond = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        '''Power-on reset: default registers, stop conversion, RDATAC.'''
+        self.registers = bytearray(self.N_REGISTER)
+        self.registers[:REG_CHnSET_BASE + 8] = bytearray(
+            [0x3E, 0x96, 0xC0, 0x60, 0x00] + [0x61] * 8)
+        self.rdatac, self.running = True, False
+        self.overruns = 0
+        self._generate = None
+        self._ahead = np.zeros((8, 0))  # samples generated in advance
+        self._t0 = self._count = 0  # time of START, samples converted
+        self._edges = 0             # DRDY edges seen by `poll`
+        self._latest = np.zeros(8)
+
+    # =========================================================================
+    # Sample clock
+
+    def clock(self):
+        return time.time() if self.realtime else self._vtime
+
+    @property
+    def sample_rate(self):
+        return RATES.get(self.registers[REG_CONFIG1] & 0b111, 250)
+
+    @property
+    def period(self):
+        return 1.0 / self.sample_rate / (1 + self.ppm * 1e-6)
+
+    def _converted(self, now=None):
+        '''Number of conversions done since START.'''
+        if not self.running:
+            return self._count
+        now = self.clock() if now is None else now
+        # tolerate rounding error of virtual clock set to times of DRDY
+        return max(int((now - self._t0) / self.period + 1e-9), 0)
+
+    def _restart(self):
+        '''Start conversions (again) from now.'''
+        self._generate = self.source(self.sample_rate)
+        self._ahead = np.zeros((8, 0))
+        self._t0, self._count, self._edges = self.clock(), 0, 0
+        self.running = True
+
+    def _convert(self):
+        '''Convert samples up to now, return them in volts.'''
+        n = self._converted() - self._count
+        if n <= 0 or self._generate is None:
+            return np.zeros((8, 0))
+        if self._ahead.shape[1] < n:
+            # generate 0.1 second at least, much faster than one by one
+            self._ahead = np.hstack([self._ahead, self._generate(
+                max(n, self.sample_rate // 10))])
+        data, self._ahead = self._ahead[:, :n], self._ahead[:, n:]
+        data = data.copy()
+        self._count += n
+        return self._frontend(data)
+
+    def _frontend(self, data):
+        '''Apply input multiplexer and power-down of each channel.'''
+        for ch in range(8):
+            chset = self.registers[REG_CHnSET_BASE + ch]
+            src = SOURCES.get(chset & 0b111)
+            if chset & 0x80:                         # channel powered down
+                data[ch] = 0
+            elif src == 'shorted':
+                data[ch] = 0
+            elif src == 'mvdd':                      # (AVDD + AVSS) / 2
+                data[ch] = 2.5 / self._gain(ch)
+            elif src == 'temper':                    # 25 degree Celsius
+                data[ch] = 0.1453
+            elif src == 'test':                      # square wave of 1.875mV
+                fclk = 2.048e6 / (2**20 if self.registers[REG_CONFIG2] & 1
+                                  else 2**21)
+                k = self._count - data.shape[1] + np.arange(data.shape[1])
+                phase = (k * self.period * fclk) % 1
+                data[ch] = np.where(phase < 0.5, 1.875e-3, -1.875e-3)
+        return data
+
+    def _gain(self, ch):
+        code = self.registers[REG_CHnSET_BASE + ch] >> 4 & 0b111
+        return GAINS[min(code, len(GAINS) - 1)]
+
+    def _counts(self, data):
+        '''Convert volts (8 x n) into 24-bit integer counts.'''
+        gains = np.array([self._gain(ch) for ch in range(8)])
+        counts = np.round(data * gains[:, None] * 2**24 / VREF)
+        return np.clip(counts, -2**23, 2**23 - 1).astype(np.int32)
+
+    # =========================================================================
+    # DRDY
+
+    def fileno(self):
+        return -1
+
+    def _ready(self):
+        '''Whether a DRDY edge happened since last poll.'''
+        return self.running and self._converted() > self._edges
+
+    def poll(self, timeout=-1):
+        '''
+        Wait for DRDY falling edge like `select.epoll.poll` registered with
+        edge trigger. Timeout in seconds, negative or None to block.
+        '''
+        with self._cond:
+            deadline = None if timeout is None or timeout < 0 \
+                else time.time() + timeout
+            while not self._ready():
+                if not self.realtime and self.running:
+                    self._vtime = self._t0 + self.period * (self._edges + 1)
+                    break
+                wait = (self._t0 + self.period * (self._edges + 1) -
+                        time.time()) if self.running else 0.1
+                if deadline is not None:
+                    wait = min(wait, deadline - time.time())
+                    if wait <= 0:
+                        return []
+                self._cond.wait(max(wait, 0))
+            self._edges = self._converted()
+            return [(self.fileno(), select.EPOLLIN)]
+
+    def register(self, *a, **k):
+        pass
+
+    unregister = register
+
+    # =========================================================================
+    # SPI
+
+    def transfer(self, data):
+        '''Shift bytes in `data` into device, return bytes shifted out.'''
+        data = list(data)
+        with self._cond:
+            out = [0x00] * len(data)
+            if self.rdatac and data[0] not in (CMD_SDATAC, CMD_RESET,
+                                               CMD_STOP, CMD_START):
+                # RDATAC: read the latest sample, other commands ignored
+                frame = self._frame()
+                out[:len(frame)] = frame[:len(out)]
+                return out
+            i = 0
+            while i < len(data):
+                i = self._command(data, i, out)
+            self._cond.notify_all()
+            return out
+
+    def _frame(self):
+        '''Status word + 8 channels of 24-bit big-endian counts.'''
+        data = self._convert()
+        if data.shape[1]:
+            self.overruns += data.shape[1] - 1
+            self._latest = data[:, -1]
+        counts = self._counts(self._latest[:, None])[:, 0]
+        raw = counts.astype('>i4').view(np.uint8).reshape(8, 4)[:, 1:]
+        return self.STATUS + raw.ravel().tolist()
+
+    def _command(self, data, i, out):
+        '''Execute command at `data[i]`, return index of next command.'''
+        cmd = data[i]
+        if cmd == CMD_RESET:
+            self.reset()
+        elif cmd == CMD_START:
+            self._restart()
+        elif cmd == CMD_STOP:
+            self._convert()
+            self.running = False
+        elif cmd == CMD_RDATAC:
+            self.rdatac = True
+        elif cmd == CMD_SDATAC:
+            self.rdatac = False
+        elif cmd == CMD_RDATA:
+            frame = self._frame()
+            n = min(len(frame), len(data) - i - 1)
+            out[i + 1:i + 1 + n] = frame[:n]
+            return i + 1 + len(frame)
+        elif cmd & 0xE0 in (CMD_RREG, CMD_WREG) and i + 1 < len(data):
+            reg, num = cmd & 0x1F, data[i + 1] + 1
+            num = min(num, len(data) - i - 2, self.N_REGISTER - reg)
+            if cmd & 0xE0 == CMD_RREG:
+                out[i + 2:i + 2 + num] = self.registers[reg:reg + num]
+            else:
+                self._write_registers(reg, data[i + 2:i + 2 + num])
+            return i + 2 + num
+        elif cmd not in (0x00, CMD_WAKEUP, CMD_STANDBY):
+            raise ValueError('invalid ADS1299 command 0x%02X' % cmd)
+        return i + 1
+
+    def _write_registers(self, reg, values):
+        rate = self.sample_rate
+        for i, value in enumerate(values):
+            if reg + i == 0:  # ID register is read only
+                continue
+            self.registers[reg + i] = value & 0xFF
+        if self.running and self.sample_rate != rate:
+            self._restart()
+
+
+class ESP32Device(ADS1299Device):
+    '''
+    Emulator of the EmBCI ESP32 firmware buffering samples of ADS1299.
+
+    The host clocks out `32 * n` bytes to read n samples (8 channels of
+    little-endian int32). If the transfer starts with a command, e.g.
+    `[WREG, REG_SR, code]`, the firmware executes it and the samples are
+    not valid. DRDY falls when at least as many samples as in the last
+    transfer are buffered.
+
+    Parameters
+    ----------
+    fifo : int
+        Capacity of the sample buffer. Oldest samples are dropped when it
+        is full and counted in `overruns`.
+    coalesce : bool
+        Emulate firmware that executes commands packed back to back in the
+        first 32 bytes (terminated by 0x00) after shifting samples out,
+        see `ESP32_API`. Default False as the shipped firmware.
+    *a, **k
+        See `ADS1299Device`.
+
+    Attributes
+    ----------
+    underruns : int
+        Number of samples read before they were converted (sent as zeros).
+    bias, impedance : bool
+    '''
+    def __init__(self, fifo=1024, coalesce=False, *a, **k):
+        self.fifo = fifo
+        self.coalesce = coalesce
+        super(ESP32Device, self).__init__(*a, **k)
+
+    def reset(self):
+        super(ESP32Device, self).reset()
+        self._buffer = collections.deque()
+        self._batch = 32
+        self.underruns = 0
+        self.bias = self.impedance = False
+        self.rdatac = False
+        # firmware configures ADS1299 for normal electrode input
+        self.registers[REG_CHnSET_BASE:REG_CHnSET_BASE + 8] = bytearray(
+            [0x60] * 8)
+        self._restart()  # firmware starts ADS1299 on boot
+
+    def _fill(self):
+        data = self._convert()
+        if data.shape[1]:
+            self._buffer.extend(self._counts(data).T)
+        while len(self._buffer) > self.fifo:
+            self._buffer.popleft()
+            self.overruns += 1
+
+    def _ready(self):
+        self._fill()
+        return len(self._buffer) >= self._batch
+
+    def poll(self, timeout=-1):
+        with self._cond:
+            deadline = None if timeout is None or timeout < 0 \
+                else time.time() + timeout
+            while not self._ready():
+                if self.running:
+                    # time when the batch is buffered
+                    due = self._t0 + self.period * (
+                        self._count + self._batch - len(self._buffer))
+                    if not self.realtime:
+                        self._vtime = due
+                        continue
+                    wait = due - time.time()
+                else:
+                    wait = 0.1
+                if deadline is not None:
+                    wait = min(wait, deadline - time.time())
+                    if wait <= 0:
+                        return []
+                self._cond.wait(max(wait, 0))
+            return [(self.fileno(), select.EPOLLIN)]
+
+    def transfer(self, data):
+        data = list(data)
+        with self._cond:
+            n = len(data) // 32
+            self._batch = max(n, 1)
+            cmd = data[0]
+            if cmd and not self.coalesce:  # command instead of samples
+                if cmd == RESET:
+                    self.reset()
+                elif cmd == START:
+                    self._restart()
+                elif cmd == STOP:
+                    self.running = False
+                elif cmd == WREG and len(data) > 2:
+                    self._virtual_register(data[1], data[2:4])
+                self._cond.notify_all()
+                return [0x00] * len(data)
+            # samples are loaded to be shifted out before packed commands
+            self._fill()
+            k = min(n, len(self._buffer))
+            counts = [self._buffer.popleft() for _ in range(k)]
+            self.underruns += n - k
+            out = np.zeros((n, 8), '<i4')
+            if k:
+                out[:k] = counts
+            if self.coalesce:
+                self._commands(data[:32])
+            self._cond.notify_all()
+            return out.view(np.uint8).ravel().tolist() + \
+                [0x00] * (len(data) - 32 * n)
+
+    def _commands(self, data):
+        '''Execute commands packed back to back until 0x00.'''
+        i = 0
+        while i < len(data) and data[i]:
+            cmd = data[i]
+            if cmd == RESET:
+                self.reset()
+            elif cmd == START:
+                self._restart()
+            elif cmd == STOP:
+                self.running = False
+            elif cmd == WREG and i + 2 < len(data):
+                size = 2 if data[i + 1] == REG_CH else 1
+                self._virtual_register(data[i + 1], data[i + 2:i + 2 + size])
+                i += 1 + size
+            else:
+                raise ValueError('invalid ESP32 command 0x%02X' % cmd)
+            i += 1
+
+    def _virtual_register(self, reg, values):
+        chset = self.registers[REG_CHnSET_BASE:REG_CHnSET_BASE + 8]
+        if reg == REG_SR and values[0] in RATES:
+            self._write_registers(REG_CONFIG1, [
+                self.registers[REG_CONFIG1] & ~0b111 | values[0]])
+            self._buffer.clear()
+        elif reg == REG_IS and values[0] in SOURCES:
+            self._write_registers(REG_CHnSET_BASE, [
+                v & ~0b111 | values[0] for v in chset])
+        elif reg == REG_CH and len(values) > 1 and 0 <= values[0] < 8:
+            v = chset[values[0]]
+            self._write_registers(REG_CHnSET_BASE + values[0], [
+                v & ~0x80 if values[1] else v | 0x80])
+        elif reg == REG_BIAS:
+            self.bias = bool(values[0])
+        elif reg == REG_IMP:
+            self.impedance = bool(values[0])
+
+
+class EmulatedSpiDev(spidev.SpiDev):
+    '''
+    `spidev.SpiDev` connected to an emulated device instead of
+    `/dev/spidev*`. Mix it into driver classes after the driver, e.g.
+    `class API(ADS1299_API, EmulatedSpiDev)`, so that `open`, `close` and
+    `xfer2` of the driver talk to `self.device`.
+    '''
+    mode = 0
+    max_speed_hz = 0
+
+    def open(self, bus, device):
+        self.bus, self.cs = bus, device
+
+    def close(self):
+        pass
+
+    def xfer2(self, values, *a):
+        return self.device.transfer(values)
+
+    xfer = xfer2
+
+    def _open_drdy(self):
+        self._epoll = self.device
+
+    def _close_drdy(self):
+        pass
+
+
+class EmulatedADS1299_API(ADS1299_API, EmulatedSpiDev):
+    '''
+    ADS1299_API connected to an `ADS1299Device`. Keyword arguments other
+    than `scale` are passed to the device.
+    '''
+    POWER_UP_DELAY = 0
+
+    def __init__(self, scale=4.5/24/2**24, **k):
+        self.device = ADS1299Device(**k)
+        super(EmulatedADS1299_API, self).__init__(scale)
+
+    # DRDY by emulated device instead of GPIO
+    _open_drdy = EmulatedSpiDev._open_drdy
+    _close_drdy = EmulatedSpiDev._close_drdy
+
+
+class EmulatedESP32_API(ESP32_API, EmulatedSpiDev):
+    '''
+    ESP32_API connected to an `ESP32Device`. Keyword arguments other than
+    those of `ESP32_API` are passed to the device.
+    '''
+    def __init__(self, n_batch=32, scale=4.5/24/2**24, adaptive=False,
+                 max_latency=None, coalesce=False, **k):
+        self.device = ESP32Device(coalesce=coalesce, **k)
+        super(EmulatedESP32_API, self).__init__(
+            n_batch, scale, adaptive, max_latency, coalesce)
+
+    _open_drdy = EmulatedSpiDev._open_drdy
+    _close_drdy = EmulatedSpiDev._close_drdy
+
+
+# THE END
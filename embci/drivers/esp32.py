@@ -12,13 +12,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 import time
-import struct
-from multiprocessing import Queue
+import multiprocessing as mp
 
 # requirements.txt: data: numpy
 import numpy as np
 
-from .ads1299 import ADS1299_API, ensure_start, SAMPLE_RATE, INPUT_SOURCES
+from .ads1299 import (
+    ADS1299_API, ensure_start, decode_frames, SAMPLE_RATE, INPUT_SOURCES
+)
 
 # =============================================================================
 # ESP32 Pin mapping
@@ -43,6 +44,69 @@ REG_BIAS = 0x54  # noqa: E221  enable_bias
 REG_IMP  = 0x56  # noqa: E221  measure_impedance
 REG_CH   = 0x58  # noqa: E221  enable / disable channel
 
+RATES = {code: rate for rate, code in SAMPLE_RATE.items()}
+
+
+class CommandQueue(object):
+    '''
+    Pending writes of ESP32 virtual registers, shared among processes (e.g.
+    settings changed by the main process of a reader running in another).
+
+    Writing a register again before it is sent replaces the pending value
+    (last write wins), so toggling settings quickly costs one command per
+    register at most. `pack` takes pending commands as bytes to be sent
+    back to back in one transfer. Writes to other registers are forwarded
+    unchanged and in order, one per transfer, because their length is not
+    known by the firmware.
+
+    Examples
+    --------
+    >>> queue = CommandQueue()
+    >>> queue.put(REG_CH, [2, 0]); queue.put(REG_CH, [2, 1])
+    >>> queue.put(REG_BIAS, [1])
+    >>> queue.pack(32)
+    ([64, 84, 1, 64, 88, 2, 1], [(84, 1), (88, 1)])
+    '''
+    # sample rate goes first, channels 0 ~ 8 are separate registers
+    KEYS = [(REG_SR, ), (REG_IS, ), (REG_BIAS, ), (REG_IMP, )] + \
+        [(REG_CH, ch) for ch in range(9)]
+
+    def __init__(self):
+        self._values = mp.Array('i', [-1] * len(self.KEYS))  # -1: none
+        self._others = mp.Queue()
+
+    def __len__(self):
+        return sum(v >= 0 for v in self._values[:]) + self._others.qsize()
+
+    def put(self, reg, values):
+        '''Queue writing `values` to virtual register `reg`.'''
+        key = (reg, values[0]) if reg == REG_CH else (reg, )
+        if key in self.KEYS:
+            self._values[self.KEYS.index(key)] = values[-1]
+        else:  # other registers are forwarded unchanged, in order
+            self._others.put([WREG, reg] + list(values))
+
+    def pack(self, size):
+        '''
+        Take pending commands that fit in `size` bytes. Returns bytes of
+        commands and list of `(reg, value)` taken. The rest are left for
+        next transfer. A write to other registers is taken alone as
+        `(reg, values)` when no known register is pending.
+        '''
+        raw, taken = [], []
+        with self._values.get_lock():
+            for i, value in enumerate(self._values[:]):
+                cmd = [WREG] + list(self.KEYS[i]) + [value]
+                if value < 0 or len(raw) + len(cmd) > size:
+                    continue
+                raw += cmd
+                taken.append((self.KEYS[i][0], value))
+                self._values[i] = -1
+        if not raw and not self._others.empty():
+            raw = self._others.get()
+            taken.append((raw[1], raw[2:]))
+        return raw, taken
+
 
 class ESP32_API(ADS1299_API):
     '''
@@ -53,18 +117,38 @@ class ESP32_API(ADS1299_API):
     See Also
     --------
     embci.drivers.ads1299.ADS1299_API
+
+    Notes
+    -----
+    Register writes are queued in a `CommandQueue`, where writing the same
+    register again replaces the pending value. The shipped firmware reads
+    one command from the first 4 bytes of a transfer and sends no valid
+    samples in it, so one command is sent per batch and that batch is
+    dropped. Set `coalesce` only for firmware that parses commands packed
+    back to back (up to 32 bytes, terminated by 0x00) while streaming
+    samples: all pending commands then go with the next batch, which is
+    kept.
     '''
-    def __init__(self, n_batch=32, scale=4.5/24/2**24, *a, **k):
+    BATCH_LIMITS = (1, 128)  # 32 bytes per sample, spidev bufsiz is 4096
+
+    def __init__(self, n_batch=32, scale=4.5/24/2**24, adaptive=False,
+                 max_latency=None, coalesce=False, *a, **k):
         # send `nBatchs * 4Bytes * 8chs` 0x00
         # first 4Bytes is reserved for command to control ESP32
         # [cmd cmd cmd cmd 0x00 0x00 0x00 0x00 ... 0x00]
         self.n_batch = n_batch
-        self._tosend = 4 * 8 * self.n_batch * [0x00]
-        self._data_format = '%dB' % len(self._tosend)
-        self._cmd_queue = Queue()
-        self._data_buffer = []
+        self.adaptive = adaptive
+        self.max_latency = max_latency
+        self.coalesce = coalesce
+        self.load = 0.0  # time spent by caller / duration of batch
+        self._commands = CommandQueue()
         super(ESP32_API, self).__init__(scale)
-        self._last_time = time.time()
+        self._clear_buffer()
+
+    def _clear_buffer(self):
+        self._data_buffer = np.zeros((8, 0))
+        self._ts_buffer = np.zeros(0)
+        self._returned = None  # time when last batch was returned
 
     def open(self, dev, mode=0, max_speed_hz=12.5e6):
         '''ESP32 SPI mode set to 0b00 (CPOL=0 & CPHA=0)'''
@@ -85,44 +169,118 @@ class ESP32_API(ADS1299_API):
     def close(self):
         if not self._opened:
             return
-        self._data_buffer = []
+        self._clear_buffer()
         super(ADS1299_API, self).close()
         self._start_time = 0
-        self._epoll.unregister(self._DRDY)
-        self._DRDY.export = False
+        self._close_drdy()
         self._opened = False
 
     @ensure_start
     def read(self, timeout=1, *args, **kwargs):
-        if not self._cmd_queue.empty():
-            cmd = self._cmd_queue.get()
-            self.write(cmd + self._tosend[len(cmd):])
-            self._data_buffer = []
-            return np.zeros(8, np.float32), self._last_time - self._start_time
-
-        if not len(self._data_buffer):
-            # spidev lib is written in C language, where value of list will be
-            # changed in-situ. Because we want self._tosend keep as [0x00] * n,
-            # self._tosend cannot be directly used in self.xfer[2]. Here we
-            # send a new list created by slicing self._tosend.
-            data = struct.pack(self._data_format, *self.write(self._tosend[:]))
-            data = np.frombuffer(data, np.int32).reshape(self.n_batch, 8)
-            self._data_buffer = list(data * self.scale)
-
-        ts = time.time()
-        while (time.time() - ts) < timeout:
-            dt = time.time() - self._last_time
-            if dt < (0.5 / self._sample_rate):
-                time.sleep(0.4 / self._sample_rate)
-            elif dt < (0.9 / self._sample_rate):
-                time.sleep(0)
-            elif dt > (1.1 / self._sample_rate):
-                self._last_time = time.time()
-                break
-            else:
-                self._last_time += 1.0 / self._sample_rate
-                break
-        return self._data_buffer.pop(0), self._last_time - self._start_time
+        '''
+        Return next sample in the buffered batch, read a new batch when the
+        buffer runs out. Prefer `read_burst` to get whole batches.
+        '''
+        if not len(self._ts_buffer):
+            self._data_buffer, self._ts_buffer = self.read_burst(
+                timeout=timeout)
+            if not len(self._ts_buffer):  # command sent or timeout
+                return np.zeros(8, np.float32), time.time() - self._start_time
+        data, ts = self._data_buffer[:, 0], self._ts_buffer[0]
+        self._data_buffer = self._data_buffer[:, 1:]
+        self._ts_buffer = self._ts_buffer[1:]
+        return data, ts
+
+    @ensure_start
+    def read_burst(self, n=None, timeout=1):
+        '''
+        Read a batch of samples buffered by ESP32 in one transfer.
+
+        Parameters
+        ----------
+        n : int, optional
+            Number of samples in the batch, default `n_batch`, which is
+            adjusted after each batch if `adaptive` is True.
+        timeout : float
+            Seconds to wait for the batch to be ready.
+
+        Returns
+        -------
+        data : ndarray
+            In shape of 8 x n, scaled counts. Empty (8 x 0) on timeout, if
+            the transfer was taken by a command (unless `coalesce`) or
+            when sample rate is changed (counting restarts).
+        ts : ndarray
+            Timestamps of the n samples derived from sample counter, see
+            `ADS1299_API.read_burst`. Samples are counted as `missed` if
+            they are discarded for a command or the batch is more than its
+            duration late.
+
+        Notes
+        -----
+        With `adaptive` set, the batch doubles when the caller spends more
+        than half of a batch duration between two batches (CPU pressure)
+        and halves when it spends less than a tenth, so that latency stays
+        low when possible. Set `max_latency` (seconds) to limit the batch
+        size in low-latency modes. Batch size is bounded by `BATCH_LIMITS`.
+        '''
+        if self.adaptive and n is None and self._returned is not None:
+            self._adapt(time.time() - self._returned)
+        n = self._batch_size(n)
+        if not self._epoll.poll(timeout):
+            return np.zeros((8, 0)), np.zeros(0)
+        now = time.time()
+        cmds, taken = self._commands.pack(32 if self.coalesce else 4)
+        # spidev lib is written in C language, where value of list will be
+        # changed in-situ, so send a new list every time.
+        raw = super(ESP32_API, self).write(
+            cmds + [0x00] * (32 * n - len(cmds)))
+        self._returned = time.time()
+        for reg, value in taken:
+            if reg == REG_SR:  # also set in this process
+                self._sample_rate = RATES[value]
+                self._restart_counter()
+                return np.zeros((8, 0)), np.zeros(0)
+        ts = self._stamp(now, n)
+        if taken and not self.coalesce:
+            self.missed += n  # keep timestamps of next batch continuous
+            return np.zeros((8, 0)), ts[:0]
+        return decode_frames(raw, 8, 4, 0).T * self.scale, ts
+
+    def _batch_size(self, n=None):
+        lo, hi = self.BATCH_LIMITS
+        if self.max_latency is not None:
+            hi = min(hi, int(self.max_latency * self._sample_rate))
+        n = int(min(max(n or self.n_batch, lo), max(hi, lo)))
+        self.n_batch = n
+        return n
+
+    def _adapt(self, busy):
+        '''Adjust `n_batch` to time spent by caller between batches.'''
+        self.load += 0.25 * (busy * self._sample_rate / self.n_batch -
+                             self.load)
+        if self.load > 0.5:
+            self.n_batch, self.load = self.n_batch * 2, self.load / 2
+        elif self.load < 0.1 and self.n_batch > 1:
+            self.n_batch, self.load = self.n_batch // 2, self.load * 2
+
+    def _stamp(self, now, n):
+        '''Counter-derived timestamps of `n` samples ready at `now`.'''
+        period = 1.0 / self._sample_rate
+        now -= self._start_time
+        if self._first_drdy is None:
+            self._first_drdy = now - (n - 1) * period
+        else:
+            # ESP32 buffers samples so waking up late is fine, unless it is
+            # later than the duration of the whole batch
+            lag = now - self._first_drdy - (self._count + n - 1) * period
+            if lag > n * period:
+                skipped = int(lag / period + 0.5)
+                self._count += skipped
+                self.missed += skipped
+        ks = self._count + np.arange(n)
+        self._count += n
+        return self._first_drdy + ks * period
 
     @ensure_start
     def write(self, byte_array):
@@ -130,12 +288,12 @@ class ESP32_API(ADS1299_API):
         return super(ESP32_API, self).write(byte_array)
 
     def write_register(self, reg, byte):
-        '''Write register `reg` with value `byte`'''
-        self._cmd_queue.put([WREG, reg, byte])
+        '''Write register `reg` with value `byte` in next transfer'''
+        self._commands.put(reg, [byte])
 
     def write_registers(self, reg, byte_array):
-        '''Write registers start from `reg` with values `byte_array`'''
-        self._cmd_queue.put([WREG, reg] + list(byte_array))
+        '''Write register `reg` with values `byte_array` in next transfer'''
+        self._commands.put(reg, list(byte_array))
 
     def read_register(self, reg):
         '''
@@ -14,5 +14,10 @@ test = PytestRunner(__name__)
 del PytestRunner
 
 from .base import *                                                # noqa: W401
+from .buffers import *                                             # noqa: W401
+from .protocol import *                                            # noqa: W401
+from .ingest import *                                              # noqa: W401
+from .synthetic import *                                           # noqa: W401
+from .metrics import *                                             # noqa: W401
 from .readers import *                                             # noqa: W401
 from .commanders import *                                          # noqa: W401
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/embci/io/aio.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 22:18:40
+
+'''
+Asynchronous streaming of samples from readers, for Python 3.5+ only.
+
+This module is not imported by `embci.io` (so that Python 2 can still
+import the package). Use it through `reader.stream`::
+
+    async for block in reader.stream(50):
+        print(block.shape)  # (num_channel + 1) x 50
+
+Each stream holds its own `Cursor`, so any number of coroutines can share
+one reader without stealing samples from each other. Waiting never blocks
+the event loop: for each reader buffer and event loop, a `_Waker` thread
+waits for new samples on behalf of all streams and wakes up those whose
+blocks are ready through `loop.call_soon_threadsafe`. The thread stops
+after a few seconds without waiting streams.
+
+Streams are pulled by consumers: samples not read yet stay in the buffer,
+and a slow consumer only falls behind (backpressure without affecting the
+reader or other consumers). It loses the oldest samples when they are
+overwritten, or can skip to the latest samples with `maxlag`.
+'''
+
+# built-in
+from __future__ import absolute_import, division, print_function
+import time
+import asyncio
+import weakref
+import threading
+
+__all__ = ['ReaderStream']
+
+# event loop => {buffer => _Waker}
+_wakers = weakref.WeakKeyDictionary()
+
+
+class _Waker(object):
+    '''Wake up futures in `loop` when buffer `ring` reaches sequences.'''
+    LINGER = 5  # seconds to keep thread alive without waiters
+
+    def __init__(self, ring, loop):
+        self.ring, self.loop = ring, loop
+        self._waiters = {}  # future => target sequence
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @classmethod
+    def get(cls, ring, loop):
+        wakers = _wakers.setdefault(loop, weakref.WeakKeyDictionary())
+        if ring not in wakers:
+            wakers[ring] = cls(ring, loop)
+        return wakers[ring]
+
+    def wait(self, sequence):
+        '''Future done when `sequence` samples have been written.'''
+        future = self.loop.create_future()
+        with self._cond:
+            self._waiters[future] = sequence
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='Waker', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def discard(self, future):
+        with self._cond:
+            self._waiters.pop(future, None)
+
+    def _wake(self):
+        '''Executed in event loop.'''
+        sequence = self.ring.sequence
+        with self._cond:
+            for future, target in list(self._waiters.items()):
+                if future.done():
+                    del self._waiters[future]
+                elif target <= sequence:
+                    future.set_result(sequence)
+                    del self._waiters[future]
+
+    def _run(self):
+        seen, idle = -1, time.time()
+        while True:
+            with self._cond:
+                if not self._waiters:
+                    if time.time() - idle > self.LINGER:
+                        self._thread = None
+                        return
+                    self._cond.wait(1)
+                    continue
+                target = min(self._waiters.values())
+            idle = time.time()
+            if self.ring.sequence < seen:  # writer restarted
+                seen = -1
+            # do not wake up again for samples woken up already
+            if not self.ring.wait(max(target, seen + 1), 0.2):
+                continue
+            seen = self.ring.sequence
+            try:
+                self.loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:  # event loop closed
+                with self._cond:
+                    self._thread = None
+                    return
+
+
+class ReaderStream(object):
+    '''
+    Asynchronous iterator of sample blocks from a reader.
+
+    Parameters
+    ----------
+    reader : BaseReader | AttachedReader
+    n : int, optional
+        Number of samples per block. Default all new samples (at least one).
+    position : int, optional
+        Sequence number of the first sample, default only new samples.
+    timestamp : bool
+        Append timestamps as the last row, default True.
+    maxlag : int, optional
+        If more than `maxlag` samples are waiting when next block is asked,
+        skip to the latest ones, e.g. for displays that only care about the
+        present. Skipped samples are counted in `skipped`.
+    timeout : float, optional
+        Seconds to wait for each block before `asyncio.TimeoutError`.
+
+    Examples
+    --------
+    >>> async def consume(reader):
+    ...     async with reader.stream(100, maxlag=500) as stream:
+    ...         async for block in stream:
+    ...             process(block)
+    >>> asyncio.get_event_loop().run_until_complete(asyncio.gather(
+    ...     consume(reader), consume(reader)))
+    '''
+    def __init__(self, reader, n=None, position=None, timestamp=True,
+                 maxlag=None, timeout=None):
+        if n is not None and maxlag is not None and maxlag < n:
+            raise ValueError('maxlag must not be less than n')
+        self.reader, self.n = reader, n
+        self.timestamp, self.maxlag, self.timeout = timestamp, maxlag, timeout
+        self.cursor = reader.subscribe(position)
+        self.skipped = 0
+
+    def __repr__(self):
+        return '<{} of {} {}>'.format(
+            self.__class__.__name__, self.reader.name,
+            'closed' if self.cursor is None else self.cursor)
+
+    @property
+    def lost(self):
+        '''Number of samples overwritten before being read.'''
+        return self.cursor.lost if self.cursor is not None else 0
+
+    def close(self):
+        '''Stop streaming and release the cursor.'''
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
+
+    def __aiter__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    async def __anext__(self):
+        cursor = self.cursor
+        if cursor is None:
+            raise StopAsyncIteration
+        ring, size = cursor.ring, self.n or 1
+        while True:
+            if ring.sequence < cursor.position:  # writer restarted
+                cursor.position = 0
+            if self.maxlag is not None and cursor.available > self.maxlag:
+                latest = ring.sequence - size
+                self.skipped += latest - cursor.position
+                cursor.position = latest
+            target = cursor.position + size
+            if ring.sequence < target:
+                waker = _Waker.get(ring, asyncio.get_event_loop())
+                future = waker.wait(target)
+                try:
+                    await asyncio.wait_for(future, self.timeout)
+                finally:
+                    waker.discard(future)
+            data, _ = cursor.read(self.n, timeout=0,
+                                  timestamp=self.timestamp)
+            if data is not None:
+                return data
+
+
+# THE END
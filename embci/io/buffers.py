@@ -0,0 +1,740 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/embci/io/buffers.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 10:12:31
+
+'''
+Buffers shared between data stream readers and their consumers.
+
+Readers write samples into a fixed-size 2D array (usually backed by a
+memory-mapped file) whose last axis is time. Consumers pick windows of the
+latest samples out of it. `RingBuffer` hides the wrap-around so that reading
+a window costs at most one copy, and no copy at all when it is contiguous.
+
+Layout of the buffer (e.g. file `${DIR_TMP}/mmap_${reader_name}`)::
+
+    +------------+------------------------------------+--------------------+
+    | RingHeader | data: n_channel x window_size      | times: window_size |
+    +------------+------------------------------------+--------------------+
+    0            header.offset                        header.toffset
+
+The header describes the array (shape, dtype, sample rate) and holds the
+writing position, so any process can attach to the buffer by mapping it.
+To change the shape or sample rate online, the writer `migrate` to a new
+buffer and bumps `generation` in the old header. Consumers notice it and
+`refresh` to the new buffer on their next read.
+Samples are kept in a compact dtype (float32 by default) while timestamps
+are kept in float64, which stays sub-microsecond accurate for absolute
+times like `time.time()` or LSL clock.
+
+For long history, `TieredBuffer` keeps a hot ring for the live window in
+RAM and spills samples in chunks to a larger ring on a memory-mapped file.
+Both tiers share the same sequence numbers (index of a sample since the
+writer started), so a sample can be looked up regardless of its tier.
+
+Writer never takes a lock. Instead it bumps a sequence lock counter in the
+header before and after each write (odd while writing, like seqlock in the
+Linux kernel). Readers copy samples optimistically and retry if the counter
+shows that samples being copied may have been overwritten meanwhile. Note
+that no memory barrier is available in Python, so this relies on the store
+order of the platform (strict on x86, usually good enough on ARM).
+'''
+
+# built-in
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import os
+import time
+import ctypes
+from ctypes import c_char, c_int32, c_uint32, c_uint64, c_double
+
+# requirements.txt: data: numpy
+import numpy as np
+
+__all__ = ['RingHeader', 'RingBuffer', 'TieredBuffer', 'Cursor']
+
+
+class RingHeader(ctypes.Structure):
+    '''Header at the beginning of a `RingBuffer` buffer.'''
+    MAGIC = b'EmBCIRB'
+    VERSION = 3
+    _fields_ = [
+        ('magic',       c_char * 8),
+        ('version',     c_uint32),
+        ('pid',         c_int32),     # process that created the buffer
+        ('generation',  c_uint32),    # bumped when writer migrates
+        ('dtype',       c_char * 8),  # numpy.dtype.str of data
+        ('nrow',        c_uint32),    # num_channel
+        ('ncol',        c_uint32),    # window_size
+        ('sample_rate', c_double),
+        ('offset',      c_uint64),    # offset of data in bytes
+        ('toffset',     c_uint64),    # offset of float64 times in bytes
+        ('index',       c_uint64),    # next position to be written
+        ('sequence',    c_uint64),    # number of samples ever written
+        ('origin',      c_uint64),    # sequence of the first valid sample
+        ('seqlock',     c_uint64),    # odd while writing
+        ('pending',     c_uint64),    # number of samples being written
+        ('waiters',     c_uint32),    # consumers waiting on condition
+    ]
+
+    @classmethod
+    def size(cls):
+        '''Header size aligned to 64 bytes.'''
+        return _align(ctypes.sizeof(cls))
+
+
+def _align(nbytes):
+    return (nbytes + 63) // 64 * 64
+
+
+class RingBuffer(object):
+    '''
+    Ring buffer of a `n_channel x window_size` array and `window_size`
+    timestamps on any writable buffer.
+
+    Parameters
+    ----------
+    buffer : mmap.mmap | bytearray
+        Backing storage of at least `RingBuffer.nbytes(shape, dtype)` bytes.
+    shape : tuple, optional
+        Shape of data array (without timestamps). If provided, a new header
+        will be initialized in `buffer`, otherwise header already in
+        `buffer` is loaded.
+    dtype : numpy.dtype, optional
+        Data type of data array, default float32. Timestamps are float64.
+    sample_rate : float, optional
+    cond : multiprocessing.Condition, optional
+        Notified by writer after each write if any consumer is waiting on
+        it (counted in header), so that consumers can `wait` for new
+        samples without spinning and the writer takes no lock otherwise.
+        Without it, consumers will poll the header at an interval derived
+        from sample rate.
+    readonly : bool
+        Refuse to `write` into buffer. Used by attached consumers.
+    remap : callable, optional
+        Return the new buffer after the writer migrated, see `refresh`.
+
+    Attributes
+    ----------
+    data : ndarray
+        Samples array, n_channel x window_size.
+    times : ndarray
+        Timestamps array, window_size.
+    stats : dict
+        Counters of copying reads in current process: `reads`, `retries`
+        (torn by a concurrent write and copied again) and `failures` (still
+        torn after `max_retries` retries).
+
+    Notes
+    -----
+    Methods picking samples accept `rows` (a slice or list of channels, by
+    default all channels) and `timestamp`. If `timestamp` is True, times
+    are appended as the last row and the result is upcast to float64, so
+    that timestamps are not truncated.
+
+    Examples
+    --------
+    >>> ring = RingBuffer(bytearray(RingBuffer.nbytes((1, 5))), (1, 5))
+    >>> ring.write([[1, 2, 3]], [0.1, 0.2, 0.3])
+    3
+    >>> ring.view(3).flags.owndata  # contiguous: zero-copy read-only view
+    False
+    >>> out = np.empty((1, 5), np.float32)
+    >>> ring.view(out=out) is out   # wrapped: one copy into `out`
+    True
+    >>> ring.read(3, timestamp=True)
+    array([[1. , 2. , 3. ],
+           [0.1, 0.2, 0.3]])
+    '''
+    WAIT_SLICE = 0.1  # seconds, longest sleep on condition in `wait`
+
+    def __init__(self, buffer, shape=None, dtype=None, sample_rate=0,
+                 cond=None, readonly=False, remap=None):
+        self._cond = cond
+        self.readonly = readonly
+        self.remap = remap
+        self.max_retries = 5
+        self.stats = {'reads': 0, 'retries': 0, 'failures': 0}
+        self.bind(buffer, shape, dtype, sample_rate)
+
+    @staticmethod
+    def nbytes(shape, dtype=None):
+        '''Size of buffer needed by array with `shape` and `dtype`.'''
+        itemsize = np.dtype(dtype or 'float32').itemsize
+        return (RingHeader.size() + _align(int(np.prod(shape)) * itemsize) +
+                shape[-1] * 8)
+
+    def bind(self, buffer, shape=None, dtype=None, sample_rate=0):
+        '''Use a new buffer as backing storage. See `RingBuffer` params.'''
+        header = RingHeader.from_buffer(buffer)
+        if shape is not None:
+            dtype = np.dtype(dtype or 'float32')
+            if len(buffer) < self.nbytes(shape, dtype):
+                raise ValueError('Buffer too small for %s' % (shape, ))
+            ctypes.memset(ctypes.addressof(header), 0, ctypes.sizeof(header))
+            header.magic = RingHeader.MAGIC
+            header.version = RingHeader.VERSION
+            header.pid = os.getpid()
+            header.dtype = dtype.str.encode()
+            header.nrow, header.ncol = shape
+            header.sample_rate = sample_rate
+            header.offset = RingHeader.size()
+            header.toffset = header.offset + _align(
+                int(np.prod(shape)) * dtype.itemsize)
+        elif header.magic != RingHeader.MAGIC:
+            raise ValueError('Invalid buffer: ring header not found')
+        elif header.version != RingHeader.VERSION:
+            raise ValueError('Unsupported ring buffer version: %d' % (
+                header.version))
+        self.buffer, self.header = buffer, header
+        self.generation = header.generation
+        self.data = np.ndarray(
+            (header.nrow, header.ncol), np.dtype(header.dtype.decode()),
+            buffer=buffer, offset=header.offset)
+        self.times = np.ndarray(
+            header.ncol, np.float64, buffer=buffer, offset=header.toffset)
+
+    def release(self, copy=True):
+        '''
+        Drop references to current buffer so that it can be closed, e.g.
+        `mmap.close`. Keep a copy of it in memory if `copy` is True.
+        '''
+        if copy:
+            self.bind(bytearray(self.buffer))
+        else:
+            shape = self.data.shape
+            self.bind(bytearray(self.nbytes(shape, self.dtype)), shape,
+                      self.dtype, self.sample_rate)
+
+    def migrate(self, buffer, shape=None, sample_rate=None, keep=None,
+                publish=None):
+        '''
+        Move writing to a new buffer, e.g. with another shape or sample rate.
+
+        Latest `keep` (default as many as fit) samples of the channels in
+        common are carried over with their sequence numbers, so cursors on
+        this buffer stay valid. The old buffer is marked stale at last and
+        consumers attached to it will follow by `refresh`.
+
+        Parameters
+        ----------
+        publish : callable, optional
+            Called after the new buffer is ready and before the old one is
+            marked stale, e.g. to rename new file over the old one so that
+            consumers can find it.
+        '''
+        if self.readonly:
+            raise RuntimeError('Can not migrate a read-only buffer')
+        old, seq, size = self.header, self.header.sequence, len(self)
+        shape = tuple(shape or self.data.shape)
+        if sample_rate is None:
+            sample_rate = old.sample_rate
+        new = RingBuffer(buffer, shape, self.dtype, sample_rate)
+        n = min(seq, size, shape[-1], size if keep is None else keep)
+        new.header.sequence = new.header.origin = seq - n
+        new.header.index = (seq - n) % shape[-1]
+        if n > 0:
+            start = (seq - n) % size
+            new.write(self._copy([self.data], start, n),
+                      self._copy([self.times[None]], start, n)[0])
+        new.header.generation = old.generation + 1
+        if publish is not None:
+            publish()
+        self.bind(buffer)
+        old.generation += 1
+        if self._cond is not None:
+            with self._cond:
+                self._cond.notify_all()
+
+    def refresh(self):
+        '''
+        Follow the writer to its new buffer (given by `remap`) if it has
+        migrated. Return True if rebound.
+        '''
+        if self.header.generation == self.generation or self.remap is None:
+            return False
+        self.bind(self.remap())
+        return True
+
+    def __len__(self):
+        return self.data.shape[-1]
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def sample_rate(self):
+        return self.header.sample_rate
+
+    @sample_rate.setter
+    def sample_rate(self, value):
+        self.header.sample_rate = value
+
+    @property
+    def index(self):
+        return self.header.index
+
+    @property
+    def sequence(self):
+        '''Total number of samples written into buffer.'''
+        return self.header.sequence
+
+    @property
+    def oldest(self):
+        '''Sequence number of the oldest valid sample in buffer.'''
+        header = self.header
+        return max(header.sequence - len(self), header.origin)
+
+    def wait(self, sequence, timeout=None):
+        '''
+        Block until total number of written samples reaches `sequence`.
+
+        Returns
+        -------
+        out : bool
+            False if `timeout` (in seconds) elapsed before that.
+        '''
+        self.refresh()
+        if self.header.sequence >= sequence:
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        if self._cond is None:
+            while self.header.sequence < sequence:
+                remain = 1 if deadline is None else deadline - time.time()
+                if remain <= 0:
+                    return False
+                # sleep half of the time needed to get enough samples
+                dt = (sequence - self.header.sequence) / 2.0 / (
+                    self.header.sample_rate or 1e3)
+                time.sleep(min(max(dt, 1e-3), remain))
+                self.refresh()
+            return True
+        with self._cond:
+            while True:
+                header = self.header
+                header.waiters += 1  # ask writer to notify
+                try:
+                    if header.sequence >= sequence:
+                        return True
+                    remain = self.WAIT_SLICE
+                    if deadline is not None:
+                        remain = min(remain, deadline - time.time())
+                        if remain <= 0:
+                            return False
+                    # wake up once in a while in case writer checked
+                    # `waiters` just before it was bumped
+                    self._cond.wait(remain)
+                finally:
+                    header.waiters -= 1
+                self.refresh()
+
+    def _span(self, n):
+        self.refresh()
+        n = len(self) if n is None else int(n)
+        if not 0 < n <= len(self):
+            raise ValueError('Invalid number of samples: %d' % n)
+        return n
+
+    def _rows(self, rows, timestamp=False):
+        '''Arrays to copy samples from, each of them is n x window_size.'''
+        srcs = [self.data if rows is None else self.data[rows]]
+        if timestamp:
+            srcs.append(self.times[None])
+        return srcs
+
+    def read_begin(self):
+        '''Begin a lock-free read. Return a token for `read_retry`.'''
+        return self.header.seqlock
+
+    def read_retry(self, start, token):
+        '''
+        Whether samples from sequence number `start` on may have been
+        overwritten since `read_begin` returned `token`. If so, data copied
+        in between is torn and the read should be retried.
+        '''
+        header = self.header
+        if header.seqlock == token and not token & 1:
+            return False
+        pending = header.pending  # must be loaded before sequence
+        return header.sequence + pending - len(self) > start
+
+    def _read(self, start, n, out=None, rows=None, timestamp=False):
+        '''Copy `n` samples from sequence `start()`, retry if torn.'''
+        self.refresh()
+        srcs, size, stats = self._rows(rows, timestamp), len(self), self.stats
+        stats['reads'] += 1
+        for _ in range(self.max_retries + 1):
+            token = self.read_begin()
+            begin = start()
+            out = self._copy(srcs, begin % size, n, out)
+            if not self.read_retry(begin, token):
+                return out
+            stats['retries'] += 1
+        stats['failures'] += 1
+        return out
+
+    def view(self, n=None, out=None, rows=None, timestamp=False):
+        '''
+        Latest `n` (default window_size) samples in time order.
+
+        A read-only view into the buffer is returned when these samples are
+        contiguous in memory. Otherwise they are copied into `out` (a new
+        array is allocated if `out` is None). Note that a view is *live*:
+        values will be overwritten by the writer after len(self) samples.
+        Samples with timestamps are always copied.
+        '''
+        n = self._span(n)
+        start = (self.header.sequence - n) % len(self)
+        if timestamp or start + n > len(self):
+            return self.read(n, out, rows, timestamp)
+        view = self._rows(rows)[0][..., start:start + n]
+        view.flags.writeable = False
+        return view
+
+    def read(self, n=None, out=None, rows=None, timestamp=False):
+        '''Same as `view` but always copy samples into `out` (or new array).'''
+        n, header = self._span(n), self.header
+        return self._read(
+            lambda: header.sequence - n, n, out, rows, timestamp)
+
+    def read_at(self, start, n, out=None, rows=None, timestamp=False):
+        '''
+        Copy `n` samples starting from sequence number `start` into `out`.
+        Samples must still be in buffer, i.e. not overwritten by writer.
+        Wrap it with `read_begin` and `read_retry` to detect torn copies.
+        '''
+        seq, oldest = self.header.sequence, self.oldest
+        if start < oldest or start + n > seq or n < 0:
+            raise ValueError('Samples [{}, {}) not in buffer [{}, {})'.format(
+                start, start + n, oldest, seq))
+        return self._copy(
+            self._rows(rows, timestamp), start % len(self), n, out)
+
+    def copy_from(self, start, n=None, out=None, rows=None, timestamp=False):
+        '''
+        Copy `n` samples (default all available) from sequence number
+        `start` on. If `start` has been overwritten, copy from the oldest
+        sample in buffer instead. The copy is retried if torn.
+
+        Returns
+        -------
+        data : ndarray
+        first : int
+            Sequence number of the first copied sample.
+        '''
+        self.refresh()
+        srcs, size, stats = self._rows(rows, timestamp), len(self), self.stats
+        stats['reads'] += 1
+        for _ in range(self.max_retries + 1):
+            token = self.read_begin()
+            seq = self.header.sequence
+            first = max(start, seq - size, self.header.origin)
+            count = seq - first if n is None else n
+            if count > seq - first:
+                raise ValueError('Samples [{}, {}) not in buffer'.format(
+                    first, first + count))
+            copy = self._copy(srcs, first % size, count, out)
+            if not self.read_retry(first, token):
+                return copy, first
+            stats['retries'] += 1
+        stats['failures'] += 1
+        return copy, first
+
+    def column(self, offset=1, rows=None, timestamp=False):
+        '''Copy of the `offset`-th latest sample (default the latest one).'''
+        header = self.header
+        return self._read(lambda: header.sequence - offset, 1,
+                          rows=rows, timestamp=timestamp)[:, 0]
+
+    def write(self, data, ts):
+        '''
+        Save one sample or a block of samples into buffer.
+
+        Parameters
+        ----------
+        data : array_like
+            1D array of a single sample or 2D array with a shape of
+            n_channel x n_samples. Extra channels are dropped.
+        ts : float | array_like
+            Timestamp of the sample or 1D array of n_samples timestamps.
+            They are saved in float64 regardless of dtype of data.
+
+        Returns
+        -------
+        n : int
+            Number of samples written. Only the latest len(self) samples of
+            a block are kept.
+        '''
+        if self.readonly:
+            raise RuntimeError('Can not write into a read-only buffer')
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data[:, None]
+        ts = np.atleast_1d(ts)
+        n, size = data.shape[-1], len(self)
+        if ts.shape != (n, ):
+            raise ValueError('Invalid timestamps shape: {}, expect {}'.format(
+                ts.shape, (n, )))
+        total = n
+        if n > size:
+            data, ts, n = data[:, -size:], ts[-size:], size
+        nch = min(data.shape[0], self.data.shape[0])
+        header = self.header
+        header.pending = total
+        header.seqlock += 1
+        i = (header.index + total - n) % size
+        k = min(n, size - i)
+        self.data[:nch, i:i + k] = data[:nch, :k]
+        self.times[i:i + k] = ts[:k]
+        if k < n:
+            self.data[:nch, :n - k] = data[:nch, k:]
+            self.times[:n - k] = ts[k:]
+        header.index = (i + n) % size
+        header.sequence += total
+        header.seqlock += 1
+        header.pending = 0
+        if self._cond is not None and header.waiters:
+            with self._cond:
+                self._cond.notify_all()
+        return n
+
+    def cursor(self, position=None, **k):
+        '''Create a `Cursor` on this buffer, see `Cursor` for details.'''
+        return Cursor(self, position, **k)
+
+    @staticmethod
+    def _copy(srcs, start, n, out=None):
+        '''Copy `n` columns from `start` of arrays stacked vertically.'''
+        shape = (sum(src.shape[0] for src in srcs), n)
+        if out is None:
+            out = np.empty(shape, np.result_type(*srcs))
+        elif out.shape != shape:
+            raise ValueError('Invalid output shape: {}, expect {}'.format(
+                out.shape, shape))
+        row, k = 0, min(n, srcs[0].shape[-1] - start)
+        for src in srcs:
+            dst = out[row:row + src.shape[0]]
+            dst[:, :k] = src[:, start:start + k]
+            dst[:, k:] = src[:, :n - k]
+            row += src.shape[0]
+        return out
+
+
+class TieredBuffer(object):
+    '''
+    Two-tier buffer: a hot `RingBuffer` for the live window and a larger
+    `RingBuffer` (usually on a memory-mapped file) holding long history.
+
+    Samples are written into the hot ring as usual and copied into the
+    spill ring every `chunk` samples, so the spill file is touched a few
+    times per window instead of on every write. Consumers can query the
+    last minutes of samples by sequence number, and cursors that fall
+    behind the hot ring continue from the spill ring without losing data.
+
+    Parameters
+    ----------
+    hot : RingBuffer
+    spill : RingBuffer
+        Ring with the same rows as `hot`. Its last `chunk` samples are
+        reserved for the unflushed ones, so it can hold `len(spill) - chunk`
+        samples of history.
+    chunk : int, optional
+        Number of samples flushed at once, default a quarter of `hot`.
+
+    Examples
+    --------
+    >>> hot = RingBuffer(bytearray(RingBuffer.nbytes((1, 100))), (1, 100))
+    >>> spill = RingBuffer(mmap.mmap(-1, RingBuffer.nbytes((1, 10025))),
+    ...                    (1, 10025))
+    >>> tiered = TieredBuffer(hot, spill)
+    >>> len(tiered)  # 10000 samples of history, while 100 in RAM
+    10000
+    '''
+    def __init__(self, hot, spill, chunk=None):
+        if hot.data.shape[0] != spill.data.shape[0]:
+            raise ValueError('Tiers have different number of channels')
+        self.chunk = int(chunk or max(1, len(hot) // 4))
+        if not 0 < self.chunk <= len(hot) // 2 or self.chunk >= len(spill):
+            raise ValueError('Invalid chunk size: %d' % self.chunk)
+        self.hot, self.spill = hot, spill
+
+    def __len__(self):
+        return len(self.spill) - self.chunk
+
+    @property
+    def sequence(self):
+        return self.hot.sequence
+
+    @property
+    def stats(self):
+        return self.hot.stats
+
+    def wait(self, sequence, timeout=None):
+        return self.hot.wait(sequence, timeout)
+
+    def flush(self):
+        '''Copy samples not in spill ring yet from hot ring.'''
+        start = self.spill.sequence
+        n = self.hot.sequence - start
+        if n > 0:
+            hot, i = self.hot, start % len(self.hot)
+            self.spill.write(hot._copy([hot.data], i, n),
+                             hot._copy([hot.times[None]], i, n)[0])
+        return max(n, 0)
+
+    def write(self, data, ts):
+        '''Save samples into hot ring, see `RingBuffer.write`.'''
+        if np.size(ts) >= self.chunk:  # large block goes to both tiers
+            self.flush()
+            self.spill.write(data, ts)
+            return self.hot.write(data, ts)
+        n = self.hot.write(data, ts)
+        if self.hot.sequence - self.spill.sequence >= self.chunk:
+            self.flush()
+        return n
+
+    def copy_from(self, start, n=None, out=None, rows=None, timestamp=False):
+        '''
+        Copy samples from sequence number `start` on, from spill ring if
+        they are older than the hot window. See `RingBuffer.copy_from`.
+        '''
+        hot, spill = self.hot, self.spill
+        if start >= min(hot.oldest, spill.sequence) or \
+                hot.oldest <= spill.oldest:
+            return hot.copy_from(start, n, out, rows, timestamp)
+        old, first = spill.copy_from(start, None if n is None else min(
+            n, spill.sequence - start), rows=rows, timestamp=timestamp)
+        k = old.shape[-1]
+        if n is not None and k == n:
+            if out is None:
+                return old, first
+            out[:] = old
+            return out, first
+        new = hot.copy_from(first + k, None if n is None else n - k,
+                            rows=rows, timestamp=timestamp)[0]
+        if out is None:
+            return np.concatenate((old, new), -1), first
+        out[..., :k], out[..., k:] = old, new
+        return out, first
+
+    def read(self, n=None, out=None, rows=None, timestamp=False):
+        '''Copy latest `n` (default all available) samples in history.'''
+        seq = self.sequence
+        n = min(seq, len(self)) if n is None else int(n)
+        if not 0 < n <= min(seq, len(self)):
+            raise ValueError('Invalid number of samples: %d' % n)
+        return self.copy_from(seq - n, n, out, rows, timestamp)[0]
+
+    def cursor(self, position=None, **k):
+        '''Create a `Cursor` that can fall back to spill ring.'''
+        return Cursor(self, position, **k)
+
+
+class Cursor(object):
+    '''
+    Read position of one consumer on a `RingBuffer`.
+
+    Each consumer holds its own cursor, so consumers in different threads
+    or processes never steal fresh samples from each other. Every sample is
+    delivered exactly once unless the consumer falls more than len(ring)
+    samples behind the writer. In that case the overwritten samples are
+    skipped and reported as lost.
+
+    Parameters
+    ----------
+    ring : RingBuffer | TieredBuffer
+    position : int, optional
+        Sequence number of the first sample to read. Default to the current
+        sequence of `ring`, i.e. only new samples will be delivered.
+    slot : array, optional
+        Array of one element where `position` is published after each read,
+        so that lag of the consumer can be monitored from other threads or
+        processes (see `embci.io.metrics.ReaderMetrics`).
+    release : callable, optional
+        Called when the cursor is closed or garbage collected, e.g. to free
+        `slot`.
+
+    Examples
+    --------
+    >>> cursor = reader.subscribe()
+    >>> data, lost = cursor.read(100, timeout=1)
+    >>> data.shape, lost
+    ((9, 100), 0)
+    '''
+    def __init__(self, ring, position=None, slot=None, release=None):
+        self.ring = ring
+        self.position = ring.sequence if position is None else int(position)
+        self.lost = 0
+        self.slot, self._release = slot, release
+        self._publish()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        '''Stop publishing position to `slot`.'''
+        release, self._release, self.slot = self._release, None, None
+        if release is not None:
+            release()
+
+    def _publish(self):
+        if self.slot is not None:
+            self.slot[0] = self.position
+
+    def __repr__(self):
+        return '<%s at %d, %d behind, %d lost>' % (
+            type(self).__name__, self.position, self.available, self.lost)
+
+    @property
+    def available(self):
+        '''Number of samples not read yet (including lost ones).'''
+        return max(0, self.ring.sequence - self.position)
+
+    def read(self, n=None, timeout=None, out=None, rows=None,
+             timestamp=True):
+        '''
+        Read `n` new samples, or all new samples (at least one) by default.
+
+        Parameters
+        ----------
+        n : int, optional
+            Number of samples, must not exceed len(ring).
+        timeout : float, optional
+            Seconds to wait for enough new samples. Block forever if None.
+        out : ndarray, optional
+            Destination array with a shape of n_row x n.
+        rows : slice | list, optional
+            Channels to read, default all channels.
+        timestamp : bool
+            Append timestamps as the last row (upcast to float64), default
+            True.
+
+        Returns
+        -------
+        data : ndarray | None
+            Samples in time order, None if timeout.
+        lost : int
+            Number of samples skipped since last read because they had
+            been overwritten. Total count is accumulated in `self.lost`.
+        '''
+        ring = self.ring
+        if ring.sequence < self.position:  # writer restarted
+            self.position = 0
+        if n is not None and not 0 < n <= len(ring):
+            raise ValueError('Invalid number of samples: %d' % n)
+        if not ring.wait(self.position + (n or 1), timeout):
+            return None, 0
+        data, first = ring.copy_from(
+            self.position, n, out, rows, timestamp)
+        lost = first - self.position
+        self.position = first + data.shape[-1]
+        self.lost += lost
+        self._publish()
+        return data, lost
+
+
+# THE END
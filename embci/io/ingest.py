@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/embci/io/ingest.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 19:02:45
+
+'''
+Stateful transformations applied to sample blocks at ingest, i.e. between
+a reader fetching data from its source and saving them into buffer.
+
+They all take blocks in shape of n_channel x n_sample with timestamps and
+keep state across blocks, so that the output is continuous no matter how
+the stream is chunked.
+'''
+
+# built-in
+from __future__ import absolute_import, division, print_function
+from fractions import Fraction
+import time
+import multiprocessing as mp
+
+# requirements.txt: data: numpy, scipy
+import numpy as np
+import scipy.signal
+
+__all__ = ['Resampler', 'ClockModel', 'EventLog', 'GapTracker']
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class Resampler(object):
+    '''
+    Rational resampler of sample blocks by polyphase FIR filtering, like
+    `scipy.signal.resample_poly` but continuous across blocks.
+
+    Parameters
+    ----------
+    rate_in : number
+        Sample rate of source.
+    rate_out : number
+        Sample rate of output. Ratio `rate_out / rate_in` is approximated
+        by `up / down` with denominators no more than 1000.
+    half_len : int
+        Half length of the anti-aliasing filter, in number of samples at
+        the lower rate of input and output.
+    window : str | tuple
+        Window used to design the FIR filter, see `scipy.signal.firwin`.
+
+    Notes
+    -----
+    Output sample `k` is centered at input index `(k * down - D) / up`,
+    where `D` is the group delay of the filter at upsampled rate. Its
+    timestamp is interpolated from the timestamps of input samples around,
+    so that the delay of the filter is compensated in timestamps. Output
+    starts from the first sample centered at the first input sample.
+
+    Examples
+    --------
+    >>> r = Resampler(1000, 250)
+    >>> data, ts = r.process(np.random.rand(8, 1000), np.arange(1000) / 1e3)
+    >>> data.shape  # the rest are due after next block (filter delay)
+    (8, 240)
+    '''
+    def __init__(self, rate_in, rate_out, half_len=10,
+                 window=('kaiser', 5.0)):
+        ratio = (Fraction(rate_out).limit_denominator(1000) /
+                 Fraction(rate_in).limit_denominator(1000))
+        if ratio <= 0:
+            raise ValueError('Invalid sample rate: {} => {}'.format(
+                rate_in, rate_out))
+        self.rate_in, self.rate_out = rate_in, rate_out
+        self.up, self.down = ratio.numerator, ratio.denominator
+        max_rate = max(self.up, self.down)
+        if max_rate == 1:  # same rate, pass through
+            taps = np.ones(1)
+        else:
+            taps = scipy.signal.firwin(
+                2 * half_len * max_rate + 1, 1.0 / max_rate, window=window)
+            taps *= self.up
+        self.delay = (len(taps) - 1) // 2
+        # polyphase matrix: H[phase, t] = taps[t * up + phase]
+        self.ntap = -(-len(taps) // self.up)
+        taps = np.pad(taps, (0, self.ntap * self.up - len(taps)), 'constant')
+        self._H = taps.reshape(self.ntap, self.up).T.copy()
+        self.reset()
+
+    def __repr__(self):
+        return '<{} {}Hz => {}Hz ({}/{}) at 0x{:x}>'.format(
+            self.__class__.__name__, self.rate_in, self.rate_out,
+            self.up, self.down, id(self))
+
+    def reset(self):
+        '''Forget previous samples, the next block starts a new stream.'''
+        self._x = self._t = None
+        self._n = 0  # number of input samples received
+        self._k = -(-self.delay // self.down)  # index of next output
+
+    def _init(self, data, ts):
+        # history of ntap - 1 samples before the first one: hold the first
+        # value to avoid transient, extrapolate timestamps backwards
+        nhist = self.ntap - 1
+        self._x = np.repeat(data[:, :1], nhist, axis=1)
+        if len(ts) > 1:
+            step = float(ts[-1] - ts[0]) / (len(ts) - 1)
+        else:
+            step = 1.0 / self.rate_in
+        self._t = ts[0] - step * np.arange(nhist, 0, -1)
+
+    def process(self, data, ts=None):
+        '''
+        Resample a block of samples.
+
+        Parameters
+        ----------
+        data : array_like
+            n_channel x n_sample block or 1D array of a single sample.
+        ts : float | array_like, optional
+            Timestamps of input samples.
+
+        Returns
+        -------
+        data : ndarray
+            n_channel x m block in float64, m is about n * up / down.
+        ts : ndarray or None
+            Timestamps of output samples, None if `ts` is not provided.
+        '''
+        data = np.asarray(data, np.float64)
+        if data.ndim == 1:
+            data = data[:, None]
+        n = data.shape[1]
+        if ts is None:
+            t = (self._n + np.arange(n)) / float(self.rate_in)
+        else:
+            t = np.atleast_1d(np.asarray(ts, np.float64))
+        if self._x is None:
+            if not n:
+                return data, None if ts is None else t
+            self._init(data, t)
+        x = np.hstack([self._x, data])
+        tx = np.hstack([self._t, t])
+        base = self._n - (self.ntap - 1)  # input index of x[:, 0]
+        total = self._n + n
+        # output k is available once its newest input k * down // up is
+        last = (total * self.up - 1) // self.down
+        ks = np.arange(self._k, last + 1)
+        newest = ks * self.down // self.up - base
+        idx = newest[:, None] - np.arange(self.ntap)
+        out = np.einsum('cot,ot->co', x[:, idx],
+                        self._H[ks * self.down % self.up])
+        # keep the last ntap - 1 samples as history of next block
+        self._x = x[:, len(tx) - self.ntap + 1:]
+        self._t = tx[len(tx) - self.ntap + 1:]
+        self._n, self._k = total, max(self._k, last + 1)
+        if ts is None:
+            return out, None
+        center = (ks * self.down - self.delay) / float(self.up) - base
+        return out, np.interp(center, np.arange(len(tx)), tx)
+
+
+class ClockModel(object):
+    '''
+    Timestamps of samples estimated from sample counter and arrival times.
+
+    Samples of a device are counted since start and each block of samples
+    is stamped by host when it arrives. Arrival times carry scheduling
+    jitter and batching artifacts (samples of a block arrive at the same
+    time), while the device's clock is stable but drifts from host's.
+    A line `t = t0 + k / rate` is fitted to (index of the last sample of
+    each block, arrival time) by least squares with exponential forgetting,
+    and samples are stamped on the line: smooth, evenly spaced at the
+    device's actual rate.
+
+    Parameters
+    ----------
+    sample_rate : float
+        Nominal sample rate of device.
+    halflife : float
+        Seconds after which an observation weighs half, i.e. how fast the
+        model follows changes of drift and latency.
+    warmup : int
+        Number of blocks observed before the model is used. Until then
+        samples are stamped back from arrival time at nominal rate.
+    clock : callable
+        Host clock, default `time.monotonic` (`time.time` on Python 2).
+    resync : float
+        Restart fitting if a block arrives more than `resync` seconds off
+        the line, e.g. the stream was paused or samples were lost.
+
+    Notes
+    -----
+    Timestamps are biased by the average latency of arrival (transfer and
+    scheduling delays), which is a constant offset.
+
+    Timestamps always increase. Samples that would be stamped before the
+    last timestamp (a block arriving early, or the line moving back when
+    refitted) follow it at nominal rate instead.
+
+    Timestamps stay evenly spaced over a stall of the source shorter than
+    `resync`, so how late the last block arrived is kept in `late`.
+
+    Examples
+    --------
+    >>> model = ClockModel(250)
+    >>> ts = model.update(32)  # on arrival of 32 samples
+    >>> model.report()
+    {'rate': 250.03, 'drift': 120.5, 'jitter': 0.00031, 'blocks': 20}
+    '''
+    def __init__(self, sample_rate, halflife=30.0, warmup=8, clock=None,
+                 resync=1.0):
+        self.sample_rate = float(sample_rate)
+        self.halflife = float(halflife)
+        self.warmup = int(warmup)
+        self.clock = clock or _monotonic
+        self.resync = float(resync)
+        self.reset()
+
+    def __repr__(self):
+        return '<{} {:.3f}Hz ({:+.1f}ppm) at 0x{:x}>'.format(
+            self.__class__.__name__, self.rate, self.drift, id(self))
+
+    def reset(self):
+        '''Forget observations and restart counting samples from 0.'''
+        self.count = 0
+        self.late = 0.0
+        self._ts = -np.inf  # last timestamp returned
+        self._restart()
+
+    def _restart(self):
+        self.blocks = 0
+        self._origin = None  # (k, t) of the first observation
+        self._last = None    # time of last observation
+        self._sums = np.zeros(6)  # weighted S, Sx, Sy, Sxx, Sxy, Syy
+        self._fit = (0, 0, 0)     # intercept, slope, residual RMS
+
+    def update(self, n, t=None, skipped=0):
+        '''
+        Observe arrival of `n` samples at time `t` (default now by `clock`)
+        and return their timestamps. If the source knows that `skipped`
+        samples before them were lost, they are counted as well, so that
+        timestamps leave a gap for them.
+        '''
+        if t is None:
+            t = self.clock()
+        self.count += skipped
+        fs, k = self.sample_rate, self.count + n - 1
+        self.late = 0.0  # seconds arrived after the line
+        if self._origin is not None:
+            x = k - self._origin[0]
+            y = t - self._origin[1] - x / fs  # residual to nominal rate
+            self.late = y - self._fit[0] - self._fit[1] * x
+            if abs(self.late) > self.resync:
+                self._restart()
+        if self._origin is None:
+            self._origin, self._last = (k, t), t
+        x = k - self._origin[0]
+        y = t - self._origin[1] - x / fs
+        decay = 0.5 ** (max(t - self._last, 0) / self.halflife)
+        self._sums *= decay
+        self._sums += [1, x, y, x * x, x * y, y * y]
+        self._last = t
+        self.blocks += 1
+        self.count += n
+        S, Sx, Sy, Sxx, Sxy, Syy = self._sums
+        var = S * Sxx - Sx * Sx
+        if self.blocks < self.warmup or var <= 0:
+            ts = t - np.arange(n - 1, -1, -1) / fs
+        else:
+            b = (S * Sxy - Sx * Sy) / var
+            a = (Sy - b * Sx) / S
+            mse = (Syy - 2 * a * Sy - 2 * b * Sxy + a * a * S +
+                   2 * a * b * Sx + b * b * Sxx) / S
+            self._fit = (a, b, np.sqrt(max(mse, 0)))
+            x = np.arange(k - n + 1, k + 1) - self._origin[0]
+            ts = self._origin[1] + x / fs + a + b * x
+        # never go back in time when blocks arrive early or the line is
+        # updated: follow the last timestamp at nominal rate instead
+        ts = np.maximum(ts, self._ts + np.arange(1, n + 1) / fs)
+        self._ts = ts[-1]
+        return ts
+
+    @property
+    def rate(self):
+        '''Estimated actual sample rate of device.'''
+        return 1.0 / (1.0 / self.sample_rate + self._fit[1])
+
+    @property
+    def drift(self):
+        '''Drift of device clock relative to host's, in ppm.'''
+        return (self.rate / self.sample_rate - 1) * 1e6
+
+    @property
+    def jitter(self):
+        '''RMS of arrival times around the fitted line, in seconds.'''
+        return self._fit[2]
+
+    def report(self):
+        '''Summary of the model as a dict.'''
+        return {'rate': self.rate, 'drift': self.drift,
+                'jitter': self.jitter, 'blocks': self.blocks}
+
+
+def _runs(mask):
+    '''Start and length of runs of True in a boolean array.'''
+    edges = np.diff(np.r_[0, np.asarray(mask, np.int8), 0])
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return zip(starts.tolist(), (stops - starts).tolist())
+
+
+class EventLog(object):
+    '''
+    Fixed-size log of stream events in shared memory.
+
+    Each event is `(kind, sequence, count, time)`, where `sequence` is the
+    sequence number (index since start) of the sample where it happens and
+    `time` is when it is recorded. Meaning of `count` depends on kind:
+
+    - gap: `count` samples are missing before sample `sequence`
+    - duplicate: `count` samples from `sequence` on have timestamps not
+      later than the samples before them, i.e. saved twice
+    - repeat: `count` samples from `sequence` on are identical to the one
+      before them in all channels, e.g. filled or stuck
+    - invalid: `count` samples from `sequence` on contain NaN, e.g. filled
+      for lost packets
+    - stall: fetching data failed `count` times before sample `sequence`
+    - late: the block from sample `sequence` on arrived `count` sample
+      periods later than expected by a `ClockModel`, e.g. the source
+      stalled, which is not visible from timestamps fitted by the model
+
+    Events are written by the loop task of reader with plain stores, and
+    the latest `capacity` ones can be read from any thread or forked
+    process. Contiguous events of the same kind are merged into one.
+    '''
+    KINDS = ('gap', 'duplicate', 'repeat', 'invalid', 'stall', 'late')
+    SPANS = ('duplicate', 'repeat', 'invalid')  # kinds spanning samples
+
+    def __init__(self, capacity=256):
+        self._array = mp.RawArray('d', 1 + 4 * int(capacity))
+        self._bind()
+
+    def _bind(self):
+        arr = np.frombuffer(self._array, np.float64)
+        self._total, self._log = arr[:1], arr[1:].reshape(-1, 4)
+
+    def __getstate__(self):  # numpy views are rebuilt after unpickling
+        return {'_array': self._array}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bind()
+
+    def __len__(self):
+        return int(min(self._total[0], len(self._log)))
+
+    @property
+    def total(self):
+        '''Number of events recorded since reset.'''
+        return int(self._total[0])
+
+    def reset(self):
+        self._total[0] = 0
+
+    def add(self, kind, sequence, count=1, t=None):
+        '''Record an event, see `EventLog` for its meaning.'''
+        code, total, size = self.KINDS.index(kind), self.total, len(self._log)
+        # events of other kinds may be recorded in between
+        for i in range(total - 1, max(total - len(self.KINDS), 0) - 1, -1):
+            last = self._log[i % size]
+            if last[0] == code and (
+                    kind == 'stall' and last[1] == sequence or
+                    kind in self.SPANS and last[1] + last[2] == sequence):
+                last[2] += count
+                return
+        self._log[total % size] = (
+            code, sequence, count, time.time() if t is None else t)
+        self._total[0] = total + 1  # publish after the event is written
+
+    @classmethod
+    def _span(cls, kind, sequence, count):
+        if kind in cls.SPANS:
+            return sequence, sequence + count
+        return sequence, sequence + 1  # sample right after gap or stall
+
+    def events(self, start=None, stop=None):
+        '''
+        Events overlapping samples in [start, stop) of sequence numbers,
+        default all events in the log, as a list of dict in order of
+        sequence numbers.
+        '''
+        total, size = self.total, len(self._log)
+        log = self._log.copy()
+        ret = []
+        for i in range(max(0, total - size), total):
+            code, sequence, count, t = log[i % size]
+            kind, sequence, count = self.KINDS[int(code)], int(sequence), \
+                int(count)
+            first, last = self._span(kind, sequence, count)
+            if start is not None and last <= start or \
+                    stop is not None and first >= stop:
+                continue
+            ret.append({'kind': kind, 'sequence': sequence,
+                        'count': count, 'time': float(t)})
+        return sorted(ret, key=lambda e: e['sequence'])
+
+    def mask(self, start, n):
+        '''
+        Boolean mask of `n` samples from sequence number `start` on, True
+        for samples affected by events: duplicated, repeated or invalid
+        samples, and the first sample after a gap or stall.
+        '''
+        mask = np.zeros(n, bool)
+        for e in self.events(start, start + n):
+            first, last = self._span(e['kind'], e['sequence'], e['count'])
+            mask[max(first - start, 0):max(last - start, 0)] = True
+        return mask
+
+
+class GapTracker(object):
+    '''
+    Detect gaps, duplicates, repeated and invalid samples in a stream of
+    sample blocks, and record them into an `EventLog`.
+
+    Parameters
+    ----------
+    sample_rate : float
+        Nominal sample rate, used to tell gaps of timestamps.
+    log : EventLog, optional
+    tolerance : float
+        Interval between timestamps longer than `tolerance` sample periods
+        counts as a gap.
+    min_repeat : int
+        Minimum number of samples identical to the one before them to be
+        recorded, because small or quantized signals may repeat by chance.
+    max_late : float
+        Blocks arriving more than `max_late` seconds later than expected,
+        compared with the block before them (see `delay`), are recorded
+        as late.
+
+    Examples
+    --------
+    >>> tracker = GapTracker(100)
+    >>> tracker.check(np.random.rand(2, 5), np.arange(5) / 100., 0)
+    >>> tracker.check(np.random.rand(2, 5), np.arange(8, 13) / 100., 5)
+    >>> tracker.log.events()
+    [{'kind': 'gap', 'sequence': 5, 'count': 3, 'time': 1792245120.7}]
+    '''
+    def __init__(self, sample_rate, log=None, tolerance=1.5, min_repeat=3,
+                 max_late=0.1):
+        self.sample_rate = float(sample_rate)
+        self.log = log if log is not None else EventLog()
+        self.tolerance, self.min_repeat = tolerance, min_repeat
+        self.max_late = max_late
+        self.reset()
+
+    def reset(self):
+        '''Forget the last sample, the next block starts a new stream.'''
+        self._last = self._last_ts = None
+        self._run = 0  # repeated samples at the end of last block
+        self._delay = self._last_delay = 0
+
+    def delay(self, seconds):
+        '''
+        Note that the next block to check arrived `seconds` later than
+        expected, e.g. `ClockModel.late`. Stalls of the source are told
+        this way when timestamps are fitted by a clock model. Only steps
+        are recorded, as the model takes a while to follow a constant
+        delay, e.g. after samples are lost.
+        '''
+        self._delay = max(self._delay, seconds)
+
+    def check(self, data, ts, sequence):
+        '''
+        Check a block of samples before it is saved as sequence numbers
+        from `sequence` on.
+        '''
+        ts = np.atleast_1d(np.asarray(ts, np.float64))
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data[:, None]
+        if not len(ts):
+            return
+        late = self._delay - self._last_delay
+        if late > self.max_late:
+            self.log.add('late', sequence, int(round(late * self.sample_rate)))
+        self._last_delay, self._delay = self._delay, 0
+        period = 1.0 / self.sample_rate
+        if self._last_ts is None:
+            latest = np.maximum.accumulate(ts)
+            prev_ts, prev = np.r_[ts[0] - period, latest[:-1]], data[:, :1]
+        else:
+            latest = np.maximum.accumulate(np.r_[self._last_ts, ts])[1:]
+            prev_ts, prev = np.r_[self._last_ts, latest[:-1]], self._last
+        interval = ts - prev_ts
+        for i in np.flatnonzero(interval > self.tolerance * period):
+            self.log.add('gap', sequence + i,
+                         int(round(interval[i] / period)) - 1)
+        for i, n in _runs(ts <= prev_ts):
+            self.log.add('duplicate', sequence + i, n)
+        if data.dtype.kind in 'fc':
+            for i, n in _runs(np.isnan(data).any(0)):
+                self.log.add('invalid', sequence + i, n)
+        same = (data == np.hstack([prev, data[:, :-1]])).all(0)
+        if self._last is None:
+            same[0] = False
+        for i, n in _runs(same):
+            if i == 0 and self._run:  # continues the run of last block
+                if self._run >= self.min_repeat:  # recorded already
+                    self.log.add('repeat', sequence, n)
+                elif self._run + n >= self.min_repeat:
+                    self.log.add('repeat', sequence - self._run,
+                                 self._run + n)
+            elif n >= self.min_repeat:
+                self.log.add('repeat', sequence + i, n)
+        if same.all():
+            self._run += len(same)
+        else:
+            self._run = len(same) - 1 - np.flatnonzero(~same)[-1]
+        self._last, self._last_ts = data[:, -1:].copy(), latest[-1]
+
+
+# THE END
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/embci/io/metrics.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 21:36:08
+
+'''
+Health metrics of readers kept in shared memory.
+
+The loop task of a reader updates counters and histograms in a flat array
+of float64 with a few scalar stores per block (one writer, no lock, no
+array operations). Any thread or forked process holding the same
+`ReaderMetrics` takes a snapshot by `report`, where percentiles are
+computed, without waking up or slowing down the loop task. A snapshot may
+mix values of two successive updates, which is harmless for monitoring.
+
+Layout of the array::
+
+    +----------+--------------------+-------------------+-----------------+
+    | counters | latency histogram  | jitter histogram  | cursor slots    |
+    +----------+--------------------+-------------------+-----------------+
+    | COUNTERS | len(BINS) + 1      | len(BINS) + 1     | MAX_CURSORS     |
+    +----------+--------------------+-------------------+-----------------+
+
+Histograms count values in log-spaced bins from 1us to 10s. Each cursor
+slot holds the read position of a consumer, or -1 if the slot is free, so
+that lag of consumers can be measured from outside.
+'''
+
+# built-in
+from __future__ import absolute_import, division, print_function
+import time
+import math
+import multiprocessing as mp
+
+# requirements.txt: data: numpy
+import numpy as np
+
+__all__ = ['ReaderMetrics']
+
+
+class ReaderMetrics(object):
+    '''
+    Counters and histograms of a reader in shared memory.
+
+    Attributes
+    ----------
+    blocks, samples : int
+        Number of blocks and samples ingested.
+    overruns : int
+        Number of blocks whose fetching took more than twice their duration,
+        i.e. the loop task can not keep up with the source.
+    dropped : int
+        Number of samples missing according to timestamps.
+    rate : float
+        Samples per second, exponentially averaged over about one second.
+    latency : histogram
+        Seconds spent on fetching and converting each block.
+    jitter : histogram
+        Deviation of intervals between timestamps from the nominal sample
+        period in each block, in seconds: the larger one of the interval
+        from the previous block and the mean interval within the block.
+
+    Examples
+    --------
+    >>> metrics = ReaderMetrics()
+    >>> metrics.record(0.002, np.arange(10) / 500., 500)
+    >>> metrics.report()['samples']
+    10
+    '''
+    COUNTERS = ('blocks', 'samples', 'overruns', 'dropped', 'rate',
+                'latency_sum', 'latency_max', 'jitter_max',
+                'last_time', 'last_ts')
+    BINS = np.logspace(-6, 1, 29)  # 1us ~ 10s, 4 bins per decade
+    _BIN_FROM, _BIN_STEPS = -6, 4  # log10 of BINS[0], bins per decade
+    MAX_CURSORS = 16
+
+    def __init__(self):
+        nc, nb = len(self.COUNTERS), len(self.BINS) + 1
+        self._array = mp.RawArray('d', nc + 2 * nb + self.MAX_CURSORS)
+        self._lock = mp.Lock()  # only for claiming cursor slots
+        self._bind()
+        self.slots[:] = -1
+        self.reset()
+
+    def _bind(self):
+        nc, nb = len(self.COUNTERS), len(self.BINS) + 1
+        arr = np.frombuffer(self._array, np.float64)
+        self._counters = arr[:nc]
+        self._latency = arr[nc:nc + nb]
+        self._jitter = arr[nc + nb:nc + 2 * nb]
+        self.slots = arr[nc + 2 * nb:]
+        self._idx = dict(zip(self.COUNTERS, range(nc)))
+        self._offsets = (nc, nc + nb)  # of histograms in `_array`
+
+    def __getstate__(self):  # numpy views are rebuilt after unpickling
+        return {'_array': self._array, '_lock': self._lock}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bind()
+
+    def __getitem__(self, key):
+        return self._array[self._idx[key]]
+
+    def __setitem__(self, key, value):
+        self._array[self._idx[key]] = value
+
+    @classmethod
+    def _bin(cls, value):
+        '''Same as `BINS.searchsorted(value)` but on a scalar in O(1).'''
+        if not value > cls.BINS[0]:
+            return 0
+        i = (math.log10(value) - cls._BIN_FROM) * cls._BIN_STEPS
+        return min(int(math.ceil(i - 1e-9)), len(cls.BINS))
+
+    def reset(self):
+        '''Clear counters and histograms (cursor slots are kept).'''
+        self._counters[:] = 0
+        self._latency[:] = 0
+        self._jitter[:] = 0
+        self['last_ts'] = np.nan
+
+    def record(self, latency, ts, sample_rate):
+        '''
+        Account a block of samples. Called by the loop task of reader.
+
+        Parameters
+        ----------
+        latency : float
+            Seconds spent on fetching the block.
+        ts : float | array
+            Timestamps of samples in the block.
+        sample_rate : float
+            Nominal sample rate.
+        '''
+        try:
+            n = len(ts)
+        except TypeError:  # timestamp of single sample
+            n, first = 1, float(ts)
+            last = first
+        else:
+            if not n:
+                return
+            first, last = float(ts[0]), float(ts[-1])
+        arr, idx, (lat, jit) = self._array, self._idx, self._offsets
+        now, period = time.time(), 1.0 / sample_rate
+        prev, dt = arr[idx['last_ts']], now - arr[idx['last_time']]
+        arr[idx['blocks']] += 1
+        arr[idx['samples']] += n
+        arr[idx['latency_sum']] += latency
+        if latency > arr[idx['latency_max']]:
+            arr[idx['latency_max']] = latency
+        arr[lat + self._bin(latency)] += 1
+        if latency > 2 * n * period:
+            arr[idx['overruns']] += 1
+        jitter = abs((last - first) / (n - 1) - period) if n > 1 else None
+        if prev == prev:  # not NaN: compare with the previous block
+            gap = first - prev
+            if gap > 1.5 * period:
+                arr[idx['dropped']] += int(round(gap / period)) - 1
+            if gap < 2 * period:  # a gap is not jitter
+                jitter = max(jitter or 0, abs(gap - period))
+        if jitter is not None:
+            if jitter > arr[idx['jitter_max']]:
+                arr[idx['jitter_max']] = jitter
+            arr[jit + self._bin(jitter)] += 1
+        if arr[idx['last_time']] and dt > 0:
+            alpha = 1 - math.exp(-dt)  # time constant of 1 second
+            arr[idx['rate']] += alpha * (n / dt - arr[idx['rate']])
+        arr[idx['last_time']], arr[idx['last_ts']] = now, last
+
+    def claim(self, position=0):
+        '''Reserve a cursor slot. Returns its index, or None if all used.'''
+        with self._lock:
+            free = np.flatnonzero(self.slots < 0)
+            if not len(free):
+                return None
+            self.slots[free[0]] = position
+            return int(free[0])
+
+    def release(self, slot):
+        '''Free a cursor slot reserved by `claim`.'''
+        self.slots[slot] = -1
+
+    @classmethod
+    def _summary(cls, hist, total, peak):
+        '''Mean / percentiles / max of a histogram, percentiles are upper
+        edges of bins.'''
+        count = hist.sum()
+        if not count:
+            return {'count': 0}
+        edges = np.r_[cls.BINS, np.inf]
+        cdf = np.cumsum(hist) / count
+        p50, p99 = [min(edges[np.searchsorted(cdf, q)], peak)
+                    for q in (0.5, 0.99)]
+        ret = {'count': int(count), 'p50': float(p50), 'p99': float(p99),
+               'max': float(peak)}
+        if total is not None:
+            ret['mean'] = total / count
+        return ret
+
+    def report(self, sequence=None, histogram=False):
+        '''
+        Snapshot of metrics as a dict of builtin types (JSON serializable).
+
+        Parameters
+        ----------
+        sequence : int, optional
+            Current sequence number of the buffer to compute lag of cursors.
+        histogram : bool
+            Whether to include counts of histogram bins, default False.
+        '''
+        c = self._counters.copy()
+        get = lambda k: float(c[self._idx[k]])                 # noqa: E731
+        idle = time.time() - get('last_time')
+        ret = {k: int(get(k)) for k in
+               ('blocks', 'samples', 'overruns', 'dropped')}
+        # rate decays if no samples arrived for more than one second
+        ret['rate'] = get('rate') * min(np.exp(1 - idle), 1)
+        ret['latency'] = self._summary(
+            self._latency.copy(), get('latency_sum'), get('latency_max'))
+        ret['jitter'] = self._summary(
+            self._jitter.copy(), None, get('jitter_max'))
+        if histogram:
+            ret['bins'] = self.BINS.tolist()
+            ret['latency']['hist'] = self._latency.astype(int).tolist()
+            ret['jitter']['hist'] = self._jitter.astype(int).tolist()
+        slots = self.slots.copy()
+        if sequence is not None:
+            ret['lag'] = [int(max(sequence - p, 0)) for p in slots if p >= 0]
+        return ret
+
+
+# THE END
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/embci/io/protocol.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 16:05:12
+
+'''
+Binary frame protocol shared by serial / socket data stream readers.
+
+A frame carries a block of `n_sample` x `n_channel` integer samples::
+
+    +------+-----+----------+-----------+-------+------+-------------+-----+
+    | sync | seq | n_sample | n_channel | width | time | payload     | sum |
+    +------+-----+----------+-----------+-------+------+-------------+-----+
+    | 2B   | u16 | u8       | u8        | u8    | f64  | n*c*width B | u16 |
+    +------+-----+----------+-----------+-------+------+-------------+-----+
+
+- `sync` is always `b'\xA5\x5A'`.
+- `seq` counts frames (wraps at 65536), so that lost frames can be counted.
+- Samples are ordered sample by sample (i.e. `n_sample x n_channel`).
+  `width` 3 means 24-bit two's complement, most significant byte first
+  (as output by ADS1299), and 4 means little-endian int32.
+- `time` is optional. If the highest bit of `width` is set (`FLAG_TIME`),
+  the sender's timestamp of the first sample follows the header, in
+  seconds as little-endian float64.
+- `sum` is the checksum: sum of all bytes between `sync` and `checksum`, modulo
+  65536, in little-endian.
+
+Bytes are received into a fixed-size buffer by `FrameDecoder.fill` (which
+accepts any `readinto`-like function, e.g. `serial.Serial.readinto` or
+`socket.socket.recv_into`), so no memory is allocated per read. Frames
+of the same layout in a row are validated and decoded at once by numpy.
+When a frame is corrupted, the decoder skips one byte and searches for the
+next sync word.
+'''
+
+# built-in
+from __future__ import absolute_import, division, print_function
+import struct
+
+# requirements.txt: data: numpy
+import numpy as np
+
+from ..drivers.ads1299 import decode_int24
+
+__all__ = [
+    'SYNC', 'HEADER', 'FLAG_TIME',
+    'encode_frame', 'decode_int24', 'FrameDecoder',
+]
+
+SYNC = b'\xA5\x5A'
+HEADER = struct.Struct('<2sHBBB')
+STAMP = struct.Struct('<d')
+CHECKSUM = struct.Struct('<H')
+WIDTHS = (3, 4)
+FLAG_TIME = 0x80
+
+
+def encode_frame(data, seq=0, width=4, timestamp=None):
+    '''
+    Pack samples into a frame. This is the reference implementation of the
+    sender side (e.g. for simulated devices and testing).
+
+    Parameters
+    ----------
+    data : array of integers
+        In shape of n_channel x n_sample, like what readers return.
+    seq : int
+        Frame counter, only its lower 16 bits are used.
+    width : int
+        Bytes per sample: 3 or 4.
+    timestamp : float, optional
+        Time of the first sample in seconds.
+    '''
+    data = np.asarray(data, np.int64)
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+    n_channel, n_sample = data.shape
+    if width not in WIDTHS:
+        raise ValueError('Invalid sample width: {}'.format(width))
+    if not (0 < n_sample < 256 and 0 < n_channel < 256):
+        raise ValueError('Invalid frame shape: {}'.format(data.shape))
+    samples = np.ascontiguousarray(data.T, np.int32)
+    if width == 4:
+        payload = samples.astype('<i4').tobytes()
+    else:
+        raw = samples.astype('>i4').view(np.uint8).reshape(-1, 4)
+        payload = raw[:, 1:].tobytes()
+    if timestamp is None:
+        head = HEADER.pack(SYNC, seq & 0xFFFF, n_sample, n_channel, width)
+    else:
+        head = HEADER.pack(SYNC, seq & 0xFFFF, n_sample, n_channel,
+                           width | FLAG_TIME) + STAMP.pack(timestamp)
+    body = head[2:] + payload
+    csum = int(np.frombuffer(body, np.uint8).sum()) & 0xFFFF
+    return head + payload + CHECKSUM.pack(csum)
+
+
+class FrameDecoder(object):
+    '''
+    Stream decoder of binary frames.
+
+    Parameters
+    ----------
+    capacity : int
+        Size of receive buffer in bytes. Bytes that do not form a complete
+        frame yet stay in the buffer until next `fill`.
+    ordered : bool
+        Whether frames arrive in order (e.g. serial port or TCP), so that
+        gaps of `seq` are counted as lost frames. Set it to False if the
+        caller puts frames back in order (e.g. UDP) using `seqs`.
+
+    Attributes
+    ----------
+    stats : dict
+        Counters of decoded frames & samples, lost frames (by gaps of `seq`),
+        corrupt frames and bytes skipped while searching for sync word.
+    layout : tuple or None
+        (n_sample, n_channel, width) of the last valid frame.
+    seqs : ndarray
+        Sequence numbers of frames returned by the last `decode`.
+
+    Examples
+    --------
+    >>> decoder = FrameDecoder()
+    >>> decoder.feed(encode_frame([[1, 2], [3, 4]], seq=0))
+    >>> data, stamps = decoder.decode()
+    >>> data
+    array([[1, 2],
+           [3, 4]], dtype=int32)
+    >>> print(stamps)
+    None
+    '''
+    def __init__(self, capacity=65536, ordered=True):
+        self.ordered = ordered
+        self.seqs = np.array([], np.int64)
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._pos = self._end = 0
+        self._seq = None
+        self.layout = None
+        self.stats = dict.fromkeys(
+            ['frames', 'samples', 'dropped', 'corrupt', 'skipped'], 0)
+
+    def __len__(self):
+        '''Number of bytes waiting to be decoded.'''
+        return self._end - self._pos
+
+    @property
+    def frame_size(self):
+        '''Size of frames in bytes, or minimum size if none decoded yet.'''
+        if self.layout is None:
+            return HEADER.size + CHECKSUM.size
+        return self._size(*self.layout)
+
+    @staticmethod
+    def _size(n, c, w):
+        return (HEADER.size + (w & FLAG_TIME and STAMP.size) +
+                n * c * (w & ~FLAG_TIME) + CHECKSUM.size)
+
+    def reset(self):
+        '''Clear pending bytes and forget the frame counter.'''
+        self._pos = self._end = 0
+        self._seq = None
+
+    def _discard(self):
+        # buffer is full of garbage: drop it to receive again
+        self.stats['skipped'] += len(self)
+        self._pos = self._end = 0
+
+    def _compact(self):
+        if self._pos == 0:
+            return
+        n = self._end - self._pos
+        self._buf[:n] = self._buf[self._pos:self._end]
+        self._pos, self._end = 0, n
+
+    def writable(self, size=None):
+        '''Free space of the buffer as a memoryview, at most `size` bytes.'''
+        if len(self._buf) - self._end < (size or len(self._buf)) // 2:
+            self._compact()
+        end = len(self._buf)
+        if size is not None:
+            end = min(end, self._end + size)
+        return self._view[self._end:end]
+
+    def commit(self, nbytes):
+        '''Mark `nbytes` written into `writable()` as received.'''
+        self._end = min(len(self._buf), self._end + nbytes)
+
+    def fill(self, readinto, size=None):
+        '''
+        Receive bytes by `readinto(buffer) => nbytes`, e.g. `sock.recv_into`.
+        Returns number of bytes received.
+        '''
+        view = self.writable(size)
+        if not len(view):
+            self._discard()
+            view = self.writable(size)
+        nbytes = readinto(view) or 0
+        self.commit(nbytes)
+        return nbytes
+
+    def feed(self, data):
+        '''Append bytes to the buffer (copy). See `fill` for zero-copy.'''
+        data = memoryview(data)
+        while len(data):
+            view = self.writable(len(data))
+            if not len(view):
+                self._discard()
+                continue
+            n = len(view)
+            view[:] = data[:n]
+            self.commit(n)
+            data = data[n:]
+
+    def _sync(self):
+        '''Skip bytes until sync word. Return False if no sync found.'''
+        idx = self._buf.find(SYNC, self._pos, self._end)
+        if idx < 0:
+            idx = self._end
+            # keep last byte because it may be the first half of sync
+            if idx > self._pos and self._buf[idx - 1] == 0xA5:
+                idx -= 1
+        self.stats['skipped'] += idx - self._pos
+        self._pos = idx
+        return self._end - idx >= HEADER.size
+
+    def _corrupt(self):
+        self.stats['corrupt'] += 1
+        self._pos += 1
+
+    def decode(self):
+        '''
+        Decode all complete frames in the buffer.
+
+        Returns
+        -------
+        data : ndarray of int32 or None
+            Samples in shape of n_channel x n_sample. If layout of frames
+            changes, only frames of the first layout are returned and the
+            others are left for next call.
+        stamps : ndarray of float64 or None
+            Timestamps of the first sample of each frame, if carried.
+        '''
+        while self._sync():
+            _, seq, n, c, w = HEADER.unpack_from(self._buf, self._pos)
+            if not n or not c or (w & ~FLAG_TIME) not in WIDTHS:
+                self._corrupt()
+                continue
+            size = self._size(n, c, w)
+            start = HEADER.size + (w & FLAG_TIME and STAMP.size)
+            count = (self._end - self._pos) // size
+            if not count:
+                break
+            # frames of same layout in a row are validated at once
+            frames = np.frombuffer(
+                self._view[self._pos:self._pos + count * size], np.uint8
+            ).reshape(count, size)
+            head = frames[0, :HEADER.size]
+            valid = (frames[:, :2] == head[:2]).all(1)
+            valid &= (frames[:, 4:HEADER.size] == head[4:]).all(1)
+            csum = frames[:, 2:-2].sum(1, dtype=np.uint32) & 0xFFFF
+            valid &= csum == frames[:, -2:].astype(np.uint32).dot([1, 256])
+            if not valid[0]:
+                del frames, head
+                self._corrupt()
+                continue
+            if not valid.all():
+                count = int(np.argmin(valid))
+                frames = frames[:count]
+            self.seqs = seqs = frames[:, 2:4].astype(np.int64).dot([1, 256])
+            if self.ordered:
+                first = seqs[0] - 1 if self._seq is None else self._seq
+                gaps = (np.diff(np.r_[first, seqs]) - 1) % 0x10000
+                self.stats['dropped'] += int(gaps.sum())
+            self._seq = int(seqs[-1])
+            stamps = None
+            if w & FLAG_TIME:
+                stamps = frames[:, HEADER.size:start].copy().view('<f8')
+                stamps = stamps.astype(np.float64).ravel()
+            payload = frames[:, start:-2]
+            if w & ~FLAG_TIME == 3:
+                data = decode_int24(payload)
+            else:
+                data = payload.copy().view('<i4').astype(np.int32)
+            del frames, head, payload
+            self._pos += count * size
+            self.layout = (n, c, w)
+            self.stats['frames'] += count
+            self.stats['samples'] += count * n
+            return data.reshape(count * n, c).T, stamps
+        return None, None
+
+    def decode_raw(self, dtype, n_channel):
+        '''
+        Take all whole samples from a headerless stream, i.e. a sequence of
+        `n_channel` values of `dtype`. Returns n_channel x n_sample array
+        or None. Partial sample is left in the buffer for next call.
+        '''
+        dtype = np.dtype(dtype)
+        size = dtype.itemsize * n_channel
+        count = len(self) // size
+        if not count:
+            return None
+        data = np.frombuffer(
+            self._view[self._pos:self._pos + count * size], dtype
+        ).reshape(count, n_channel).T.copy()
+        self._pos += count * size
+        self.stats['samples'] += count
+        return data
+
+
+# THE END
@@ -27,18 +27,21 @@ from __future__ import print_function
 import os
 import re
 import time
+import errno
 import mmap
 import socket
-import warnings
 import threading
+import functools
+import traceback
 import multiprocessing as mp
-from ctypes import c_bool, c_char_p, c_uint8, c_uint16, c_float
+from ctypes import c_bool, c_char_p, c_uint8, c_uint32, c_float, c_double
 
-# requirements.txt: data: numpy, scipy, pylsl
+# requirements.txt: data: numpy, scipy, pylsl, mne
 # requirements.txt: drivers: pyserial
 import numpy as np
 import scipy.io
 import scipy.signal
+import mne
 import pylsl
 import serial
 
@@ -51,9 +54,14 @@ from ..utils import (
 from ..drivers.ads1299 import ADS1299_API
 from ..drivers.esp32 import ESP32_API
 from ..configs import DIR_PID, DIR_TMP
+from .buffers import RingBuffer, TieredBuffer
+from .protocol import FrameDecoder
+from .ingest import Resampler, ClockModel, EventLog, GapTracker, _monotonic
+from .metrics import ReaderMetrics
+from .synthetic import SignalGenerator
 from . import logger
 
-__all__ = ['validate_readername', 'FakeDataGenerator', ] + [
+__all__ = ['validate_readername', 'FakeDataGenerator', 'AttachedReader'] + [
     _ + 'Reader' for _ in (
         'Files', 'LSL', 'Serial',
         'ADS1299SPI', 'ESP32SPI',
@@ -83,6 +91,19 @@ def validate_readername(name):                                     # noqa: E302
     return '%s_%d' % (name, list(set(range(len(ids) + 1)).difference(ids))[0])
 
 
+def _map_file(path):
+    '''Map a shared buffer file, e.g. after the writer has migrated.'''
+    with open(path, 'r+b') as f:
+        return mmap.mmap(f.fileno(), 0)
+
+
+def _close_mmap(mm):
+    try:
+        mm.close()
+    except BufferError:  # views are still held by consumers
+        logger.debug('%s will be closed by GC' % mm)
+
+
 class StatusMixin(object):
     def is_streaming(self):
         if hasattr(self, '_task'):
@@ -97,21 +118,36 @@ class StatusMixin(object):
             return 0
         # 1. frequency of last point
         #  idx = self._index - 1
-        #  dt = self._data[-1, idx] - self._data[-1, idx - 1]
+        #  dt = self._times[idx] - self._times[idx - 1]
         #  return 1 / dt if dt else 0
 
         # 2. averaged frequency of last frame
         idx = self._index
-        dT = self._data[-1, idx - 1] - self._data[-1, idx]
+        dT = self._times[idx - 1] - self._times[idx]
         return self.window_size / dT if dT else 0
 
     def __getitem__(self, items):
+        '''
+        Index buffer as an array of (num_channel + 1) x window_size, whose
+        last row is timestamps, e.g. `reader[-1]`. A single row is a view,
+        otherwise data and timestamps are copied into a float64 array.
+        '''
         # TODO: May integret data processing algorithm in readers
         #  if isinstance(items, tuple):
         #      for item in items:
         #          self = self[item]
         #      return self
-        return self._data[items]
+        if isinstance(items, tuple):
+            row, rest = items[0], items[1:]
+        else:
+            row, rest = items, ()
+        nch = self._data.shape[0]
+        if isinstance(row, (int, np.integer)) and -nch - 1 <= row <= nch:
+            row = row % (nch + 1)
+            if row == nch:
+                return self._times[rest]
+            return self._data[(row, ) + rest]
+        return np.vstack([self._data, self._times])[items]
 
     def __repr__(self):
         if not hasattr(self, 'status'):
@@ -132,62 +168,224 @@ class ReaderIOMixin(object):
             self.sample_time = sample_time
         self.window_size = int(self.sample_rate * self.sample_time)
         self.sample_time = float(self.window_size) / self.sample_rate
-        if self.status in ['started', 'resumed']:
-            warnings.warn('Runtime sample rate changing is not suggested.')
-            logger.info('{} sample rate set to {}, you may want to restart '
-                        'reader now.'.format(self.name, self.sample_rate))
-            return False
-            # TODO: change info and re-configure self._data etc. at runtime.
-            #  self.restart()
+        if self.started:
+            return self.reconfigure()
         return True
 
     def set_channel_num(self, num_channel):
         self.num_channel = int(num_channel)
         self.channels = ['ch%d' % i for i in range(1, num_channel + 1)]
         self.channels += ['time']
-        if self.status in ['started', 'resumed']:
-            warnings.warn('Runtime channel num changing is not suggested.')
-            #  self.restart()
+        if self.started:
+            return self.reconfigure()
+        return True
+
+    @property
+    def _index(self):
+        return self._ring.index
+
+    def _wait_fresh(self, i):
+        '''
+        Wait until buffer is updated since last pick through slot `i`.
+        Sources may deliver samples in blocks, so wait up to one window
+        (sample_time). Return False if nothing is saved in that time.
+        '''
+        if not self.is_streaming():
+            return True
+        if self._lasti[i] > self._ring.sequence:  # reader restarted
+            self._lasti[i] = 0
+        if not self._ring.wait(self._lasti[i] + 1, self.sample_time):
+            logger.warning(self.name + ' read data timeout')
             return False
+        self._lasti[i] = self._ring.sequence
         return True
 
+    @property
+    def _lasti(self):
+        '''Sequences of last picked data, private to each consumer thread.'''
+        local = self.__dict__.get('_lasti_local')
+        if local is None:
+            local = self.__dict__['_lasti_local'] = threading.local()
+        if not hasattr(local, 'lasti'):
+            # 0:Channel 1:Frame 2:All 3:View 4: NotUsed
+            local.lasti = [0] * 5
+        return local.lasti
+
+    @property
+    def read_stats(self):
+        '''Counters of lock-free reads from buffer in current process.'''
+        return dict(self._ring.stats)
+
+    def subscribe(self, position=None):
+        '''
+        Create a cursor with its own read position in buffer. Consumers
+        holding different cursors get every new sample exactly once without
+        interfering with each other or with `data_frame` etc.
+
+        See Also
+        --------
+        embci.io.buffers.Cursor
+        '''
+        buf = self._ring if self._history is None else self._history
+        metrics = getattr(self, '_metrics', None)
+        slot = None if metrics is None else metrics.claim()
+        if slot is None:
+            return buf.cursor(position)
+        return buf.cursor(  # publish read position to measure lag
+            position, slot=metrics.slots[slot:slot + 1],
+            release=functools.partial(metrics.release, slot))
+
+    def stream(self, n=None, **k):
+        '''
+        Asynchronous iterator of blocks of `n` new samples for asyncio
+        consumers (Python 3.5+), see `embci.io.aio.ReaderStream`.
+
+        Examples
+        --------
+        >>> async for block in reader.stream(50):
+        ...     print(block.shape)
+        (9, 50)
+        '''
+        from .aio import ReaderStream  # syntax of Python 3 only
+        return ReaderStream(self, n, **k)
+
+    @property
+    def metrics(self):
+        '''
+        Health metrics of the loop task: samples per second, latency of
+        fetching, jitter of timestamps, overruns, dropped samples and lag
+        of each subscribed cursor. See `embci.io.metrics.ReaderMetrics`.
+        '''
+        return self.get_metrics()
+
+    def get_metrics(self, histogram=False):
+        '''Same as `metrics`, optionally with counts of histogram bins.'''
+        metrics = getattr(self, '_metrics', None)
+        if metrics is not None:
+            return metrics.report(self._ring.sequence, histogram)
+
+    def events(self, start=None, stop=None):
+        '''
+        Gaps, duplicates, repeated samples and stalls noticed while saving
+        samples in [start, stop) of sequence numbers (default all recent
+        ones), see `embci.io.ingest.EventLog`. Only stalls are recorded
+        unless the reader is created with `track_gaps=True`. With the clock
+        model, gaps of timestamps are smoothed over and blocks arriving
+        late are recorded instead.
+
+        Examples
+        --------
+        >>> reader.events()
+        [{'kind': 'gap', 'sequence': 5120, 'count': 32, 'time': 17922...}]
+        '''
+        log = getattr(self, '_events', None)
+        return [] if log is None else log.events(start, stop)
+
+    def event_mask(self, start, n):
+        '''
+        Boolean mask of `n` samples from sequence number `start` on, True
+        for bad samples, so that they can be masked or interpolated.
+
+        Examples
+        --------
+        >>> cursor = reader.subscribe()
+        >>> data, lost = cursor.read(500)
+        >>> bad = reader.event_mask(cursor.position - 500, 500)
+        '''
+        log = getattr(self, '_events', None)
+        return np.zeros(n, bool) if log is None else log.mask(start, n)
+
+    def history(self, seconds=None, timestamp=True):
+        '''
+        Pick latest `seconds` (default all available) of samples.
+
+        Only the latest window_size samples are available unless the reader
+        is created with `history_time`, in which case samples are spilled
+        to memory-mapped file `hist_${name}` under DIR_TMP and the latest
+        `history_time` seconds of them can be picked.
+        '''
+        buf = self._ring if self._history is None else self._history
+        n = len(buf) if seconds is None else int(seconds * self.sample_rate)
+        n = min(n, len(buf))
+        return buf.copy_from(buf.sequence - n, timestamp=timestamp)[0]
+
+    def wait(self, n=1, timeout=None):
+        '''
+        Block until `n` new samples are saved into buffer from now on.
+        Return False if `timeout` (in seconds) elapsed before that.
+        '''
+        return self._ring.wait(self._ring.sequence + n, timeout)
+
     @property
     def data_channel(self):
-        '''Pick num_channel x 1 fresh data from buffer.'''
-        return self.data_channel_t[:-1]
+        '''
+        Pick num_channel x 1 fresh data from buffer. Return None if no new
+        sample is saved within sample_time, instead of the stale one.
+        Only the latest sample of each block is picked, subscribe a cursor
+        to get every sample.
+        '''
+        if self._wait_fresh(0):
+            return self._ring.column()
 
     @property
     def data_channel_t(self):
-        '''Pick (num_channel + time_channel) x 1 fresh data from buffer.'''
-        if self.is_streaming():
-            t = time.time()
-            while self._lasti[0] == self._index:
-                time.sleep(0)
-                if (time.time() - t) > (10.0 / self.sample_rate):
-                    logger.warning(self.name + ' read data timeout')
-                    break
-            self._lasti[0] = self._index
-        data, idx = self._data.copy(), self._lasti[0] - 1
-        return data[:, idx]
+        '''
+        Pick (num_channel + time_channel) x 1 fresh data from buffer.
+        Data with time channel are upcast to float64, same below.
+        Return None on timeout like `data_channel`.
+        '''
+        if self._wait_fresh(0):
+            return self._ring.column(timestamp=True)
 
     @property
     def data_frame(self):
-        '''Pick num_channel x window_size from buffer.'''
-        return self.data_frame_t[:-1]
+        '''
+        Pick num_channel x window_size from buffer. The latest window is
+        returned even if no new sample is saved within sample_time, see
+        `data_frame_t` to check that.
+        '''
+        self._wait_fresh(1)
+        return self._ring.read()
 
     @property
     def data_frame_t(self):
-        '''Pick (num_channel + time_channel) x window_size from buffer.'''
-        if self.is_streaming():
-            t = time.time()
-            while self._lasti[1] == self._index:
-                time.sleep(0)
-                if (time.time() - t) > (10.0 / self.sample_rate):
-                    logger.warning(self.name + ' read data timeout')
-                    break
-            self._lasti[1] = self._index
-        data, idx = self._data.copy(), self._lasti[1]
-        return np.concatenate((data[:, idx:], data[:, :idx]), -1)
+        '''
+        Pick (num_channel + time_channel) x window_size from buffer.
+        Stale windows can be told by the timestamps in the last row.
+        '''
+        self._wait_fresh(1)
+        return self._ring.read(timestamp=True)
+
+    def frame_view(self, n=None, out=None, timestamp=False):
+        '''
+        Pick latest `n` (default window_size) fresh samples without allocation.
+
+        Parameters
+        ----------
+        n : int, optional
+            Number of samples, must not exceed window_size.
+        out : ndarray, optional
+            Destination used only when samples wrap around the end of buffer.
+            Its shape must be (num_channel [+ 1]) x n.
+        timestamp : bool
+            Whether to include time channel as the last row, default False.
+            Timestamps are stored apart from samples, so frames with time
+            channel are always copied (into float64 `out`).
+
+        Returns
+        -------
+        out : ndarray
+            A read-only view into the buffer if samples are contiguous in
+            memory, otherwise `out` filled with a single copy. Views are
+            live, copy them if you need to keep the data. Latest samples
+            are returned even if none is saved within sample_time.
+
+        See Also
+        --------
+        embci.io.buffers.RingBuffer.view
+        '''
+        self._wait_fresh(3)
+        return self._ring.view(n, out, timestamp=timestamp)
 
     @property
     def data_all(self):
@@ -196,18 +394,14 @@ class ReaderIOMixin(object):
         Start from where index equals to 0.
         '''
         if self.is_streaming():
-            t = time.time()
-            while self._index or self._lasti[2] == self._data[-1, self._index]:
-                if self._index < self.window_size // 2:
-                    time.sleep(self.sample_time * 0.4)
-                else:
-                    time.sleep(0)
-                if (time.time() - t) > 10 * self.sample_time:
-                    logger.warning(self.name + ' read data timeout')
-                    break
-            self._lasti[2] = self._data[-1, self._index]
-        data, idx = self._data.copy(), self._index
-        return np.concatenate((data[:, idx:], data[:, :idx]), -1)
+            size = self.window_size
+            if self._lasti[2] > self._ring.sequence:  # reader restarted
+                self._lasti[2] = 0
+            target = (self._lasti[2] // size + 1) * size
+            if not self._ring.wait(target, 10 * self.sample_time):
+                logger.warning(self.name + ' read data timeout')
+            self._lasti[2] = self._ring.sequence
+        return self._ring.read(timestamp=True)
 
 
 class CompatMixin(object):
@@ -246,19 +440,26 @@ class BaseReader(LoopTaskMixin, ReaderIOMixin, CompatMixin, StatusMixin):
         # stream control flags used by `embci.utils.LoopTaskMixin`
         obj.__flag_pause__ = mp.Event()
         obj.__flag_close__ = mp.Event()
+        # notified by loop task when new data are saved into buffer
+        obj.__cond_data__ = mp.Condition()
+        # set to ask loop task to re-configure buffer, cleared when done
+        obj.__flag_reconf__ = mp.Event()
+        # counters & histograms updated by loop task, see `metrics`
+        obj._metrics = ReaderMetrics()
+        # gaps, duplicates etc. noticed by loop task, see `events`
+        obj._events = EventLog()
         # Basic stream reader attributes.
         # These values may be accessed in another thread or process.
         # So make them multiprocessing.Value and serve as properties.
         for name, type, value in [
-            ('_index',         c_uint16,  0),
             ('__status__',     c_char_p,  b'closed'),
             ('__started__',    c_bool,    False),
             ('input_source',   c_char_p,  b''),
-            ('sample_rate',    c_uint16,  0),
+            ('sample_rate',    c_uint32,  0),
             ('sample_time',    c_float,   0),
-            ('window_size',    c_uint16,  0),
+            ('window_size',    c_uint32,  0),
             ('num_channel',    c_uint8,   0),
-            ('start_time',     c_float,   0),
+            ('start_time',     c_double,  0),
         ]:
             attr = '_mp_' + name
             setattr(obj, attr, mp.Value(type, value))
@@ -279,11 +480,19 @@ class BaseReader(LoopTaskMixin, ReaderIOMixin, CompatMixin, StatusMixin):
         return obj
 
     def __init__(self, sample_rate, sample_time, num_channel, name=None,
-                 input_source=None, broadcast=False, datatype=None, *a, **k):
+                 input_source=None, broadcast=False, datatype=None,
+                 history_time=0, clock_model=True, track_gaps=False,
+                 *a, **k):
         # Update basic info with arguments
         self.set_sample_rate(sample_rate, sample_time)
         self.set_channel_num(num_channel)
         self.input_source = input_source or 'Unknown'
+        # Seconds of samples spilled to disk beyond window_size, see `history`
+        self.history_time = float(history_time or 0)
+        # Smooth timestamps of samples stamped on arrival, see `ClockModel`
+        self.clock_model = get_boolean(clock_model)
+        # Check saved samples for gaps etc., see `events` (not for free)
+        self.track_gaps = get_boolean(track_gaps)
 
         # Broadcast data to a lab-streaming-layer outlet.  Here we only need
         # to check one time whether send_pylsl is True. If put this work in
@@ -300,14 +509,44 @@ class BaseReader(LoopTaskMixin, ReaderIOMixin, CompatMixin, StatusMixin):
         # Locked file used to share data among processes
         pidfn = os.path.join(DIR_PID, self.name + '.pid')
         mmapfn = os.path.join(DIR_TMP, 'mmap_' + self.name)
+        histfn = os.path.join(DIR_TMP, 'hist_' + self.name)
         self._file_pid = LockedFile(pidfn, pidfile=True)
         self._file_data = LockedFile(mmapfn)
-        self._data = np.zeros(
-            (self.num_channel + 1, self.window_size), self._dtype)
+        self._file_hist = LockedFile(histfn)
+        shape = (self.num_channel, self.window_size)
+        self._ring = RingBuffer(
+            bytearray(RingBuffer.nbytes(shape, self._dtype)), shape,
+            self._dtype, self.sample_rate, self.__cond_data__,
+            remap=functools.partial(_map_file, mmapfn))
+        self._history = None
+        self._writer = None
+        self._resampler = None
+        self._anchor = None  # (time, index of sample) to pace data, if any
+        self._clock = None  # (start_time, ClockModel) of arrival times
+        self._gaps = None
+
+    @property
+    def _data(self):
+        '''
+        Data buffer n_channel x window_size. Timestamps are not its last row
+        any more but kept in `_times`, use `reader[-1]` for both kinds.
+        '''
+        return self._ring.data
+
+    @_data.setter
+    def _data(self, data):
+        # keep the same ring object so that cursors stay valid
+        times = self._ring.times.copy()
+        buf = bytearray(RingBuffer.nbytes(data.shape, data.dtype))
+        self._ring.bind(buf, data.shape, data.dtype, self.sample_rate)
+        self._ring.data[:] = data
+        if times.shape == self._ring.times.shape:
+            self._ring.times[:] = times
 
-        # Indexs used to output data
-        # 0:Channel 1:Frame 2:All 3-5: NotUsed
-        self._lasti = [self._index] * 5
+    @property
+    def _times(self):
+        '''Timestamps buffer (float64) of window_size.'''
+        return self._ring.times
 
     def start(self, method=None, *a, **k):
         if not LoopTaskMixin.start(self):
@@ -315,17 +554,18 @@ class BaseReader(LoopTaskMixin, ReaderIOMixin, CompatMixin, StatusMixin):
 
         # lock files to protect writing permission
         self._file_pid.acquire()
-        shape = ((self.num_channel + 1), self.window_size)
+        shape = (self.num_channel, self.window_size)
         f = self._file_data.acquire()
-        f.write('\x00' * shape[0] * shape[1] * self._dtype.itemsize)
+        f.truncate(0)  # zero-filled
+        f.truncate(RingBuffer.nbytes(shape, self._dtype))
         f.flush()
 
-        # register memory-mapped-file as data buffer
+        # register memory-mapped-file as data buffer, which can be attached
+        # by other processes, see `AttachedReader`
         self._file_mmap = mmap.mmap(f.fileno(), 0)
-        self._data = np.ndarray(
-            shape=shape, dtype=self._dtype, buffer=self._file_mmap)
-        # in case that restarted with smaller window_size
-        self._index = 0
+        self._ring.bind(self._file_mmap, shape, self._dtype, self.sample_rate)
+        if self.history_time > 0:
+            self._history = self._spill_history()
 
         if self._lsl_send:
             self._lsl_info = pylsl.StreamInfo(
@@ -357,121 +597,609 @@ class BaseReader(LoopTaskMixin, ReaderIOMixin, CompatMixin, StatusMixin):
     def close(self, *a, **k):
         if not LoopTaskMixin.close(self):
             return False
-        self._data = self._data.copy()  # remove reference to old data buffer
-        self._file_mmap.close()
+        self._ring.release()  # remove reference to old data buffer
+        _close_mmap(self._file_mmap)
+        if self._history is not None:
+            self._history.spill.release(copy=False)  # too large to keep
+            self._history = None
+            _close_mmap(self._hist_mmap)
+            self._file_hist.release()
         self._file_data.release()
         self._file_pid.release()
         logger.debug(self.name + ' stream stopped')
         return True
 
+    def _history_shape(self):
+        '''Chunk size and shape of spill buffer of long history.'''
+        chunk = max(1, self.window_size // 4)
+        return chunk, (self.num_channel,
+                       int(self.history_time * self.sample_rate) + chunk)
+
+    def _spill_history(self):
+        '''Map spill file of long history behind the hot buffer.'''
+        chunk, shape = self._history_shape()
+        f = self._file_hist.acquire()
+        f.truncate(0)
+        f.truncate(RingBuffer.nbytes(shape, self._dtype))
+        f.flush()
+        self._hist_mmap = mmap.mmap(f.fileno(), 0)
+        spill = RingBuffer(
+            self._hist_mmap, shape, self._dtype, self.sample_rate,
+            remap=functools.partial(_map_file, self._file_hist.path))
+        return TieredBuffer(self._ring, spill, chunk)
+
+    def reconfigure(self, timeout=3):
+        '''
+        Re-allocate shared buffers for current sample_rate & num_channel
+        without restarting the stream. Buffers are migrated by the loop
+        task (the writer) between two fetches, and consumers (attached
+        readers, cursors etc.) follow on their next pick.
+
+        Returns
+        -------
+        out : bool
+            False if the loop task failed to do it within `timeout` seconds.
+        '''
+        if self._file_data.file_obj is None:  # buffer not allocated yet
+            return True
+        if self._writer == (os.getpid(), threading.current_thread().ident):
+            self._migrate()
+            return True
+        self.__flag_reconf__.set()
+        deadline = time.time() + timeout
+        while self.__flag_reconf__.is_set():
+            if time.time() > deadline:
+                logger.error(self.name + ' re-configure buffer timeout')
+                return False
+            time.sleep(0.001)
+        self._ring.refresh()
+        return True
+
+    def _replace_file(self, attr, nbytes):
+        '''
+        Create and map a new file to replace locked file `self.<attr>`.
+        Return the mmap and a function to publish the new file by renaming.
+        '''
+        old = getattr(self, attr)
+        new = LockedFile('%s.%d' % (old.path, os.getpid()))
+        f = new.acquire()
+        f.truncate(nbytes)
+        f.flush()
+
+        def publish():
+            os.rename(new.path, old.path)
+            new.path, old.autoclean = old.path, False
+            old.release()
+            setattr(self, attr, new)
+        return mmap.mmap(f.fileno(), 0), publish
+
+    def _migrate(self):
+        '''Migrate buffers to current shape. Executed by the writer.'''
+        shape = (self.num_channel, self.window_size)
+        if self._history is not None:
+            chunk, hshape = self._history_shape()
+            self._history.flush()
+            old, (self._hist_mmap, publish) = self._hist_mmap, \
+                self._replace_file(
+                    '_file_hist', RingBuffer.nbytes(hshape, self._dtype))
+            # history restarts as sample rate and channels may differ
+            self._history.spill.migrate(
+                self._hist_mmap, hshape, self.sample_rate, 0, publish)
+            self._history.chunk = chunk
+            _close_mmap(old)
+        old, (self._file_mmap, publish) = self._file_mmap, self._replace_file(
+            '_file_data', RingBuffer.nbytes(shape, self._dtype))
+        self._ring.migrate(
+            self._file_mmap, shape, self.sample_rate, publish=publish)
+        _close_mmap(old)
+        if self._resampler is not None:
+            self.set_source_rate(self._resampler.rate_in)
+        if self._gaps is not None:
+            self._gaps.sample_rate = self.sample_rate
+            self._gaps.reset()
+        logger.debug('{} buffer migrated to {} @ {}Hz'.format(
+            self.name, shape, self.sample_rate))
+
+    def loop_before(self):
+        # remember where loop task runs, see `reconfigure`
+        self._writer = (os.getpid(), threading.current_thread().ident)
+        self._metrics.reset()
+        self._events.reset()
+        self._gaps = (GapTracker(self.sample_rate, self._events)
+                      if self.track_gaps else None)
+
+    def loop_actions(self):
+        if self.__flag_reconf__.is_set():
+            try:
+                self._migrate()
+            except Exception:
+                logger.error(traceback.format_exc())
+            self.__flag_reconf__.clear()
+
     def restart(self):
         self.close(); time.sleep(0.5); self.start()                # noqa: E702
 
+    def set_source_rate(self, rate):
+        '''
+        Resample data from a source at `rate` to `sample_rate` of reader
+        before saving into buffer. Set `rate` to None or `sample_rate` to
+        disable it. Call it before start or in `hook_before`, because the
+        resampler lives in the loop task.
+        '''
+        if not rate or rate == self.sample_rate:
+            self._resampler = None
+        else:
+            self._resampler = Resampler(rate, self.sample_rate)
+            logger.info('{} resample data from {}Hz to {}Hz'.format(
+                self.name, rate, self.sample_rate))
+
+    def _ingest(self):
+        '''Fetch data from source and convert them to be saved.'''
+        start = time.time()
+        try:
+            data, ts = self._data_fetch()
+        except SkipIteration:
+            self._events.add('stall', self._buffer.sequence)
+            raise
+        if self._resampler is not None:
+            data, ts = self._resampler.process(data, ts)
+        self._metrics.record(time.time() - start, ts, self.sample_rate)
+        return data, ts
+
     def _loop_func_lsl(self):
-        data, ts = self._data_fetch()
-        self._lsl_outlet.push_sample(data, ts)
+        data, ts = self._ingest()
+        if not np.size(ts):
+            return
+        if np.ndim(data) == 2:
+            self._lsl_outlet.push_chunk(
+                np.transpose(data[:self.num_channel]).tolist(), ts[-1])
+        else:
+            self._lsl_outlet.push_sample(data, ts)
         self._data_save(data, ts)
 
     def _loop_func(self):
-        data, ts = self._data_fetch()
-        self._data_save(data, ts)
+        data, ts = self._ingest()
+        if np.size(ts):
+            self._data_save(data, ts)
 
     def _data_fetch(self):
+        '''
+        Return `(data, ts)` of a single sample or a block of samples.
+
+        Single sample: data is an array of num_channel and ts is a float.
+        Block of samples: data is an array with a shape of num_channel x
+        n_samples and ts is an array of n_samples timestamps. Fetching
+        blocks saves one loop iteration (and one buffer write) per sample.
+        '''
         raise NotImplementedError(self.name + ' cannot use this directly')
 
+    def _pace(self, start, stop, rate):
+        '''
+        Sleep until samples [start, stop) are due if streaming at `rate`,
+        which may be 0 or inf to stream as fast as possible.
+        '''
+        if not 0 < rate < float('inf'):
+            return
+        now = time.time()
+        if self._anchor is None:
+            self._anchor = (now, start)
+        delay = self._anchor[0] + (stop - self._anchor[1]) / rate - now
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -1:  # e.g. resumed from pause, do not burst
+            self._anchor = (now, start)
+
+    def _block_times(self, n, t=None, skipped=0):
+        '''
+        Timestamps of a block of `n` samples whose last one arrives at `t`
+        (default now). If `clock_model` is enabled, timestamps are fitted
+        against the number of samples received (plus `skipped` ones known
+        to be lost), which removes jitter of arrival and follows drift of
+        the source's clock.
+        '''
+        if not self.clock_model:
+            if t is None:
+                t = time.time() - self.start_time
+            return t - np.arange(n - 1, -1, -1) / float(self.sample_rate)
+        model = self._clock_model()
+        ts = model.update(n, t, skipped)
+        if self._gaps is not None:  # stalls are hidden by fitted timestamps
+            self._gaps.delay(model.late)
+        return ts
+
+    def _clock_model(self):
+        '''Model of current session, rebuilt on restart or new sample rate.'''
+        epoch, model = self._clock or (None, None)
+        if (epoch != self.start_time or
+                model.sample_rate != self.sample_rate):
+            # monotonic clock in the same time base as `start_time`
+            offset = time.time() - self.start_time - _monotonic()
+            model = ClockModel(
+                self.sample_rate, clock=lambda: _monotonic() + offset)
+            self._clock = (self.start_time, model)
+        return model
+
+    @property
+    def clock_stats(self):
+        '''
+        Estimated rate, drift (ppm) and jitter (seconds) of the source, see
+        `ClockModel`. Only available in the process running the reader.
+        '''
+        if self._clock is not None:
+            return self._clock[1].report()
+
+    def _frame_block(self, data, stamps=None, scale=1):
+        '''Convert frames decoded by `FrameDecoder` to `(data, ts)`.'''
+        if stamps is None:
+            ts = self._block_times(data.shape[1])
+        else:  # sender's time of first sample in each frame
+            offset = np.arange(data.shape[1] // len(stamps))
+            ts = np.add.outer(stamps, offset / self.sample_rate).ravel()
+        if self.num_channel:
+            data = data[:self.num_channel]
+        if scale != 1:
+            data = data * scale
+        return data, ts
+
+    @property
+    def _buffer(self):
+        return self._ring if self._history is None else self._history
+
     def _data_save(self, data, ts):
-        data = data[:self.num_channel]
-        self._data[:len(data), self._index] = data
-        self._data[-1, self._index] = ts
-        self._index = (self._index + 1) % self.window_size
+        buf = self._buffer
+        if self._gaps is not None:
+            self._gaps.check(data, ts, buf.sequence)
+        buf.write(data, ts)
+
+
+class AttachedReader(ReaderIOMixin, StatusMixin):
+    '''
+    Read-only reader attached to the data buffer of a running reader.
+
+    A started reader saves data into memory-mapped file `mmap_${name}`
+    under DIR_TMP. Other processes on the same machine can attach to it by
+    reader name and pick data at memory speed, without re-serializing each
+    sample through a lab-streaming-layer outlet & inlet.
+
+    Examples
+    --------
+    In process A:
+    >>> reader = FakeDataGenerator(500, 2, 8)
+    >>> reader.start()
+    >>> reader.name
+    'FDGen_0'
+
+    In process B:
+    >>> reader = AttachedReader('FDGen_0')
+    >>> reader.data_frame.shape
+    (8, 1000)
+    >>> data, lost = reader.subscribe().read(50)
+    '''
+    def __init__(self, name):
+        self._path = os.path.join(DIR_TMP, 'mmap_' + name)
+        if not os.path.exists(self._path):
+            raise ValueError('No running reader named `%s`' % name)
+        self.name = name
+        self.input_source = 'Attached@' + self._path
+        # map read-write to share pages with the writer, but never write
+        self._ring = RingBuffer(self._remap(), readonly=True,
+                                remap=self._remap)
+        self._history = None
+        histfn = os.path.join(DIR_TMP, 'hist_' + name)
+        if os.path.exists(histfn):
+            remap = functools.partial(_map_file, histfn)
+            self._history = TieredBuffer(self._ring, RingBuffer(
+                remap(), readonly=True, remap=remap))
+        self.status = 'attached'
+        self.started = True
+
+    @property
+    def sample_rate(self):
+        return self._ring.sample_rate
+
+    @property
+    def num_channel(self):
+        return self._data.shape[0]
+
+    @property
+    def window_size(self):
+        return self._data.shape[1]
+
+    @property
+    def sample_time(self):
+        return float(self.window_size) / (self.sample_rate or 1)
+
+    @property
+    def channels(self):
+        return ['ch%d' % i for i in range(1, self.num_channel + 1)] + ['time']
+
+    @property
+    def _data(self):
+        return self._ring.data
+
+    @property
+    def _times(self):
+        return self._ring.times
+
+    def set_sample_rate(self, *a, **k):
+        logger.error(self.name + ' attached reader is read-only')
+        return False
+
+    set_channel_num = set_sample_rate
+
+    def _remap(self):
+        with open(self._path, 'r+b') as f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            return mmap.mmap(f.fileno(), 0)
+
+    def is_streaming(self):
+        '''Whether the writer is alive and still using the same buffer.'''
+        if not self.started:
+            return False
+        self._ring.refresh()  # follow the writer if it has migrated
+        try:
+            os.kill(self._ring.header.pid, 0)
+        except OSError as e:
+            if e.errno != errno.EPERM:
+                return False
+        try:
+            return os.stat(self._path).st_ino == self._inode
+        except OSError:
+            return False
+
+    def close(self):
+        if not self.started:
+            return False
+        # mmaps will be closed by GC after views of them are released
+        self._ring.release()
+        if self._history is not None:
+            self._history.spill.release(copy=False)
+            self._history = None
+        self.started = False
+        self.status = 'closed'
+        return True
 
 
 # =============================================================================
 # Readers on different input sources
 
 class FakeDataGenerator(BaseReader):
-    '''Generate random data.'''
+    '''
+    Generate synthetic data in blocks, see `embci.io.SignalGenerator`.
+
+    Parameters
+    ----------
+    block_size : int
+        Number of samples in each fetch. Default is 1/50 second.
+    speed : float
+        Generating speed relative to realtime. 0 or inf means as fast as
+        possible (unthrottled), e.g. to generate load for benchmarks.
+    seed : int
+        Seed of random number generators. Data are the same at each start
+        with the same seed.
+    signals : dict
+        Content of signals, keyword arguments of `SignalGenerator`. Default
+        is pink noise only.
+
+    Examples
+    --------
+    >>> reader = FakeDataGenerator(500, num_channel=8, speed=0, seed=0,
+    ...                            signals={'ssvep': [8, 10, 12, 15]})
+    '''
     name = 'FDGen'
 
-    def __init__(self, sample_rate=250, sample_time=2, num_channel=1, **k):
-        k.setdefault('input_source', 'random')
+    def __init__(self, sample_rate=250, sample_time=2, num_channel=1,
+                 block_size=None, speed=1, seed=None, signals=None, **k):
+        k.setdefault('input_source', 'synthetic')
         super(FakeDataGenerator, self).__init__(
             sample_rate, sample_time, num_channel, **k)
+        self.block_size = block_size
+        self.speed = float(speed or 0)
+        self.seed = seed
+        self.signals = dict(signals or {})
+        self._generator = None
+
+    def hook_before(self):
+        self._generator = None
 
     def _data_fetch(self):
-        time.sleep(0.9 / self.sample_rate)
-        data = (np.random.rand(self.num_channel) - 0.5) / 100
-        return data, time.time() - self.start_time
+        gen = self._generator
+        if gen is None or gen.num_channel != self.num_channel or \
+                gen.sample_rate != self.sample_rate:
+            gen = self._generator = SignalGenerator(
+                self.sample_rate, self.num_channel, self.seed, **self.signals)
+            self._anchor = None
+        n = int(self.block_size or max(1, self.sample_rate // 50))
+        self._pace(gen.count, gen.count + n, self.sample_rate * self.speed)
+        return gen.generate(n), self._block_times(n)
 
 
 class FilesReader(BaseReader):
-    '''Read data from file and simulate as a common data reader.'''
+    '''
+    Replay a recorded data file as a common data reader.
+
+    Samples are streamed in blocks at a speed relative to realtime. Arrays
+    in `.npy` files (n_channel x n_sample) are memory-mapped and `.fif`
+    files are read block by block, so recordings larger than RAM can be
+    replayed. Data in `.mat` and `.csv` (one sample per line) files are
+    loaded into RAM.
+
+    Parameters
+    ----------
+    filename : str
+    speed : float
+        Replay speed, e.g. 1 for realtime, 10 for ten times faster.
+        0 or inf means as fast as possible (unthrottled).
+    block_size : int
+        Number of samples in each fetch. Default is 1/50 second.
+    repeat : bool
+        Whether to replay from beginning at end of file. Otherwise the
+        reader pauses there, see `finished` and `seek`.
+    source_rate : number
+        Sample rate of the recording, if not saved in the file (e.g. `.npy`
+        and `.csv`). Default is the same as `sample_rate`.
+    resample : bool
+        Whether to resample recordings at a different rate to `sample_rate`
+        (see `embci.io.ingest.Resampler`). Otherwise the reader changes its
+        `sample_rate` to the recording's.
+
+    Notes
+    -----
+    Timestamps of samples are seconds since beginning of the recording,
+    regardless of replay speed.
+
+    Examples
+    --------
+    >>> reader = FilesReader('rec.npy', sample_rate=500, speed=0)
+    >>> reader.start()
+    >>> reader.seek(60)  # skip the first minute
+
+    Replay 1 kHz recordings at 250 Hz:
+
+    >>> reader = FilesReader('rec.npy', sample_rate=250, source_rate=1000)
+    '''
+    name = 'FilesReader'
 
-    def __init__(self, filename,
-                 sample_rate=250, sample_time=2, num_channel=1, **k):
-        if not os.path.exist(filename):
+    def __init__(self, filename, sample_rate=250, sample_time=2,
+                 num_channel=1, speed=1, block_size=None, repeat=False,
+                 source_rate=None, resample=True, **k):
+        if not os.path.exists(filename):
             raise ValueError('Data file not exist: `%s`' % filename)
         k.setdefault('input_source', filename)
-        k.setdefault('name', filename + '.Reader')
+        k.setdefault('name', os.path.basename(filename) + '.Reader')
         super(FilesReader, self).__init__(
             sample_rate, sample_time, num_channel, **k)
+        self.speed = float(speed or 0)
+        self.block_size = block_size
+        self.repeat = repeat
+        self.source_rate = source_rate or sample_rate
+        self.resample = resample
+        self._length = 0
+        # position (index of next sample) and seek request (in seconds)
+        # are shared with loop task
+        self._mp_position = mp.Value(c_double, 0)
+        self._mp_seek = mp.Value(c_double, -1)
 
-    def hook_before(self):
-        '''try to open data file and load data into RAM'''
-        logger.debug(self.name + ' reading data file ' + self.input_source)
-        if self.input_source.endswith('.mat'):
-            actionname = os.path.basename(self.input_source).split('-')[0]
-            mat = scipy.io.loadmat(self.input_source)
+    @property
+    def position(self):
+        '''Seconds of samples replayed since beginning of the recording.'''
+        return self._mp_position.value / self.source_rate
+
+    @property
+    def duration(self):
+        '''Length of the recording in seconds.'''
+        return float(self._length) / self.source_rate
+
+    @property
+    def finished(self):
+        '''Whether all samples in the file have been replayed.'''
+        return bool(self._length) and self._mp_position.value >= self._length
+
+    def seek(self, seconds):
+        '''
+        Continue replaying from `seconds` since beginning of the recording.
+        If the reader is not started yet, it will start from there.
+        '''
+        if seconds < 0:
+            raise ValueError('Invalid position: {}'.format(seconds))
+        self._mp_seek.value = seconds
+
+    def _load(self):
+        '''
+        Return a function to slice samples of the file, number of samples,
+        number of channels and sample rate of the recording (if known).
+        '''
+        fn, fs = self.input_source, None
+        if fn.endswith('.npy'):
+            data = np.load(fn, mmap_mode='r')
+        elif fn.endswith('.mat'):
+            actionname = os.path.basename(fn).split('-')[0]
+            mat = scipy.io.loadmat(fn)
             data = mat[actionname][0]
-            sample_rate = mat.get('sample_rate', None)
-            logger.debug('{} load data with shape of {}@{}Hz'.format(
-                self.name, data.shape, sample_rate))
-            assert data.ndim == 2, 'Invalid data shape!'
-            n = data.shape[0]
-            if n < self.num_channel:
-                logger.info('{} change num_channel to {}'.format(
-                    self.name, n))
-                self.num_channel = n
-                self._data = self._data[:(n + 1)]
-            if sample_rate and sample_rate != self.sample_rate:
-                logger.warning('{} resample source data to {}Hz'.format(
-                    self.name, self.sample_rate))
-                raise NotImplementedError
-                data = scipy.signal.resample(data, self.sample_rate)
-            self._get_data = self._get_data_g(data.T)
-            self._get_data.next()
-        elif self.input_source.endswith('.fif'):
-            raise NotImplementedError
-        elif self.input_source.endswith('.csv'):
-            data = np.loadtxt(self.input_source, np.float32, delimiter=',')
-            self._get_data = self._get_data_g(data)
-            self._get_data.next()
+            if 'sample_rate' in mat:
+                fs = float(np.ravel(mat['sample_rate'])[0])
+        elif fn.endswith('.csv'):
+            data = np.loadtxt(fn, np.float32, delimiter=',', ndmin=2).T
+        elif fn.endswith(('.fif', '.fif.gz')):
+            raw = mne.io.read_raw_fif(fn, preload=False, verbose=False)
+            return (lambda start, stop: raw[:, start:stop][0],
+                    raw.n_times, len(raw.ch_names), raw.info['sfreq'])
         else:
-            raise NotImplementedError
-
-    def _get_data_g(self, data):
-        self._last_time = time.time()
-        d = 0.9 / self.sample_rate
-        for line in data:
-            while (time.time() - self._last_time) < d:
-                time.sleep(d / 2)
-            self._last_time = time.time()
-            if (yield line) == 'quit':
-                break
+            raise NotImplementedError('Unsupported file: ' + fn)
+        assert data.ndim == 2, 'Invalid data shape!'
+        return (lambda start, stop: data[:, start:stop],
+                data.shape[1], data.shape[0], fs)
+
+    def hook_before(self):
+        '''Open data file, only the header if it can be memory-mapped.'''
+        logger.debug(self.name + ' reading data file ' + self.input_source)
+        self._source, self._length, nch, fs = self._load()
+        logger.debug('{} load data with shape of {}@{}Hz'.format(
+            self.name, (nch, self._length), fs))
+        fs = self.source_rate = fs or self.source_rate
+        if fs != self.sample_rate and not self.resample:
+            logger.info('{} change sample_rate to {}Hz of the recording'
+                        .format(self.name, fs))
+            self.set_sample_rate(fs)
+        self.set_source_rate(fs)
+        self._check_num_channel(nch)
+        self._block = int(self.block_size or max(1, fs // 50))
+        self._pos = self._mp_position.value = 0
+        self._wraps, self._anchor = 0, None
 
     def _data_fetch(self):
-        return self._get_data.next(), time.time() - self.start_time
+        seek = self._mp_seek.value
+        if seek >= 0:
+            self._mp_seek.value = -1
+            self._pos = min(int(seek * self.source_rate), self._length)
+            self._anchor = None
+            if self._resampler is not None:
+                self._resampler.reset()
+            if self._gaps is not None:  # jumping on purpose
+                self._gaps.reset()
+        if self._pos >= self._length:
+            if not self.repeat:
+                self.pause()
+                raise SkipIteration(self.name + ' reach end of file, paused')
+            self._pos, self._anchor = 0, None
+            self._wraps += 1
+        start = self._pos
+        stop = min(start + self._block, self._length)
+        self._pace(start, stop, self.source_rate * self.speed)
+        data = self._source(start, stop)[:self.num_channel]
+        self._pos = stop
+        self._mp_position.value = stop
+        ts = np.arange(start, stop) + self._wraps * self._length
+        return data, ts / float(self.source_rate)
 
 
 class LSLReader(BaseReader):
     '''
     Connect to a data stream on localhost:port and read data into buffer.
     There should be at least one stream available.
+
+    Parameters
+    ----------
+    chunk_size : int
+        Pull at most `chunk_size` samples in one fetch into a preallocated
+        array and save them into buffer as a block. Set to 0 to pull sample
+        by sample. Streams of strings are always pulled sample by sample.
+    tc_interval : float
+        Seconds between two updates of LSL clock offset (time correction),
+        which is applied to all samples in between.
+    resample : bool
+        Whether to resample streams at a different nominal rate to
+        `sample_rate`. Otherwise the reader changes its `sample_rate` to
+        the stream's.
     '''
     name = 'LSLReader'
 
-    def __init__(self, sample_rate=250, sample_time=2, num_channel=0, **k):
+    def __init__(self, sample_rate=250, sample_time=2, num_channel=0,
+                 chunk_size=32, tc_interval=5.0, resample=False, **k):
         k['send_pylsl'] = False
+        self.chunk_size = int(chunk_size)
+        self.tc_interval = float(tc_interval)
+        self.resample = resample
         super(LSLReader, self).__init__(
             sample_rate, sample_time, num_channel, **k)
 
@@ -497,38 +1225,83 @@ class LSLReader(BaseReader):
     def hook_before(self):
         fs = self._lsl_inlet_info.nominal_srate()
         if fs not in [self.sample_rate, pylsl.IRREGULAR_RATE]:
-            self.set_sample_rate(fs)
+            if not self.resample:
+                self.set_sample_rate(fs)
+        self.set_source_rate(fs)
         nch = self._lsl_inlet_info.channel_count()
         self._check_num_channel(nch)
         maxbuf = int(self.sample_time if fs else (self.window_size // 100 + 1))
         self._lsl_inlet = pylsl.StreamInlet(self._lsl_inlet_info, maxbuf)
         self.input_source = '{}@{}'.format(
             self._lsl_inlet_info.name(), self._lsl_inlet_info.source_id())
+        self._lsl_tc, self._lsl_tc_next = 0, 0
+        # destination of pull_chunk, samples x channels in stream's dtype
+        fmt = pylsl.pylsl.fmt2string[self._lsl_inlet_info.channel_format()]
+        if self.chunk_size > 0 and fmt not in ['string', 'undefined']:
+            self._lsl_chunk = np.zeros((self.chunk_size, nch), np.dtype(
+                'float64' if fmt == 'double64' else fmt))
+            # time to fill a chunk, pull_chunk returns earlier if supported
+            self._lsl_timeout = float(self.chunk_size) / (
+                fs or self.sample_rate)
+        else:
+            self._lsl_chunk = None
 
     def hook_after(self):
         time.sleep(0.2)
         self._lsl_inlet.close_stream()
 
+    def _time_correction(self):
+        '''Offset to local clock, refreshed every `tc_interval` seconds.'''
+        now = time.time()
+        if now >= self._lsl_tc_next:
+            self._lsl_tc = self._lsl_inlet.time_correction()
+            self._lsl_tc_next = now + self.tc_interval
+        return self._lsl_tc
+
     def _data_fetch(self):
         '''LSL Inlet may buffer data. So do NOT use absolute time.'''
-        data, ts = self._lsl_inlet.pull_sample(5)
-        if data is None:
-            raise SkipIteration('bad data from %s' % self._lsl_inlet)
-        #  return data, time.time() - self.start_time
-        return data, ts + self._lsl_inlet.time_correction()
+        if self._lsl_chunk is None:
+            data, ts = self._lsl_inlet.pull_sample(5)
+            if data is None:
+                raise SkipIteration('bad data from %s' % self._lsl_inlet)
+            #  return data, time.time() - self.start_time
+            return data, ts + self._time_correction()
+        ts = self._lsl_inlet.pull_chunk(
+            self._lsl_timeout, len(self._lsl_chunk), self._lsl_chunk)[1]
+        if not len(ts):  # stream stalled, wait longer for one sample
+            ts = self._lsl_inlet.pull_chunk(5, 1, self._lsl_chunk)[1]
+            if not len(ts):
+                raise SkipIteration('no data from %s' % self._lsl_inlet)
+        # block of channels x samples, copied into buffer before next pull
+        return (self._lsl_chunk[:len(ts)].T,
+                np.add(ts, self._time_correction()))
 
 
 class SerialReader(BaseReader):
     '''
     Connect to a serial port and fetch data into buffer.
     There should be at least one port available.
+
+    Parameters
+    ----------
+    framed : bool
+        Whether the device sends binary frames (see `embci.io.protocol`)
+        instead of lines of text. Frames are received in large reads and
+        decoded as blocks, resynchronized on corrupt frames.
+    scale : float
+        Factor to convert integers in frames to physical values.
     '''
     name = 'SerialReader'
 
-    def __init__(self, sample_rate=250, sample_time=2, num_channel=1, **k):
+    def __init__(self, sample_rate=250, sample_time=2, num_channel=1,
+                 framed=False, scale=1.0, **k):
         super(SerialReader, self).__init__(
             sample_rate, sample_time, num_channel, **k)
         self._serial = serial.Serial()
+        self.framed = framed
+        self.scale = scale
+        self._decoder = FrameDecoder() if framed else None
+        self._pending = None
 
     def start(self, port=None, baudrate=115200, *a, **k):
         if self.started:
@@ -537,34 +1310,73 @@ class SerialReader(BaseReader):
         self._serial.baudrate = baudrate
         return super(SerialReader, self).start(**k)
 
+    @property
+    def frame_stats(self):
+        '''
+        Counters of received, dropped and corrupt frames. Only available
+        in the process running the reader (e.g. started with `method` of
+        thread).
+        '''
+        if self._decoder is not None:
+            return dict(self._decoder.stats)
+
     def hook_before(self):
+        if self.framed:
+            # do not block forever on a silent port
+            self._serial.timeout = self._serial.timeout or 1
+            self._decoder.reset()
         self._serial.open()
         self.input_source = 'Serial@{}'.format(self._serial.port)
         logger.debug(self.name + ' `%s` opened.' % self.input_source)
-        self._check_num_channel(len(self._data_fetch()[0]))
+        if not self.framed:
+            return self._check_num_channel(len(self._data_fetch()[0]))
+        # keep the first block to be saved by loop task
+        self._pending = self._frame_fetch()
+        self._check_num_channel(self._decoder.layout[1])
 
     def hook_after(self):
         self._serial.close()
 
     def _data_fetch(self):
+        if self.framed:
+            return self._frame_fetch()
         #  data = self._serial.read_until().decode('utf-8')
         #  data = [i.strip() for i in data.split(',')]
         #  data = np.array([float(i) for i in data if i], self._dtype)
         data = np.loadtxt(self._serial, self._dtype, delimiter='.')
         return data, time.time() - self.start_time
 
+    def _frame_fetch(self):
+        if self._pending is not None:
+            block, self._pending = self._pending, None
+            return block
+        data, stamps = self._decoder.decode()
+        while data is None:
+            # read all bytes available, at least one frame
+            size = max(self._serial.in_waiting, self._decoder.frame_size)
+            if not self._decoder.fill(self._serial.readinto, size):
+                raise SkipIteration('no data from %s' % self.input_source)
+            data, stamps = self._decoder.decode()
+        return self._frame_block(data, stamps, self.scale)
+
 
 class ADS1299SPIReader(BaseReader, Singleton):
     '''
     Read data through SPI connection with ADS1299.
     This Reader is only used on ARM. It depends on class ADS1299_API.
+
+    Set `burst` to read blocks of frames on successive DRDY (see
+    `ADS1299_API.read_burst`) instead of one sample per loop iteration,
+    which is recommended for sample rates of 1kHz and above.
     '''
     API = ADS1299_API
     name = 'ADS1299Reader'
 
     def __init__(self, sample_rate=250, sample_time=2, num_channel=1,
-                 measure_impedance=False, enable_bias=True, API=None, **k):
+                 measure_impedance=False, enable_bias=True, API=None,
+                 burst=1, **k):
         self._api = (API or self.API)()
+        self.burst = int(burst)
         k.setdefault('input_source', 'normal')
         super(ADS1299SPIReader, self).__init__(
             sample_rate, sample_time, num_channel, **k)
@@ -632,32 +1444,105 @@ class ADS1299SPIReader(BaseReader, Singleton):
         self._api.close()
 
     def _data_fetch(self):
-        return self._api.read()
+        if self.burst <= 1:
+            data, ts = self._api.read()
+            if self.clock_model:
+                ts = self._block_times(1)[0]
+            return data, ts
+        return self._fetch_burst(self.burst)
+
+    def _fetch_burst(self, n):
+        missed = self._api.missed
+        data, ts = self._api.read_burst(n)
+        if not len(ts):
+            raise SkipIteration('no data from %s' % self.input_source)
+        if self.clock_model:
+            return data, self._block_times(
+                len(ts), skipped=max(self._api.missed - missed, 0))
+        # counter-derived timestamps since API started
+        return data, ts + (self._api._start_time - self.start_time)
 
 
 class ESP32SPIReader(ADS1299SPIReader):
     '''
     Read data through SPI connection with onboard ESP32.
     This Reader is only used on ARM. It depends on class ESP32_API.
+
+    Samples are fetched in whole batches buffered by ESP32. `burst` is the
+    number of samples per batch. Set `adaptive` to adjust it to the load of
+    the reader and `max_latency` to limit it, see `ESP32_API.read_burst`.
     '''
     API = ESP32_API
     name = 'ESP32Reader'
 
+    def __init__(self, sample_rate=250, sample_time=2, num_channel=1,
+                 burst=32, adaptive=False, max_latency=None, **k):
+        super(ESP32SPIReader, self).__init__(
+            sample_rate, sample_time, num_channel, burst=burst, **k)
+        self._api.n_batch = self.burst
+        self._api.adaptive = adaptive
+        self._api.max_latency = max_latency
+
+    def _data_fetch(self):
+        return self._fetch_burst(None if self._api.adaptive else self.burst)
+
 
 class SocketTCPReader(BaseReader):
     '''
     A reader that recieve data from specific host and port through TCP socket.
+
+    Parameters
+    ----------
+    framed : bool
+        Whether the server sends binary frames (see `embci.io.protocol`),
+        which carry a sequence number, sample count and optionally the
+        timestamp. Default False: the stream is raw samples of
+        `num_channel` values in `datatype`. Either way bytes are received
+        into a reusable buffer and only whole frames / samples are saved.
+    scale : float
+        Factor to convert integers in frames to physical values.
+
+    Examples
+    --------
+    >>> reader = SocketTCPReader(num_channel=8)
+    >>> reader.start('192.168.0.1:8888')
+    >>> framed = SocketTCPReader(num_channel=8, framed=True, scale=1e-6)
     '''
     name = 'SocketTCPReader'
 
-    def __init__(self, sample_rate=250, sample_time=2, num_channel=1, **k):
+    def __init__(self, sample_rate=250, sample_time=2, num_channel=1,
+                 framed=False, scale=1.0, **k):
         super(SocketTCPReader, self).__init__(
             sample_rate, sample_time, num_channel, **k)
-        self._client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.framed = framed
+        self.scale = scale
+        self._decoder = FrameDecoder()
+        self._client = self._address = self._pending = None
 
-    def hook_before(self):
-        # IP addr and port are offered by user, connect to host:port
-        logger.debug(self.name + ' configure IP address')
+    def start(self, address=None, port=None, *a, **k):
+        '''
+        Connect to `address`, which can be "host:port", (host, port) or
+        host with `port` specified separately. If neither is given, user
+        is asked to input one. Invalid address raises ValueError.
+        '''
+        if self.started:
+            return self.resume()
+        if address is None and port is None:
+            address = self._input_address()
+        if isinstance(address, (tuple, list)):
+            address, port = address
+        elif address and port is None and ':' in address:
+            address, port = address.rsplit(':', 1)
+        try:
+            port = int(port)
+            assert 0 <= port < 65536
+        except (TypeError, ValueError, AssertionError):
+            raise ValueError('{} invalid address: `{}:{}`'.format(
+                self.name, address, port))
+        self._address = (address or '127.0.0.1', port)
+        return super(SocketTCPReader, self).start(**k)
+
+    def _input_address(self):
         extra = ''
         for i in range(5):
             rst = check_input((
@@ -665,33 +1550,42 @@ class SocketTCPReader(BaseReader):
                 'Type `quit` to abort.\n'
                 '> 192.168.0.1:8888 (example)\n> '
             ), {}).replace('localhost', '127.0.0.1')
-            extra = ''
             if rst in ['quit', '']:
                 raise RuntimeError(self.name + ' manual exit.')
+            host, _, port = rst.partition(':')
             try:
-                if ':' not in rst:
-                    host, port = rst, 80
-                else:
-                    host, port = rst.split(':')
                 socket.inet_aton(host)  # check if host is valid string
-                port = int(port)
-                assert port > 0
+                port = int(port or 80)
+                assert 0 < port < 65536
             except socket.error:
                 extra = self.name + ' Invalid host: `%s`\n' % host
-                continue
             except (ValueError, AssertionError):
                 extra = self.name + ' Invalid port: `%s`\n' % port
-                continue
             else:
-                break
-        else:
-            raise RuntimeError(self.name + ' five times failed.')
-        # TCP IPv4 socket connection
-        self._client.connect((host, port))
-        self._client_size = 512 * self._dtype.itemsize
-        self.input_source = '{}:{}'.format(host, port)
-        self._check_num_channel(len(self._data_fetch()[0]))
-        self._client_size = self.num_channel * self._dtype.itemsize
+                return host, port
+        raise RuntimeError(self.name + ' five times failed.')
+
+    @property
+    def frame_stats(self):
+        '''
+        Counters of received, dropped and corrupt frames. Only available
+        in the process running the reader (e.g. started with `method` of
+        thread).
+        '''
+        return dict(self._decoder.stats)
+
+    def hook_before(self):
+        # a closed socket can not be reused, create a new one at each start
+        self._client = socket.create_connection(self._address, timeout=5)
+        self._client.settimeout(1)
+        self._decoder.reset()
+        self.input_source = '{}:{}'.format(*self._address)
+        logger.debug(self.name + ' connected to ' + self.input_source)
+        if not self.framed:
+            return
+        # keep the first block to be saved by loop task
+        self._pending = self._data_fetch()
+        self._check_num_channel(self._decoder.layout[1])
 
     def hook_after(self):
         '''
@@ -700,28 +1594,204 @@ class SocketTCPReader(BaseReader):
         client may be blocking that process/thread by client.recv(n). We need
         to let server socket close the connection.
         '''
-        self._client.send('shutdown')
         try:
+            self._client.send(b'shutdown')
             self._client.shutdown(socket.SHUT_RDWR)
             self._client.close()
         except socket.error:
             pass
 
+    def _recv(self):
+        try:
+            nbytes = self._decoder.fill(self._client.recv_into)
+        except socket.timeout:
+            raise SkipIteration('no data from %s' % self.input_source)
+        if not nbytes:
+            raise RuntimeError(self.name + ' connection closed by server')
+
     def _data_fetch(self):
-        data = self._client.recv(self._client_size)
-        return np.frombuffer(data, self._dtype), time.time() - self.start_time
+        if self._pending is not None:
+            block, self._pending = self._pending, None
+            return block
+        if not self.framed:
+            data = self._decoder.decode_raw(self._dtype, self.num_channel)
+            while data is None:
+                self._recv()
+                data = self._decoder.decode_raw(self._dtype, self.num_channel)
+            return data, self._block_times(data.shape[1])
+        data, stamps = self._decoder.decode()
+        while data is None:  # partial frame, wait for the rest
+            self._recv()
+            data, stamps = self._decoder.decode()
+        return self._frame_block(data, stamps, self.scale)
 
 
 class SocketUDPReader(SocketTCPReader):
-    '''Socket UDP client, data receiver. Under development.'''
+    '''
+    Socket UDP client, data receiver.
+
+    Datagrams of frames (see `embci.io.protocol`) are sent to the address
+    this reader binds to, e.g. `reader.start('0.0.0.0:8888')` (port 0 to
+    pick a free one, see `reader.address`). Frames arrived out of order
+    are put back in order within a small window. Missing frames are
+    counted as lost and filled with NaN or the last sample, so that the
+    stream keeps its timing, unless sequence number jumps forward by more
+    than about one second of frames (or `reorder` frames), which is taken
+    as a restart of the sender. Frames of all datagrams waiting in socket
+    are saved into buffer as one block.
+
+    Parameters
+    ----------
+    reorder : int
+        Number of frames received after a missing one before the missing
+        one is given up, i.e. the latency added to wait for late frames.
+    fill : str
+        How to fill samples of lost frames: 'nan' or 'last' (hold the last
+        sample).
+    scale : float
+        Factor to convert integers in frames to physical values.
+    '''
     name = 'SocketUDPReader'
 
-    def __init__(self, sample_rate=250, sample_time=2, num_channel=1, **k):
-        # sample_rate, sample_time, num_channel, name=None
-        # input_source=None, send_pylsl=False, datatype=None
+    def __init__(self, sample_rate=250, sample_time=2, num_channel=1,
+                 reorder=4, fill='nan', scale=1.0, **k):
+        if fill not in ['nan', 'last']:
+            raise ValueError('Invalid fill method: {}'.format(fill))
         super(SocketUDPReader, self).__init__(
-            sample_rate, sample_time, num_channel, **k)
-        raise NotImplementedError
+            sample_rate, sample_time, num_channel, True, scale, **k)
+        self.reorder = int(reorder)
+        self.fill = fill
+        # room for a max-sized datagram is kept after each compaction
+        self._decoder = FrameDecoder(2 * 65536, ordered=False)
+        self._loss = dict.fromkeys(
+            ['lost', 'late', 'duplicate', 'reordered'], 0)
+
+    @property
+    def address(self):
+        '''Local address (host, port) this reader receives datagrams on.'''
+        return self._address
+
+    @property
+    def frame_stats(self):
+        '''
+        Counters of received, lost (filled), late, duplicate, reordered and
+        corrupt frames. Only available in the process running the reader
+        (e.g. started with `method` of thread).
+        '''
+        stats = dict(self._decoder.stats, **self._loss)
+        stats['dropped'] = stats['lost']
+        return stats
+
+    def hook_before(self):
+        self._client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._client.bind(self._address)
+        self._client.settimeout(0.1)  # give up missing frames on stall
+        self._address = self._client.getsockname()
+        self._decoder.reset()
+        self._frames = {}  # seq => (data, stamp) of out-of-order frames
+        self._ready = []    # in-order frames to be saved
+        self._next = self._last = self._layout = None
+        self.input_source = 'UDP@{}:{}'.format(*self._address)
+        logger.debug(self.name + ' listening on ' + self.input_source)
+
+    def hook_after(self):
+        try:
+            self._client.close()
+        except socket.error:
+            pass
+
+    def _recv(self, limit=64):
+        '''
+        Queue frames of datagrams waiting in socket (at most `limit`).
+        Block until the first one arrives or timeout.
+        '''
+        sock = self._client
+
+        def recv_nowait(buf):  # do not wait for more
+            return sock.recv_into(buf, 0, socket.MSG_DONTWAIT)
+
+        for count in range(limit):
+            try:
+                self._decoder.fill(recv_nowait if count else sock.recv_into)
+            except socket.error as e:
+                if isinstance(e, socket.timeout) or e.errno in [
+                        errno.EAGAIN, errno.EWOULDBLOCK]:
+                    return count
+                raise
+            self._queue()
+        return limit
+
+    def _queue(self):
+        data, stamps = self._decoder.decode()
+        while data is not None:
+            n, c, _ = self._decoder.layout
+            if self._layout != (n, c):  # sender changed its frames
+                self._advance(stall=True)
+                self._layout, self._next = (n, c), None
+                self._check_num_channel(c)
+            # fill at most about one second of frames (or reorder window)
+            jump = max(self.reorder, int(self.sample_rate // n))
+            for i, seq in enumerate(self._decoder.seqs):
+                if self._next is None:
+                    self._next = seq
+                ahead = (seq - self._next) % 0x10000
+                if ahead >= 0x8000:  # behind the next expected one
+                    if 0x10000 - ahead > 0x100:  # sender restarted
+                        self._advance(stall=True)
+                        self._next = seq
+                    else:
+                        self._loss['late'] += 1
+                        continue
+                elif ahead > jump:  # sender restarted at a later seq
+                    self._advance(stall=True)
+                    self._next = seq
+                elif seq in self._frames:
+                    self._loss['duplicate'] += 1
+                    continue
+                elif not ahead and self._frames:
+                    self._loss['reordered'] += 1
+                self._frames[seq] = (
+                    data[:, i * n:(i + 1) * n],
+                    stamps[i] if stamps is not None else None)
+            data, stamps = self._decoder.decode()
+        self._advance()
+
+    def _advance(self, stall=False):
+        '''Move frames in order to `_ready`, filling the missing ones.'''
+        while self._frames:
+            frame = self._frames.pop(self._next, None)
+            if frame is None:
+                if not stall and len(self._frames) <= self.reorder:
+                    break  # wait for the missing frame
+                self._loss['lost'] += 1
+                n, c = self._layout
+                if self.fill == 'last' and self._last is not None:
+                    frame = (np.repeat(self._last, n, axis=1), None)
+                else:
+                    frame = (np.full((c, n), np.nan), None)
+            self._ready.append(frame)
+            self._last = frame[0][:, -1:]
+            self._next = (self._next + 1) % 0x10000
+
+    def _data_fetch(self):
+        deadline = time.time() + 1
+        while not self._ready:
+            if not self._recv():
+                self._advance(stall=True)  # link stalls, stop waiting
+                if not self._ready and time.time() > deadline:
+                    raise SkipIteration('no data from %s' % self.input_source)
+        blocks, stamps = zip(*self._ready)
+        self._ready = []
+        data = np.hstack(blocks)
+        known = [i for i, t in enumerate(stamps) if t is not None]
+        if not known:
+            return self._frame_block(data, None, self.scale)
+        # frames are spaced by n_sample / sample_rate
+        i = known[0]
+        step = float(blocks[0].shape[1]) / self.sample_rate
+        stamps = [stamps[i] + (j - i) * step if t is None else t
+                  for j, t in enumerate(stamps)]
+        return self._frame_block(data, np.array(stamps), self.scale)
 
 
 # THE END
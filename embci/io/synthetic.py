@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/embci/io/synthetic.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 19:48:20
+
+'''
+Synthetic EEG-like signals generated block by block.
+
+`SignalGenerator` mixes configurable components into n_channel x n_sample
+blocks. Each component keeps its phase / filter state between blocks, so
+the signal is continuous no matter how it is chunked. Given the same seed,
+the same sequence of samples is generated regardless of block sizes,
+which makes benchmarks and tests reproducible.
+'''
+
+# built-in
+from __future__ import absolute_import, division, print_function
+
+# requirements.txt: data: numpy, scipy
+import numpy as np
+import scipy.signal
+
+__all__ = ['SignalGenerator']
+
+# 1/f (pink) noise from white noise by a 3-pole IIR filter (-3dB/octave
+# within 0.1% of Nyquist frequency), see J.O. Smith, Spectral Audio Signal
+# Processing, "Example: Synthesis of 1/F Noise (Pink Noise)"
+PINK_B = [0.049922035, -0.095993537, 0.050612699, -0.004408786]
+PINK_A = [1, -2.494956002, 2.017265875, -0.522189400]
+
+
+class SignalGenerator(object):
+    '''
+    Generate blocks of synthetic signals. Amplitudes are in micro volts.
+
+    Parameters
+    ----------
+    sample_rate : int
+    num_channel : int
+    seed : int | None
+        Seed of random number generators.
+    ssvep : list of float
+        SSVEP target frequencies. Channel `i` carries a sinusoid at
+        `ssvep[i % len(ssvep)]` Hz.
+    ssvep_amp : float
+    alpha : float
+        Amplitude of 10Hz alpha bursts (0.5~2 seconds each, on all channels).
+    mains : float
+        Amplitude of power line interference, common to all channels.
+    mains_freq : float
+        Frequency of power line, 50Hz or 60Hz.
+    noise : float
+        Amplitude (standard deviation) of pink noise, independent per
+        channel.
+    spikes : float
+        Average number of spikes / artifacts per second. Each one is a
+        200ms half-sine wave (like an eye blink) on a random channel.
+    spike_amp : float
+    unit : float
+        Scale of output, default 1e-6 outputs in volts.
+
+    Examples
+    --------
+    >>> gen = SignalGenerator(250, 8, seed=0, ssvep=[8, 10, 12, 15])
+    >>> gen.generate(50).shape
+    (8, 50)
+    '''
+    def __init__(self, sample_rate=250, num_channel=1, seed=None,
+                 ssvep=(), ssvep_amp=10.0, alpha=0.0, mains=0.0,
+                 mains_freq=50, noise=10.0, spikes=0.0, spike_amp=100.0,
+                 unit=1e-6):
+        self.sample_rate = float(sample_rate)
+        self.num_channel = int(num_channel)
+        self.seed = seed
+        self.ssvep, self.ssvep_amp = list(ssvep), ssvep_amp
+        self.alpha, self.mains, self.mains_freq = alpha, mains, mains_freq
+        self.noise, self.spikes, self.spike_amp = noise, spikes, spike_amp
+        self.unit = unit
+        self.reset()
+
+    def reset(self):
+        '''Restart from the first sample of the seeded sequence.'''
+        self.count = 0
+        # one generator per component so that enabling one of them does not
+        # change the others
+        seeds = np.random.RandomState(self.seed).randint(0, 2**31, 4)
+        self._rng_noise, self._rng_alpha, self._rng_spike, rng = [
+            np.random.RandomState(s) for s in seeds]
+        self._zi = np.zeros((self.num_channel, len(PINK_A) - 1))
+        self._phase = rng.uniform(0, 2 * np.pi, self.num_channel)
+        self._mains_gain = 1 + rng.uniform(-0.1, 0.1, self.num_channel)
+        self._bursts = []  # (start, stop) sample index of alpha bursts
+        self._burst_end = 0
+        self._spikes = []  # (start, channel, sign) of spikes scheduled
+        self._spike_next = None
+        # standard deviation of filtered white noise
+        impulse = np.zeros(int(100 * self.sample_rate))
+        impulse[0] = 1
+        self._pink_gain = np.sqrt(np.sum(
+            scipy.signal.lfilter(PINK_B, PINK_A, impulse) ** 2))
+
+    def generate(self, n):
+        '''Generate next `n` samples in shape of n_channel x n.'''
+        t = (self.count + np.arange(n)) / self.sample_rate
+        out = np.zeros((self.num_channel, n))
+        if self.noise:
+            # sample by sample, independent of how blocks are chunked
+            white = self._rng_noise.standard_normal((n, self.num_channel))
+            pink, self._zi = scipy.signal.lfilter(
+                PINK_B, PINK_A, white.T, axis=1, zi=self._zi)
+            out += pink * (self.noise / self._pink_gain)
+        if self.ssvep:
+            freqs = np.resize(self.ssvep, self.num_channel)
+            out += self.ssvep_amp * np.sin(
+                2 * np.pi * freqs[:, None] * t + self._phase[:, None])
+        if self.mains:
+            line = np.sin(2 * np.pi * self.mains_freq * t)
+            out += self.mains * self._mains_gain[:, None] * line
+        if self.alpha:
+            out += self.alpha * self._alpha_envelope(n) * np.sin(
+                2 * np.pi * 10 * t)
+        if self.spikes:
+            out += self._spike_train(n)
+        self.count += n
+        return out * self.unit
+
+    def _alpha_envelope(self, n):
+        '''Smooth on/off envelope of alpha bursts of the next `n` samples.'''
+        fs, start, stop = self.sample_rate, self.count, self.count + n
+        rng = self._rng_alpha
+        while self._burst_end < stop:  # schedule bursts ahead
+            begin = self._burst_end + int(rng.uniform(0.5, 3) * fs)
+            end = begin + int(rng.uniform(0.5, 2) * fs)
+            self._bursts.append((begin, end))
+            self._burst_end = end
+        env = np.zeros(n)
+        for begin, end in self._bursts:
+            lo, hi = max(begin, start), min(end, stop)
+            if lo < hi:
+                x = (np.arange(lo, hi) - begin) / float(end - begin)
+                env[lo - start:hi - start] = np.sin(np.pi * x) ** 2
+        self._bursts = [b for b in self._bursts if b[1] > stop]
+        return env
+
+    def _spike_train(self, n):
+        '''Half-sine artifacts of the next `n` samples.'''
+        start, stop = self.count, self.count + n
+        rng, fs = self._rng_spike, self.sample_rate
+        if self._spike_next is None:
+            self._spike_next = int(rng.exponential(1. / self.spikes) * fs)
+        while self._spike_next < stop:  # Poisson process
+            self._spikes.append((self._spike_next, rng.randint(
+                self.num_channel), rng.choice([-1, 1])))
+            self._spike_next += 1 + int(rng.exponential(1. / self.spikes) * fs)
+        kernel = np.sin(np.linspace(0, np.pi, int(0.2 * self.sample_rate)))
+        train = np.zeros((self.num_channel, n))
+        for begin, ch, sign in self._spikes:
+            lo, hi = max(begin, start), min(begin + len(kernel), stop)
+            if lo < hi:
+                train[ch, lo - start:hi - start] += sign * self.spike_amp * \
+                    kernel[lo - begin:hi - begin]
+        self._spikes = [s for s in self._spikes if s[0] + len(kernel) > stop]
+        return train
+
+
+# THE END
@@ -11,6 +11,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 import os
+import sys
 import subprocess
 
 # requirements.txt: testing: pytest
@@ -20,6 +21,10 @@ import numpy as np
 
 from embci.configs import DIR_DATA
 
+# coroutines with async / await are syntax errors before Python 3.5
+if sys.version_info < (3, 5):
+    collect_ignore = ['test_aio.py']
+
 
 @pytest.fixture(scope='session')
 def username():
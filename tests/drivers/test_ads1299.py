@@ -10,14 +10,121 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 import time
+import functools
 
-from embci.drivers.ads1299 import ADS1299_API
-from embci.drivers.esp32 import ESP32_API
+# requirements.txt: data: numpy
+import numpy as np
+
+from embci.drivers import ads1299
+from embci.drivers.ads1299 import ADS1299_API, decode_frames
+from embci.drivers.esp32 import ESP32_API, CommandQueue, REG_CH, REG_IS
+from embci.drivers.emulator import EmulatedADS1299_API, EmulatedESP32_API
 from .. import EmBCITestCase, embeddedonly
 
 
-@embeddedonly
-class TestADS(EmBCITestCase):
+class TestDecode(EmBCITestCase):
+    def test_decode_int24(self):
+        counts = np.random.randint(-2**23, 2**23, (4, 8))
+        raw = counts.astype('>i4').view(np.uint8).reshape(4, 8, 4)[..., 1:]
+        frames = np.hstack([np.full((4, 3), 0xC0), raw.reshape(4, -1)])
+        data = decode_frames(frames.ravel().tolist() + [0] * 5)  # tail
+        self.assertEqual(data.dtype, np.int32)
+        self.assertTrue((data == counts).all())
+
+    def test_decode_int32(self):
+        counts = np.random.randint(-2**31, 2**31, (32, 8))
+        raw = counts.astype('<i4').tobytes()
+        self.assertTrue((decode_frames(raw, 8, 4, 0) == counts).all())
+
+
+class TestCommandQueue(EmBCITestCase):
+    def test_coalesce(self):
+        queue = CommandQueue()
+        for en in [0, 1, 0]:
+            queue.put(REG_CH, [3, en])
+        queue.put(REG_IS, [0b101])
+        queue.put(REG_IS, [0b000])
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.pack(4), ([0x40, REG_IS, 0], [(REG_IS, 0)]))
+        self.assertEqual(queue.pack(32), ([0x40, REG_CH, 3, 0], [(REG_CH, 0)]))
+        self.assertEqual(queue.pack(32), ([], []))
+
+    def test_forward_others(self):
+        queue = CommandQueue()
+        queue.put(0x01, [2, 3])  # not a virtual register
+        queue.put(REG_IS, [1])
+        time.sleep(0.1)  # flushed to pipe by feeder thread
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.pack(32), ([0x40, REG_IS, 1], [(REG_IS, 1)]))
+        self.assertEqual(queue.pack(4), ([0x40, 0x01, 2, 3], [(1, [2, 3])]))
+        self.assertEqual(len(queue), 0)
+
+
+class FakeBusAPI(ADS1299_API):
+    '''ADS1299_API on a fake SPI bus recording all transfers.'''
+    POWER_UP_DELAY = 0
+
+    def open(self, dev):
+        self.sent = []
+        self._opened = True
+
+    def _close_drdy(self):
+        pass
+
+    def xfer2(self, values):
+        self.sent.append(list(values))
+        return [0] * len(values)
+
+
+class TestDriver(EmBCITestCase):
+    '''Check commands sent by ADS1299_API without any device.'''
+    def setUp(self):
+        self._api = FakeBusAPI()
+        self._api.open((0, 0))
+
+    def tearDown(self):
+        self._api.close()
+
+    def test_settings_before_start(self):
+        '''Settings made before start are applied by start'''
+        self._api.set_input_source('test')
+        self._api.enable_bias = True
+        self.assertEqual(self._api.sent, [])
+        self._api.start(250)
+        src = 0b01100000 | ads1299.INPUT_SOURCES['test']
+        sent = self._api.sent
+        self.assertIn([ads1299.CMD_WREG | ads1299.REG_CHnSET_BASE, 7] +
+                      [src] * 8, sent)
+        self.assertIn([ads1299.CMD_WREG | ads1299.REG_BIAS_SENSP, 0, 0xFF],
+                      sent)
+        self.assertEqual(sent[-1], [ads1299.CMD_RDATAC])
+        self.assertTrue(self._api.enable_bias)
+
+    def test_write_command(self):
+        '''A single command byte can be written'''
+        self._api.write(ads1299.CMD_SDATAC)
+        self.assertEqual(self._api.sent, [[ads1299.CMD_SDATAC]])
+
+    def test_read_registers(self):
+        '''Reading registers keeps SDATAC sent by caller'''
+        SDATAC, RDATAC = [ads1299.CMD_SDATAC], [ads1299.CMD_RDATAC]
+        RREG, WREG = ads1299.CMD_RREG, ads1299.CMD_WREG
+        reg = ads1299.REG_CONFIG1
+        self._api.start(250)
+        del self._api.sent[:]
+        self._api.read_registers(reg, 2)  # in RDATAC mode
+        self.assertEqual(self._api.sent, [
+            SDATAC, [RREG | reg, 1, 0, 0], RDATAC])
+        del self._api.sent[:]
+        self._api.write(SDATAC[0])
+        self._api.write_register(reg, self._api.read_register(reg) | 1)
+        self.assertEqual(self._api.sent, [
+            SDATAC, [RREG | reg, 0, 0], [WREG | reg, 0, 1]])
+
+
+class APITestCase(EmBCITestCase):
+    '''Tests shared by real and emulated devices.'''
+    __test__ = False
     API = ADS1299_API
     DEV = (0, 0)  # /dev/spidev0.0
     FS = 250
@@ -53,17 +160,22 @@ class TestADS(EmBCITestCase):
 
     def test_4_enable_bias(self):
         '''Read signal after bias enabled'''
-        tmp, self._api.enable_bias = self._ads.enable_bias, True
+        tmp, self._api.enable_bias = self._api.enable_bias, True
         print(self._api.read())
         self._api.enable_bias = tmp
 
     def test_5_measure_impedance(self):
         '''Set measure source to impedance'''
-        tmp, self._api.measure_impedance = self._ads.measure_impedance, True
+        tmp, self._api.measure_impedance = self._api.measure_impedance, True
         print(self._api.read())
         self._api.measure_impedance = tmp
 
 
+@embeddedonly
+class TestADS(APITestCase):
+    __test__ = True
+
+
 @embeddedonly
 class TestESP(TestADS):
     API = ESP32_API
@@ -71,6 +183,145 @@ class TestESP(TestADS):
     FS = 500
 
 
+class TestEmulatedADS(APITestCase):
+    '''Run tests of ADS1299_API on any machine with an emulated chip.'''
+    __test__ = True
+    API = EmulatedADS1299_API
+
+    def test_3_test_signal(self):
+        '''Internal test signal is a square wave of +/-1.875mV'''
+        self._api.set_input_source('test')
+        data, ts = self._api.read_burst(self.FS)
+        self.assertTrue(np.allclose(np.abs(data), 1.875e-3, rtol=1e-3))
+        self.assertEqual(len(np.unique(np.sign(data))), 2)
+        self._api.set_input_source('normal')
+
+    def test_6_read_burst(self):
+        '''Read bursts with counter derived timestamps'''
+        missed = self._api.missed
+        data, ts = self._api.read_burst(50)
+        self.assertEqual(data.shape, (8, 50))
+        self.assertTrue(0 < np.abs(data).max() < 1e-3)
+        # DRDY may be missed if this process is not scheduled in time
+        self.assertAlmostEqual((ts[-1] - ts[0]) * self.FS,
+                               49 + self._api.missed - missed)
+
+    def test_7_set_sample_rate(self):
+        '''Change sample rate while streaming'''
+        self._api.set_sample_rate(1000)
+        self.assertEqual(self._api.device.sample_rate, 1000)
+        start = time.time()
+        data, ts = self._api.read_burst(200)
+        self.assertAlmostEqual(time.time() - start, 0.2, delta=0.1)
+
+    def test_8_late_wakeup(self):
+        '''Waking up late within a period misses no DRDY edge'''
+        self._api.close()
+        self._api = self.API(realtime=False)
+        device, period = self._api.device, 1.0 / self.FS
+
+        class VirtualTime(object):  # driver wakes up right on DRDY edges
+            sleep = staticmethod(time.sleep)
+            time = staticmethod(lambda: 1e3 + device.clock())
+
+        ads1299.time = VirtualTime
+        try:
+            self._api.open(self.DEV)
+            self._api.start(sample_rate=self.FS)
+            self._api.read_burst(10)
+            self._api._next_drdy -= 0.7 * period  # woken up 0.7 late
+            self._api.read_burst(10)
+            self.assertEqual(self._api.missed, 0)
+            self._api._next_drdy -= 1.3 * period  # one edge missed
+            self._api.read_burst(10)
+            self.assertEqual(self._api.missed, 1)
+        finally:
+            ads1299.time = time
+
+
+class TestEmulatedESP(TestEmulatedADS):
+    API = EmulatedESP32_API
+    FS = 500
+
+    def _settle(self, cond, n=None):
+        '''Read batches until commands are executed, return next batch.'''
+        for i in range(20):
+            self._api.read_burst(n)
+            if cond():
+                break
+        else:
+            self.fail('commands not executed')
+        # samples converted before the commands may be still buffered
+        self._api.device._buffer.clear()
+        data, ts = self._api.read_burst(n)
+        self.assertTrue(len(ts))
+        return data, ts
+
+    def test_2_read_register(self):
+        '''Virtual registers are written by commands in transfers'''
+        regs = self._api.device.registers
+        self._api.set_channel(2, False)
+        data, ts = self._settle(lambda: regs[0x05 + 2] & 0x80)
+        self.assertTrue((data[2] == 0).all() and (data[3] != 0).any())
+        self._api.set_channel(2, True)
+
+    def test_3_test_signal(self):
+        regs = self._api.device.registers
+        self._api.set_input_source('test')
+        data, ts = self._settle(lambda: regs[0x05] & 0b111 == 0b101, 128)
+        self.assertTrue(np.allclose(np.abs(data), 1.875e-3, rtol=1e-3))
+
+    def test_6_read_burst(self):
+        data, ts = self._settle(lambda: True, 50)
+        self.assertEqual(data.shape, (8, 50))
+        self.assertTrue(np.allclose(np.diff(ts), 1.0 / self.FS))
+
+    def test_8_late_wakeup(self):
+        self.skipTest('ESP32 buffers samples, no DRDY edge per sample')
+
+    def test_7_set_sample_rate(self):
+        self._api.set_sample_rate(1000)
+        self._settle(lambda: self._api.device.sample_rate == 1000)
+
+    def _queue_settings(self):
+        self._settle(lambda: True)
+        for en in [False, True, False, True, False]:
+            self._api.set_channel(1, en)
+        self._api.set_input_source('test')
+        self._api.set_input_source('normal')
+        self._api.enable_bias = True
+        self.assertEqual(len(self._api._commands), 3)
+
+    def test_8_coalesce_commands(self):
+        '''Settings are coalesced and sent one per transfer'''
+        dev = self._api.device
+        self._queue_settings()
+        missed = self._api.missed
+        for i in range(3):
+            data, ts = self._api.read_burst(32)
+            self.assertEqual(data.shape, (8, 0))  # batch is discarded
+        self.assertGreaterEqual(self._api.missed, missed + 3 * 32)
+        self.assertTrue(dev.registers[0x05 + 1] & 0x80 and dev.bias)
+        self.assertEqual(dev.registers[0x05] & 0b111, 0)
+        self._api.set_channel(1, True)
+
+
+class TestEmulatedESPCoalesce(TestEmulatedESP):
+    API = functools.partial(EmulatedESP32_API, coalesce=True)
+
+    def test_8_coalesce_commands(self):
+        '''Settings are coalesced and sent along with samples'''
+        dev = self._api.device
+        self._queue_settings()
+        data, ts = self._api.read_burst(32)
+        self.assertEqual(data.shape, (8, 32))  # batch is not discarded
+        self.assertTrue(dev.registers[0x05 + 1] & 0x80 and dev.bias)
+        self.assertEqual(dev.registers[0x05] & 0b111, 0)
+        self._api.set_channel(1, True)
+
+
 if __name__ == '__main__':
     from .. import test_with_unittest
-    test_with_unittest(TestADS, TestESP)
+    test_with_unittest(TestDecode, TestADS, TestESP,
+                       TestEmulatedADS, TestEmulatedESP,
+                       TestEmulatedESPCoalesce)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/tests/test_aio.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 22:18:40
+
+'''Tests of `embci.io.aio`, only collected on Python 3.5+.'''
+
+# built-in
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import asyncio
+
+# requirements.txt: testing: pytest
+# requirements.txt: data: numpy
+import pytest
+import numpy as np
+
+from embci.io import FakeDataGenerator as Reader
+
+
+@pytest.fixture(scope='module')
+def reader():
+    reader = Reader(sample_rate=500, sample_time=2, num_channel=8)
+    reader.start()
+    yield reader
+    reader.close()
+
+
+def test_reader_stream(reader):
+    async def consume(n, count):
+        blocks = []
+        async with reader.stream(n, timeout=1) as stream:
+            async for block in stream:
+                blocks.append(block)
+                if len(blocks) == count:
+                    break
+        return blocks
+
+    async def main():
+        ret = await asyncio.gather(consume(10, 5), consume(50, 2))
+        task = asyncio.ensure_future(consume(reader.window_size, 10))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return ret
+
+    loop = asyncio.new_event_loop()
+    try:
+        small, large = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    assert [b.shape for b in small] == [(9, 10)] * 5
+    assert [b.shape for b in large] == [(9, 50)] * 2
+    assert (np.diff(np.hstack(small)[-1]) > 0).all()  # continuous
+    assert reader.metrics['lag'] == []  # cursors released
+
+
+# THE END
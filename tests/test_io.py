@@ -14,6 +14,8 @@ from __future__ import division
 from __future__ import print_function
 import os
 import time
+import json
+import socket
 import warnings
 import threading
 
@@ -57,11 +59,237 @@ def test_find_data_info(clean_userdir, username):
     clean_userdir()
 
 
+# =============================================================================
+# Buffers
+#
+import multiprocessing as mp
+import numpy as np
+from embci.io import RingBuffer, TieredBuffer
+
+
+def make_ring(shape, cond=None):
+    return RingBuffer(bytearray(RingBuffer.nbytes(shape)), shape, cond=cond)
+
+
+def test_ringbuffer_view():
+    ring = make_ring((1, 5))
+    ring.write([range(7)], range(7))
+    data = ring.data.copy()
+    view = ring.view(2)
+    assert not view.flags.owndata and not view.flags.writeable
+    assert (view == data[:, :2]).all()
+    out = np.empty((1, 5), np.float32)
+    assert ring.view(out=out) is out
+    assert (out == np.roll(data, -2, -1)).all()
+    assert (ring.read(3) == data[:, [4, 0, 1]]).all()
+    assert (ring.column() == data[:, 1]).all()
+
+
+def test_ringbuffer_write():
+    ring = make_ring((2, 5))
+    block = np.arange(8).reshape(2, 4)
+    assert ring.write(block, [1, 2, 3, 4]) == 4
+    assert ring.index == 4
+    assert (ring.read(4, timestamp=True) ==
+            np.vstack((block, [1, 2, 3, 4]))).all()
+    ring.write([9, 9, 9], 5)  # single sample, extra channel dropped
+    assert (ring.column(timestamp=True) == [9, 9, 5]).all()
+    with pytest.raises(ValueError):
+        ring.write(block, 1)
+
+
+def test_ringbuffer_timestamp():
+    ring = make_ring((1, 5))
+    ts = 1.6e9 + np.arange(3) * 1e-4  # absolute time in 100us step
+    ring.write([[1, 2, 3]], ts)
+    assert ring.data.dtype == np.float32
+    data = ring.read(3, timestamp=True)
+    assert data.dtype == np.float64 and (data[-1] == ts).all()
+    assert (np.diff(ring.read(3, rows=[], timestamp=True)[0]) > 0).all()
+
+
+def test_ringbuffer_wait():
+    ring = make_ring((1, 5), mp.Condition())
+    assert ring.wait(1, timeout=0.05) is False
+    threading.Timer(0.1, ring.write, ([[1, 2, 3]], [1, 2, 3])).start()
+    assert ring.wait(3, timeout=1)
+    assert ring.sequence == 3
+    assert ring.header.waiters == 0  # writer does not notify any more
+    ring.WAIT_SLICE = 10  # woken up by writer instead of timeout
+    t = time.time()
+    threading.Timer(0.05, ring.write, ([4], 4)).start()
+    assert ring.wait(4, timeout=1) and time.time() - t < 0.5
+
+
+def test_ringbuffer_attach():
+    ring = make_ring((1, 5))
+    ring.write([[1, 2, 3]], [1, 2, 3])
+    attached = RingBuffer(ring.buffer, readonly=True)
+    assert attached.data.shape == (1, 5) and attached.sequence == 3
+    assert (attached.read(3) == ring.read(3)).all()
+    with pytest.raises(RuntimeError):
+        attached.write([4], 4)
+
+
+def test_cursor():
+    ring = make_ring((1, 5))
+    c1, c2 = ring.cursor(), ring.cursor()
+    ring.write([[1, 2, 3]], [1, 2, 3])
+    data, lost = c1.read()
+    assert (data[0] == [1, 2, 3]).all() and lost == 0
+    assert c1.read(timeout=0.01) == (None, 0)
+    ring.write([range(4, 11)], range(4, 11))
+    data, lost = c2.read(2)  # samples 1 - 5 overwritten
+    assert (data[0] == [6, 7]).all() and lost == 5 and c2.lost == 5
+    data, lost = c1.read()
+    assert (data[0] == [6, 7, 8, 9, 10]).all() and lost == 2
+    assert ring.index == 0
+
+
+def test_ringbuffer_seqlock():
+    ring = make_ring((1, 5))
+    ring.write([[1, 2, 3]], [1, 2, 3])
+    token = ring.read_begin()
+    assert not token & 1 and not ring.read_retry(0, token)
+    ring.write([[4, 5]], [4, 5])
+    assert not ring.read_retry(0, token)  # sample 0 is still in buffer
+    ring.write([[6]], [6])
+    assert ring.read_retry(0, token) and not ring.read_retry(1, token)
+    ring.header.seqlock += 1  # pretend writer is writing 1 sample
+    ring.header.pending = 1
+    assert ring.read_retry(1, ring.read_begin())
+    assert (ring.read(2)[0] == [5, 6]).all()  # not affected
+    assert ring.stats['failures'] == 0
+    ring.read()  # oldest sample always overwritten by pending write
+    assert ring.stats['retries'] == ring.max_retries + 1
+    assert ring.stats['failures'] == 1
+
+
+def test_ringbuffer_migrate():
+    ring = make_ring((2, 5))
+    buffers = [ring.buffer]
+    attached = RingBuffer(ring.buffer, readonly=True,
+                          remap=lambda: buffers[-1])
+    cursor = attached.cursor()
+    ring.write(np.arange(14).reshape(2, 7), range(7))
+    buf = bytearray(RingBuffer.nbytes((3, 8)))
+    ring.migrate(buf, (3, 8), 500, publish=lambda: buffers.append(buf))
+    assert ring.sequence == 7 and ring.oldest == 2
+    assert attached.read(1).shape == (3, 1)  # followed the writer
+    assert attached.generation == 1 and attached.sample_rate == 500
+    ring.write(np.ones((3, 2)), [7, 8])
+    data, lost = cursor.read()
+    assert (data[-1] == np.arange(2, 9)).all() and lost == 2
+
+
+def test_tieredbuffer():
+    hot, spill = make_ring((1, 16)), make_ring((1, 104))
+    tiered = TieredBuffer(hot, spill)
+    assert len(tiered) == 100 and tiered.chunk == 4
+    cursor = tiered.cursor()
+    for i in range(90):
+        tiered.write([i], i)
+    assert spill.sequence == 88  # flushed in chunks
+    data, lost = cursor.read()  # older samples picked from spill
+    assert (data[0] == np.arange(90)).all() and lost == 0
+    tiered.write([range(90, 300)], range(90, 300))
+    assert (tiered.read()[0] == np.arange(200, 300)).all()
+    data, first = tiered.copy_from(150, 100)
+    assert first == 196 and (data[0] == np.arange(196, 296)).all()
+
+
+# =============================================================================
+# Ingest
+#
+import scipy.signal
+from embci.io import Resampler, SignalGenerator, ClockModel, GapTracker
+
+
+def test_resampler():
+    data = np.random.rand(4, 3000)
+    for rate_out in [250, 256, 2000]:
+        resampler = Resampler(1000, rate_out)
+        whole, _ = resampler.process(data)
+        resampler.reset()
+        blocks = [resampler.process(data[:, i:i + 37]) for i in range(
+            0, 3000, 37)]
+        assert (np.hstack([b[0] for b in blocks]) == whole).all()
+    # same as scipy.signal.resample_poly when filter delay is aligned
+    resampler = Resampler(1000, 250)
+    out, ts = resampler.process(data, np.arange(3000) / 1000.)
+    ref = scipy.signal.resample_poly(data, 1, 4, axis=1)
+    assert np.allclose(out[:, 100:-100], ref[:, 100:len(out[0]) - 100])
+    assert np.allclose(ts, np.arange(len(ts)) / 250.)
+
+
+def test_signal_generator():
+    kwargs = dict(seed=0, ssvep=[8, 10], alpha=20, mains=5, spikes=2)
+    whole = SignalGenerator(250, 4, **kwargs).generate(1000)
+    gen = SignalGenerator(250, 4, **kwargs)
+    blocks = np.hstack([gen.generate(n) for n in [1, 99, 400, 500]])
+    assert np.allclose(whole, blocks)  # independent of block size
+    gen = SignalGenerator(500, 2, ssvep=[10], noise=0)
+    freq = np.fft.rfftfreq(500, 1 / 500.)
+    assert freq[np.abs(np.fft.rfft(gen.generate(500))).argmax(1)][0] == 10
+
+
+def test_clock_model():
+    rate = 250 * (1 + 100e-6)  # device clock runs 100ppm fast
+    model, rng = ClockModel(250), np.random.RandomState(0)
+    ts = []
+    for k in range(32, 32 * 2000, 32):  # blocks arrive with jitter
+        ts.append(model.update(32, (k - 1) / rate + rng.exponential(3e-3)))
+    ts = np.hstack(ts)
+    assert abs(model.drift - 100) < 10 and 1e-3 < model.jitter < 5e-3
+    assert (np.diff(ts) > 0).all()
+    assert np.std(np.diff(ts[-1000:])) < 1e-5  # smooth
+    model.update(32, ts[-1] + 10)  # resumed from pause
+    assert model.blocks == 1
+
+
+def test_gap_tracker():
+    tracker = GapTracker(100, min_repeat=3)
+    data = np.random.rand(2, 20)
+    data[:, 12:15] = data[:, 11:12]  # stuck for 3 samples
+    data[:, 17] = np.nan
+    # 3 samples lost after 5th one, 2 samples sent twice after 15th one
+    ts = np.r_[np.arange(5), np.arange(8, 18), 16, 17, 18, 19, 20] / 100.
+    for i in range(0, 20, 4):  # independent of block size
+        tracker.check(data[:, i:i + 4], ts[i:i + 4], i)
+    events = [(e['kind'], e['sequence'], e['count'])
+              for e in tracker.log.events()]
+    assert events == [('gap', 5, 3), ('repeat', 12, 3),
+                      ('duplicate', 15, 2), ('invalid', 17, 1)]
+    assert np.flatnonzero(tracker.log.mask(10, 10)).tolist() == \
+        [2, 3, 4, 5, 6, 7]
+    assert [e['kind'] for e in tracker.log.events(16, 20)] == \
+        ['duplicate', 'invalid']
+
+
+def test_gap_tracker_late():
+    model, tracker = ClockModel(100), GapTracker(100)
+    t = 0
+    for k in range(0, 200, 10):  # 0.3s of samples lost after the 10th block
+        t += 0.1 + 0.3 * (k == 100)
+        ts = model.update(10, t)
+        tracker.delay(model.late)
+        tracker.check(np.random.rand(2, 10), ts, k)
+    # timestamps on the fitted line do not show the stall as a whole
+    events = [(e['kind'], e['sequence'], e['count'])
+              for e in tracker.log.events()]
+    assert ('late', 100, 30) in events
+    assert not [e for e in events if e[0] == 'gap' and e[2] >= 30]
+
+
 # =============================================================================
 # Readers
 #
-from embci.io import FakeDataGenerator as Reader
-from embci.utils import find_pylsl_outlets
+from embci.io import FakeDataGenerator as Reader, AttachedReader, LSLReader
+from embci.io import SerialReader, SocketTCPReader, SocketUDPReader
+from embci.io import FilesReader, ADS1299SPIReader, ESP32SPIReader
+from embci.drivers.emulator import EmulatedADS1299_API, EmulatedESP32_API
+from embci.io import FrameDecoder, encode_frame
+from embci.utils import find_pylsl_outlets, virtual_serial
 
 
 @pytest.fixture(scope='module')
@@ -92,11 +320,348 @@ def test_reader_data(reader):
     assert reader.data_frame.shape == (8, 1000)
 
 
+def test_reader_data_fresh():
+    class SlowReader(Reader):
+        def _data_fetch(self):
+            time.sleep(self.period)
+            return np.zeros(self.num_channel), time.time() - self.start_time
+
+    # one sample every 0.1s, much longer than 10 sample periods
+    reader = SlowReader(500, 0.4, num_channel=2)
+    reader.period = 0.1
+    reader.start(method='thread')
+    times = [reader.data_channel_t[-1] for i in range(5)]
+    assert (np.diff(times) > 0).all()  # no stale sample
+    # one sample every 1s, longer than sample_time
+    reader.period = 1
+    reader.wait(1, timeout=2)
+    assert reader.data_channel is not None
+    assert reader.data_channel is None
+    reader.close()
+
+
+def test_reader_late():
+    reader = Reader(500, 2, num_channel=2, block_size=10, track_gaps=True)
+    fetch = reader._data_fetch
+
+    def stalled_fetch():
+        if reader._ring.sequence == 500:  # stall for 0.3s
+            time.sleep(0.3)
+        return fetch()
+    reader._data_fetch = stalled_fetch
+    reader.start(method='thread')
+    reader.wait(1000, timeout=3)
+    reader.close()
+    events = [e for e in reader.events() if e['kind'] == 'late']
+    assert len(events) == 1 and events[0]['sequence'] == 500
+    assert abs(events[0]['count'] - 150) < 25
+
+
+def test_reader_getitem(reader):
+    # timestamps are the last row as if they were saved in data
+    assert np.shares_memory(reader[-1], reader._times)
+    assert reader[-1].dtype == np.float64 and reader[-1].shape == (1000, )
+    assert reader[8, :5].shape == (5, ) and reader[-9].shape == (1000, )
+    assert reader[:, -1].shape == (9, )
+    assert reader[[0, -1], :3].shape == (2, 3)
+    with pytest.raises(IndexError):
+        reader[9]
+
+
 def test_reader_pylsl(reader):
     info = find_pylsl_outlets(source_id=reader.name)
     assert isinstance(info, pylsl.StreamInfo)
 
 
+def test_fake_data_generator():
+    data = []
+    for speed in [0, 10]:
+        gen = Reader(1000, 10, num_channel=2, speed=speed, seed=1)
+        cursor = gen.subscribe(0)
+        gen.start(method='thread')
+        time.sleep(0.2)
+        if not speed:  # unthrottled
+            assert gen._ring.sequence > 10000
+        else:
+            data.append(cursor.read(1000, timeout=1)[0])
+        gen.close()
+    gen = Reader(1000, 10, num_channel=2, speed=10, seed=1, block_size=7)
+    cursor = gen.subscribe(0)
+    gen.start(method='thread')
+    data.append(cursor.read(1000, timeout=1)[0])
+    gen.close()
+    assert np.allclose(data[0][:2], data[1][:2])  # seeded
+
+
+def test_lsl_reader():
+    source = Reader(sample_rate=500, num_channel=4, broadcast=True)
+    source.start(method='thread')  # outlet can not be used after fork
+    info = find_pylsl_outlets(source_id=source.name)
+    for chunk_size in [0, 16]:
+        lsl = LSLReader(sample_time=1, chunk_size=chunk_size)
+        lsl.start(info=info, method='thread')
+        data, lost = lsl.subscribe().read(100, timeout=3)
+        assert data.shape == (5, 100)
+        assert (np.diff(data[-1]) > 0).all()
+        lsl.close()
+    source.close()
+
+
+def test_frame_decoder():
+    data = np.random.randint(-2**23, 2**23, (4, 40))
+    frames = [encode_frame(data[:, i:i + 10], i // 10, 3)
+              for i in range(0, 40, 10)]
+    corrupt = bytearray(frames[1])
+    corrupt[-1] ^= 0xFF
+    decoder = FrameDecoder(256)
+    decoded = []
+    frames[3] = encode_frame(data[:, 30:], 3, 3, timestamp=1.5)
+    stream = b'\x00\xA5'.join([frames[0], corrupt, frames[2], frames[3]])
+    for i in range(0, len(stream), 50):  # frames split across reads
+        decoder.feed(stream[i:i + 50])
+        block, stamps = decoder.decode()
+        while block is not None:
+            decoded.append(block)
+            block, stamps = decoder.decode()
+            if stamps is not None:
+                assert stamps[0] == 1.5
+    expect = np.hstack([data[:, :10], data[:, 20:]])  # frame 1 is corrupt
+    assert (np.hstack(decoded) == expect).all()
+    assert decoder.stats['frames'] == 3 and decoder.stats['corrupt'] >= 1
+    assert decoder.stats['dropped'] == 1
+
+
+def test_frame_decoder_consecutive():
+    data = np.random.randint(-2**31, 2**31, (2, 50))
+    decoder = FrameDecoder(1024)
+    for start in [0, 25]:  # several frames in a row decoded at once
+        decoder.feed(b''.join([encode_frame(data[:, i:i + 5], i // 5, 4)
+                               for i in range(start, start + 25, 5)]))
+        block, _ = decoder.decode()
+        assert (block == data[:, start:start + 25]).all()
+    assert decoder.stats['frames'] == 10 and decoder.stats['dropped'] == 0
+    decoder.feed(encode_frame(data[:, :5], 12, 4))  # seq 10, 11 lost
+    decoder.decode()
+    assert decoder.stats['dropped'] == 2
+
+
+def test_serial_reader_framed():
+    flag_stop, port1, port2 = virtual_serial(verbose=False)
+    device = serial.Serial(port2, 921600)
+    reader = SerialReader(sample_rate=1000, num_channel=4, framed=True)
+    data = np.arange(4 * 20 * 10).reshape(4, -1)
+
+    def send():
+        time.sleep(0.5)  # input buffer is flushed when reader opens port
+        for i in range(10):
+            device.write(encode_frame(data[:, i * 20:(i + 1) * 20], i))
+    threading.Thread(target=send).start()
+    reader.start(port1, 921600, method='thread')
+    cursor = reader.subscribe(0)
+    block, lost = cursor.read(200, timeout=3)
+    assert (block[:4] == data).all()
+    assert reader.frame_stats['frames'] == 10
+    reader.close()
+    device.close()
+    flag_stop.set()
+
+
+def test_socket_tcp_reader():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    data = np.arange(2 * 300).reshape(2, -1)
+    stream = b''.join(
+        encode_frame(data[:, i:i + 30], i // 30, 4, timestamp=i / 1000.)
+        for i in range(0, 300, 30))
+
+    def send():
+        conn = server.accept()[0]
+        for i in range(0, len(stream), 100):  # frames split across sends
+            conn.sendall(stream[i:i + 100])
+            time.sleep(0.01)
+        conn.recv(16)
+        conn.close()
+    threading.Thread(target=send).start()
+    reader = SocketTCPReader(sample_rate=1000, num_channel=2, framed=True)
+    reader.start('127.0.0.1:%d' % server.getsockname()[1], method='thread')
+    block, lost = reader.subscribe(0).read(300, timeout=3)
+    assert (block[:2] == data).all()
+    assert np.allclose(block[-1], np.arange(300) / 1000.)
+    assert reader.frame_stats['dropped'] == 0
+    reader.close()
+    server.close()
+
+
+def test_socket_tcp_reader_raw():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    data = np.arange(2 * 300, dtype=np.float32).reshape(2, -1)
+    stream = data.T.tobytes()  # float32 samples one after another
+
+    def send():
+        conn = server.accept()[0]
+        for i in range(0, len(stream), 100):  # samples split across sends
+            conn.sendall(stream[i:i + 100])
+            time.sleep(0.01)
+        conn.recv(16)
+        conn.close()
+    threading.Thread(target=send).start()
+    reader = SocketTCPReader(sample_rate=1000, num_channel=2)
+    reader.start('127.0.0.1:%d' % server.getsockname()[1], method='thread')
+    block, lost = reader.subscribe(0).read(300, timeout=3)
+    assert (block[:2] == data).all()
+    reader.close()
+    server.close()
+
+
+def test_socket_udp_reader():
+    reader = SocketUDPReader(sample_rate=1000, num_channel=2, reorder=4,
+                             track_gaps=True)
+    reader.start('127.0.0.1:0', method='thread')
+    data = np.arange(2 * 110).reshape(2, -1)
+    frames = [encode_frame(data[:, i * 10:(i + 1) * 10], i)
+              for i in range(11)]
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for i in [0, 1, 3, 2, 1, 5, 6, 7, 8, 9, 10]:  # 4 is lost
+        sender.sendto(frames[i], reader.address)
+    block, lost = reader.subscribe(0).read(110, timeout=3)
+    assert np.isnan(block[:2, 40:50]).all()
+    assert (block[:2, :40] == data[:, :40]).all()
+    assert (block[:2, 50:] == data[:, 50:]).all()
+    stats = reader.frame_stats
+    assert stats['lost'] == stats['late'] == stats['reordered'] == 1
+    assert [(e['kind'], e['sequence'], e['count'])
+            for e in reader.events()] == [('invalid', 40, 10)]
+    reader.close()
+    sender.close()
+
+
+def test_socket_udp_reader_restart():
+    reader = SocketUDPReader(sample_rate=1000, num_channel=2, reorder=4)
+    reader.start('127.0.0.1:0', method='thread')
+    data = np.arange(2 * 40).reshape(2, -1)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for i, seq in enumerate([0, 1, 3000, 3001]):  # restarted ahead
+        sender.sendto(encode_frame(data[:, i * 10:(i + 1) * 10], seq),
+                      reader.address)
+    block, lost = reader.subscribe(0).read(40, timeout=3)
+    assert (block[:2] == data).all()  # no frames filled
+    assert reader.frame_stats['lost'] == 0
+    reader.close()
+    sender.close()
+
+
+def test_files_reader(tmpdir):
+    fn = str(tmpdir.join('record.npy'))
+    np.save(fn, np.arange(3 * 6000).reshape(3, -1))  # 6 sec @ 1000Hz
+    reader = FilesReader(fn, sample_rate=1000, num_channel=3, speed=0)
+    t = time.time()
+    reader.start(method='thread')
+    while not reader.finished and time.time() - t < 3:
+        time.sleep(0.01)
+    assert reader.finished  # faster than realtime
+    assert reader.status == 'paused' and reader.duration == 6
+    assert (reader.data_frame[0] == np.arange(4000, 6000)).all()
+    reader.speed = 10
+    reader.seek(5)
+    reader.resume()
+    time.sleep(0.05)
+    assert 5 < reader.position < 6
+    reader.close()
+    # replay 1000Hz recording at 250Hz
+    reader = FilesReader(fn, sample_rate=250, num_channel=3, speed=0,
+                         source_rate=1000)
+    reader.start(method='thread')
+    time.sleep(0.5)
+    assert reader.finished and reader.sample_rate == 250
+    data = reader.data_all  # linear signal keeps linear after resampling
+    assert np.allclose(data[0], data[-1] * 1000, atol=1e-2)
+    reader.close()
+
+
+@pytest.mark.parametrize('Reader, API, burst', [
+    (ADS1299SPIReader, EmulatedADS1299_API, 1),
+    (ADS1299SPIReader, EmulatedADS1299_API, 20),
+    (ESP32SPIReader, EmulatedESP32_API, 32),
+])
+def test_spi_reader(Reader, API, burst):
+    reader = Reader(sample_rate=500, num_channel=8, API=API, burst=burst,
+                    track_gaps=True, reinit=True)  # singleton readers
+    reader.start(device=(0, 0), method='thread')
+    block, lost = reader.subscribe(0).read(400, timeout=3)
+    assert block.shape == (9, 400) and not lost
+    assert (np.diff(block[-1]) > 0).all()
+    assert 0 < np.abs(block[:8]).max() < 1e-3  # EEG in volts
+    assert not [e for e in reader.events() if e['kind'] == 'duplicate']
+    reader.close()
+    reader._task.join(2)  # may be waiting for DRDY of stopped device
+
+
+def test_reader_subscribe(reader):
+    c1, c2 = reader.subscribe(), reader.subscribe()
+    d1, _ = c1.read(50, timeout=1)
+    d2, _ = c2.read(50, timeout=1)
+    assert d1.shape == d2.shape == (9, 50)
+    assert (d1 == d2).all()
+
+
+def test_reader_metrics(reader):
+    cursor = reader.subscribe()
+    cursor.read(50, timeout=1)
+    time.sleep(0.2)
+    stats = reader.metrics  # shared by the reader process
+    assert stats['samples'] >= 50 and stats['rate'] > 0
+    assert stats['latency']['count'] == stats['blocks']
+    assert len(stats['lag']) == 1 and stats['lag'][0] >= 50
+    cursor.close()
+    assert reader.metrics['lag'] == []
+    stats = reader.get_metrics(histogram=True)
+    assert sum(stats['latency']['hist']) == stats['blocks']
+    json.dumps(stats)
+
+
+def test_attached_reader(reader):
+    attached = AttachedReader(reader.name)
+    assert attached.is_streaming()
+    assert attached.num_channel == reader.num_channel
+    assert attached.data_frame.shape == reader.data_frame.shape
+    attached.close()
+
+
+def test_reader_history():
+    reader = Reader(sample_rate=1000, sample_time=0.1, num_channel=2,
+                    history_time=2)
+    reader.start(method='thread')
+    cursor = reader.subscribe(0)
+    time.sleep(1)
+    assert reader.history(0.5).shape == (3, 500)
+    data, lost = cursor.read()  # far behind the 100 samples hot window
+    assert data.shape[1] > 500 and lost == 0
+    attached = AttachedReader(reader.name)
+    assert attached.history(0.5).shape == (3, 500)
+    attached.close()
+    reader.close()
+
+
+def test_reader_reconfigure():
+    reader = Reader(sample_rate=500, sample_time=1, num_channel=2)
+    reader.start()
+    attached = AttachedReader(reader.name)
+    cursor = reader.subscribe()
+    assert cursor.read(10, timeout=1)[0].shape == (3, 10)
+    assert reader.set_sample_rate(1000) and reader.set_channel_num(4)
+    assert reader.status == 'started'  # no restart
+    data, lost = cursor.read(100, timeout=1)
+    assert data.shape == (5, 100) and lost == 0
+    assert attached.is_streaming()
+    assert attached.data_frame.shape == (4, 1000)
+    assert attached._ring.generation == 2
+    attached.close()
+    reader.close()
+
+
 def test_set_sample_rate(reader):
     reader.pause()
     assert reader.set_sample_rate(250)
@@ -109,7 +674,6 @@ def test_set_sample_rate(reader):
 # Commanders
 #
 from embci.io import SerialCommander
-from embci.utils import virtual_serial
 
 
 @pytest.fixture(scope='module')
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/tools/bench_decode.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-17 23:05:31
+
+'''
+Micro-benchmark of decoding raw SPI bytes of ADS1299 frames into counts.
+
+Compare the per-channel `struct` loop used by `ADS1299_API.read` before
+with the vectorized `embci.drivers.ads1299.decode_frames`. Run it on the
+target board to get the per-frame cost there::
+
+    $ python tools/bench_decode.py [repeat]
+'''
+
+# built-in
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import sys
+import struct
+import timeit
+
+# requirements.txt: data: numpy
+import numpy as np
+
+from embci.drivers.ads1299 import decode_frames
+
+
+def decode_loop(raw):
+    '''Decode frames one by one, channel by channel (the old way).'''
+    frames = []
+    for f in range(len(raw) // 27):
+        num = raw[27 * f + 3:27 * (f + 1)]
+        byte = b''
+        for i in range(8):
+            tmp = struct.pack('3B', num[3 * i + 2], num[3 * i + 1], num[3 * i])
+            byte += tmp + (b'\xff' if num[3 * i] > 127 else b'\x00')
+        frames.append(np.frombuffer(byte, np.int32))
+    return np.array(frames)
+
+
+def main(repeat=200):
+    print('{:>8} {:>14} {:>14} {:>8}'.format(
+        'frames', 'loop us/frame', 'numpy us/frame', 'speedup'))
+    for n in [1, 8, 32, 128, 512]:
+        raw = np.random.randint(0, 256, 27 * n).tolist()  # like xfer2
+        assert (decode_loop(raw) == decode_frames(raw)).all()
+        cost = [min(timeit.repeat(
+            lambda: func(raw), number=repeat, repeat=3)) / repeat / n * 1e6
+            for func in (decode_loop, decode_frames)]
+        print('{:8d} {:14.2f} {:14.2f} {:7.1f}x'.format(
+            n, cost[0], cost[1], cost[0] / cost[1]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
+
+
+# THE END
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# coding=utf-8
+#
+# File: EmBCI/tools/bench_spi.py
+# Authors: Hank <hankso1106@gmail.com>
+# Create: 2026-10-18 00:58:20
+
+'''
+End-to-end benchmark of SPI readers on emulated ADS1299 / ESP32 devices
+(see `embci.drivers.emulator`), runs on any Linux box.
+
+For each reader configuration, it measures:
+
+- max throughput: samples per second ingested from a device running as fast
+  as it is read (`realtime=False`),
+- realtime health at `sample_rate`: dropped samples, fetching latency and
+  timestamp jitter from `reader.metrics`.
+
+Usage::
+
+    $ python tools/bench_spi.py [sample_rate] [seconds]
+'''
+
+# built-in
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import sys
+import time
+import functools
+
+from embci.io import ADS1299SPIReader, ESP32SPIReader
+from embci.drivers.emulator import EmulatedADS1299_API, EmulatedESP32_API
+
+CONFIGS = [
+    ('ADS1299 burst=1', ADS1299SPIReader, EmulatedADS1299_API, 1),
+    ('ADS1299 burst=32', ADS1299SPIReader, EmulatedADS1299_API, 32),
+    ('ESP32 batch=32', ESP32SPIReader, EmulatedESP32_API, 32),
+    ('ESP32 batch=128', ESP32SPIReader, EmulatedESP32_API, 128),
+]
+
+
+def run(Reader, API, burst, sample_rate, seconds, realtime=True):
+    API = functools.partial(API, seed=0, realtime=realtime)
+    reader = Reader(sample_rate, 2, 8, API=API, burst=burst, reinit=True)
+    reader.start(device=(0, 0), method='thread')
+    time.sleep(seconds)
+    metrics = reader.get_metrics()
+    reader.close()
+    reader._task.join(2)
+    return metrics
+
+
+def main(sample_rate=1000, seconds=3):
+    print('{:>18} {:>12} {:>8} {:>10} {:>10} {:>10}'.format(
+        'reader', 'max rate', 'dropped', 'p50 (us)', 'p99 (us)',
+        'jitter (us)'))
+    for name, Reader, API, burst in CONFIGS:
+        fast = run(Reader, API, burst, sample_rate, seconds, False)
+        real = run(Reader, API, burst, sample_rate, seconds)
+        lat = real['latency']
+        print('{:>18} {:>12.0f} {:>8d} {:>10.0f} {:>10.0f} {:>10.0f}'.format(
+            name, fast['samples'] / float(seconds), real['dropped'],
+            lat.get('p50', 0) * 1e6, lat.get('p99', 0) * 1e6,
+            real['jitter'].get('p99', 0) * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
+
+
+# THE END